@@ -2,7 +2,15 @@
 
 from inc_noesis import *  
 import noesis, rapi, struct  # type: ignore
-import os, time, zipfile, traceback
+import os, time, zipfile, traceback, hashlib, json, mmap
+from collections import OrderedDict
+import operator, sys, math, bisect
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 DEBUG = 0
 HIDEF_MASK  = 0x01
@@ -14,24 +22,58 @@ PluginVer = "0.6"
 PLATFORM_XBOX360 =120
 PLATFORM_PC=119
 
+PAYLOAD_CACHE_BUDGET = 256 * 1024 * 1024  # bytes of decompressed payloads kept in memory, 0 = off
+PAYLOAD_CACHE_DIR = None                  # folder for the on-disk payload tier, None = memory only
+
+TEXTURE_PASSTHROUGH = False  # keep DXT surfaces block compressed (also -xnbpassthrough)
+TEXTURE_DEDUP = None         # batch tools: object with claim(key) -> None for a new surface, else its owner
+SOUND_OUTPUT = False         # append SoundEffectData to the output list instead of prompting (batch tools)
+SOUND_CHUNK_SIZE = 1024 * 1024
+RAPI_IMAGE_DXT = hasattr(rapi, "imageDecodeDXT")  # numpy block/raw decoders only where rapi lacks these
+RAPI_IMAGE_RAW = hasattr(rapi, "imageDecodeRaw")
+DECODE_THREADS = min(8, os.cpu_count() or 1)  # threads for row bands of large surfaces
+DECODE_BAND_BLOCKS = 1 << 15           # blocks per band, smaller surfaces decode in one call
+MODEL_MERGE = False          # pack all mesh parts into one buffer set and commit once (also -xnbmerge)
+TEXTURE_FACE = None          # decode only this TextureCube face / Texture3D slice, None = all (also -xnbface <n>)
+
+#WAVEFORMATEX tags
+WAVE_FORMAT_NAMES = {0x0001: "PCM", 0x0002: "MS-ADPCM", 0x0003: "IEEE float", 0x0011: "IMA-ADPCM",
+                     0x0165: "XMA", 0x0166: "XMA2"}
+WAVE_FORMAT_XMA = (0x0165, 0x0166)
+
+#SurfaceFormat -> block compressed noesis type
+DXT_FORMATS_PC = {4: noesis.NOESISTEX_DXT1, 5: noesis.NOESISTEX_DXT3, 6: noesis.NOESISTEX_DXT5}
+DXT_FORMATS_360 = {4: noesis.NOESISTEX_DXT1, 28: noesis.NOESISTEX_DXT1,
+                   5: noesis.NOESISTEX_DXT3, 30: noesis.NOESISTEX_DXT3,
+                   6: noesis.NOESISTEX_DXT5, 32: noesis.NOESISTEX_DXT5}
+DXT_FOURCC = {noesis.NOESISTEX_DXT1: noesis.FOURCC_DXT1, noesis.NOESISTEX_DXT3: noesis.FOURCC_DXT3,
+              noesis.NOESISTEX_DXT5: noesis.FOURCC_DXT5}
+
 #NOESIS 
 def registerNoesisTypes():
  
     hTex = noesis.register("XNA Texture2D", ".xnb")
     noesis.setHandlerTypeCheck(hTex, ChkXnbTexture)
     noesis.setHandlerLoadRGBA( hTex, LoadAsset) 
+    noesis.addOption(hTex, "-xnbpassthrough", "export DXT textures without decoding them", 0)
+    noesis.addOption(hTex, "-xnbprofile", "log per-stage timings of each file", 0)
+    noesis.addOption(hTex, "-xnbface", "TextureCube/Texture3D: decode only face/slice <arg>", noesis.OPTFLAG_WANTARG)
     
     hMdl = noesis.register("XNA Model", ".xnb")
     noesis.setHandlerTypeCheck(hMdl, ChkXnbModel)
-    noesis.setHandlerLoadModel(hMdl, LoadAsset)  
+    noesis.setHandlerLoadModel(hMdl, LoadAsset)
+    noesis.addOption(hMdl, "-xnbmerge", "merge all meshes into one commit, names kept as submesh ranges", 0)
   
     hSpr = noesis.register("XNA SpriteFont", ".xnb")
     noesis.setHandlerTypeCheck(hSpr, ChkXnbSpriteFont)
     noesis.setHandlerLoadRGBA(hSpr, LoadAsset)
+    noesis.addOption(hSpr, "-xnbfnt", "write a BMFont .fnt next to the input", 0)
+    noesis.addOption(hSpr, "-xnbglyphs", "also output every glyph as its own texture", 0)
     
     hSnd = noesis.register("XNA SoundEffect", ".xnb")
     noesis.setHandlerTypeCheck(hSnd, ChkXnbSound)
     noesis.setHandlerLoadRGBA(hSnd, LoadAsset)
+    noesis.addOption(hSnd, "-xnbwav", "extract the sound as .wav/.xma next to the input", 0)
     
     hEff = noesis.register("XNA Effect", ".xnb")
     noesis.setHandlerTypeCheck(hEff, ChkXnbEffect)
@@ -44,42 +86,524 @@ def registerNoesisTypes():
 def ChkXnbTexture(data):
     if data[:3] != b"XNB":
         return False
-    return "Texture2DReader" in getFileType(data)
+    return getFileKind(data) == "texture"
 
 
 def ChkXnbSpriteFont(data):
     if data[:3] != b"XNB":
         return False
-    return "SpriteFont" in getFileType(data)
+    return getFileKind(data) == "spritefont"
 
 def ChkXnbModel(data):
     if data[:3] != b"XNB":
         return False
-    return "ModelReader" in getFileType(data)
+    return getFileKind(data) == "model"
 
 def ChkXnbSound(data):
     if data[:3] != b"XNB":
         return False
-    return "SoundEffect" in getFileType(data)
+    return getFileKind(data) == "sound"
 def ChkXnbEffect(data):
     if data[:3] != b"XNB":
         return False
-    return "Effect" in getFileType(data)
+    return getFileKind(data) == "effect"
+
 
 
+#LOGGING / PROFILING
+LOG_QUIET, LOG_INFO, LOG_VERBOSE = 0, 1, 2
+LOG_LEVEL = LOG_VERBOSE if DEBUG else LOG_INFO   # LOG_VERBOSE adds per bone/mesh/part lines
+PROFILE = False   # per-file stage timings (also -xnbprofile)
+
+def log(level, *args):
+    if level <= LOG_LEVEL:
+        print(*args)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("prof", "name", "start", "child")
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+        self.child = 0.0
+
+    def __enter__(self):
+        self.prof.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.prof.stack
+        stack.pop()
+        rec = self.prof.current
+        rec[self.name] = rec.get(self.name, 0.0) + elapsed - self.child  #exclusive of nested stages
+        if stack:
+            stack[-1].child += elapsed
+        return False
+
+
+class Profiler:
+    #stage timings per file; stage() hands out a shared no-op context while no file is being profiled
+    STAGES = ("header", "decompress", "readers", "untile", "pixels", "unmultiply", "vertices", "model", "anims")
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self.current = None
+        self.stack = []
+        self._start = 0.0
+
+    def beginFile(self, name):
+        #returns True if this call opened the record (and so should close it)
+        if not self.enabled or self.current is not None:
+            return False
+        self.current = OrderedDict(file=name)
+        self.stack = []
+        self._start = time.perf_counter()
+        return True
+
+    def endFile(self):
+        rec = self.current
+        if rec is None:
+            return None
+        rec["total"] = time.perf_counter() - self._start
+        self.records.append(rec)
+        self.current = None
+        return rec
+
+    def stage(self, name):
+        if self.current is None:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def clear(self):
+        self.records = []
+
+    def format(self, rec):
+        return "[PROF] %s: %s" % (rec["file"], "  ".join(
+            "%s %.2fms" % (k, v * 1000.0) for k, v in rec.items() if k != "file"))
+
+    def exportJSON(self, path, records=None):
+        records = self.records if records is None else records
+        totals = OrderedDict()
+        for rec in records:
+            for k, v in rec.items():
+                if k != "file":
+                    totals[k] = totals.get(k, 0.0) + v
+        with open(path, "w") as f:
+            json.dump({"files": records, "totals": totals}, f, indent=1)
+
+    def exportCSV(self, path, records=None):
+        import csv
+        records = self.records if records is None else records
+        cols = ["file"] + list(self.STAGES) + ["total"]
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(cols)
+            for rec in records:
+                w.writerow([rec.get(c, rec["file"] if c == "file" else 0.0) for c in cols])
+
+profiler = Profiler(PROFILE)
+
+
+#PAYLOAD CACHE
+class PayloadCache:
+    #decompressed payloads keyed on (content hash, size) of the compressed stream, LRU by byte budget
+    def __init__(self, budget, cache_dir=None):
+        self.budget = budget
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self._manifest = None
+
+    @staticmethod
+    def key(comp_data, real_size):
+        return (hashlib.blake2b(comp_data, digest_size=16).hexdigest(), real_size)
+
+    def get(self, key):
+        payload = self.entries.get(key)
+        if payload is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload
+        payload = self._diskGet(key)
+        if payload is not None:
+            self.disk_hits += 1
+            self._store(key, payload)
+            return payload
+        self.misses += 1
+        return None
+
+    def put(self, key, payload):
+        self._store(key, payload)
+        self._diskPut(key, payload)
+
+    def _store(self, key, payload):
+        n = len(payload)
+        if n > self.budget or key in self.entries:
+            return
+        while self.entries and self.size + n > self.budget:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+            self.evictions += 1
+        self.entries[key] = payload
+        self.size += n
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "disk_hits": self.disk_hits, "entries": len(self.entries),
+                "bytes": self.size, "budget": self.budget}
+
+    #disk tier: <digest>_<size>.bin blobs next to manifest.json
+    def _manifestPath(self):
+        return os.path.join(self.cache_dir, "manifest.json")
+
+    def _loadManifest(self):
+        if self._manifest is None:
+            try:
+                with open(self._manifestPath(), "r") as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def _diskGet(self, key):
+        if not self.cache_dir:
+            return None
+        entry = self._loadManifest().get("%s_%d" % key)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, entry["file"]), "rb") as f:
+                payload = f.read()
+        except OSError:
+            return None
+        if len(payload) != key[1]:
+            return None
+        return payload
+
+    def _diskPut(self, key, payload):
+        if not self.cache_dir:
+            return
+        name = "%s_%d" % key
+        manifest = self._loadManifest()
+        if name in manifest:
+            return
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, name + ".bin"), "wb") as f:
+            f.write(payload)
+        manifest[name] = {"file": name + ".bin", "size": key[1], "time": int(time.time())}
+        tmp = self._manifestPath() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifestPath())
+
+
+payloadCache = PayloadCache(PAYLOAD_CACHE_BUDGET, PAYLOAD_CACHE_DIR)
+
+
+#READER REGISTRY
+NATIVE_NAMESPACE = "Microsoft.Xna.Framework.Content"
+RESOLVE_CACHE_SIZE = 64   # resolved reader tables kept, one per distinct table shape
+
+class ReaderName:
+    #type reader name with assembly, version and generic arity stripped, generic arguments parsed
+    def __init__(self, type_name, args):
+        self.type_name = type_name                          # namespace + class
+        self.namespace, _, self.name = type_name.rpartition(".")
+        self.args = args                                    # ReaderName per generic argument
+        self.normalized = type_name + ("[%s]" % ",".join(a.normalized for a in args) if args else "")
+        self.native = self.namespace.startswith(NATIVE_NAMESPACE)
+
+    def __repr__(self):
+        return self.normalized
+
+
+_parsed_names = {}
+_reader_registry = {}   # full type name or bare class name -> (handler, kind)
+_resolved_tables = {}
+
+def _split_top(s):
+    #split on commas that are not inside [...]
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(s):
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(s[start:i])
+            start = i + 1
+    parts.append(s[start:])
+    return parts
+
+def _matching_bracket(s, start):
+    depth = 0
+    for i in range(start, len(s)):
+        if s[i] == "[":
+            depth += 1
+        elif s[i] == "]":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(s) - 1
+
+def parseReaderName(reader):
+    #"Ns.ListReader`1[[System.Char, mscorlib, Version=..]], Asm, Version=.." -> Ns.ListReader[System.Char]
+    parsed = _parsed_names.get(reader)
+    if parsed is None:
+        type_part = _split_top(reader)[0].strip()
+        args = ()
+        tick = type_part.find("`")
+        if tick != -1:
+            br = type_part.find("[", tick)
+            if br != -1:
+                end = _matching_bracket(type_part, br)
+                arg_names = []
+                for arg in _split_top(type_part[br + 1:end]):
+                    arg = arg.strip()
+                    if arg.startswith("[") and arg.endswith("]"):
+                        arg = arg[1:-1]  #assembly qualified argument
+                    arg_names.append(parseReaderName(arg))
+                args = tuple(arg_names)
+                type_part = type_part[:tick] + type_part[end + 1:]  #keeps an array suffix
+            else:
+                type_part = type_part[:tick]
+        parsed = ReaderName(type_part, args)
+        _parsed_names[reader] = parsed
+    return parsed
+
+def registerReader(name, handler, kind=None):
+    #name is a full type name ("MyGame.Content.LevelReader") or a bare class name ("LevelReader").
+    #handler(bs, outList, header) is called with the stream at the root object, returning 0 on failure.
+    #kind picks the Noesis type check that claims the file ("texture", "model", "spritefont", ...)
+    _reader_registry[name] = (handler, kind)
+    _resolved_tables.clear()
+
+def lookupReader(parsed):
+    entry = _reader_registry.get(parsed.type_name)
+    if entry is None:
+        entry = _reader_registry.get(parsed.name)
+    return entry
+
+def resolveReaders(readers, root_index):
+    #root reader if we can handle it, else the first native/registered reader after it.
+    #Memoized per reader table so files of the same shape cost one dict lookup.
+    key = (tuple(readers), root_index)
+    hit = _resolved_tables.get(key)
+    if hit is not None:
+        return hit
+    hit = (None, None, None)
+    if root_index is not None and 0 <= root_index < len(readers):
+        hit = None
+        for i in range(root_index, len(readers)):
+            parsed = parseReaderName(readers[i])
+            entry = lookupReader(parsed)
+            if parsed.native or entry is not None:
+                hit = (readers[i], parsed, entry)
+                break
+        if hit is None:
+            parsed = parseReaderName(readers[root_index])
+            hit = (readers[root_index], parsed, lookupReader(parsed))
+    if len(_resolved_tables) >= RESOLVE_CACHE_SIZE:
+        _resolved_tables.pop(next(iter(_resolved_tables)))
+    _resolved_tables[key] = hit
+    return hit
+
+
+#BINARY CURSOR
+#precompiled little-endian readers for the XNA primitives, unpack_from raises struct.error past the end
+_U8 = struct.Struct("<B").unpack_from
+_S8 = struct.Struct("<b").unpack_from
+_U16 = struct.Struct("<H").unpack_from
+_S16 = struct.Struct("<h").unpack_from
+_U32 = struct.Struct("<I").unpack_from
+_S32 = struct.Struct("<i").unpack_from
+_S64 = struct.Struct("<q").unpack_from
+_F16 = struct.Struct("<e").unpack_from
+_F32 = struct.Struct("<f").unpack_from
+_F64 = struct.Struct("<d").unpack_from
+_VEC3 = struct.Struct("<3f").unpack_from
+_RECT = struct.Struct("<4i").unpack_from
+_MATRIX = struct.Struct("<16f").unpack_from
+
+class ByteCursor:
+    #NoeBitStream-compatible reader over bytes/bytearray/mmap/memoryview with the length cached,
+    #one precompiled struct call per field and no copies for views
+    __slots__ = ("data", "view", "offset", "size")
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.view = data if isinstance(data, memoryview) else memoryview(data)
+        self.offset = offset
+        self.size = len(data)
+
+    def getBuffer(self):
+        return self.data
+
+    def getSize(self):
+        return self.size
+
+    def getOffset(self):
+        return self.offset
+
+    def seek(self, ofs, origin=NOESEEK_ABS):
+        self.offset = self.offset + ofs if origin == NOESEEK_REL else ofs
+
+    def checkEOF(self):
+        return self.offset >= self.size
+
+    def unpack(self, st):
+        #several fields at once with a precompiled struct.Struct
+        v = st.unpack_from(self.data, self.offset)
+        self.offset += st.size
+        return v
+
+    def readByte(self):
+        v = _S8(self.data, self.offset)[0]
+        self.offset += 1
+        return v
+
+    def readUByte(self):
+        v = _U8(self.data, self.offset)[0]
+        self.offset += 1
+        return v
+
+    def readShort(self):
+        v = _S16(self.data, self.offset)[0]
+        self.offset += 2
+        return v
+
+    def readUShort(self):
+        v = _U16(self.data, self.offset)[0]
+        self.offset += 2
+        return v
+
+    def readInt(self):
+        v = _S32(self.data, self.offset)[0]
+        self.offset += 4
+        return v
+
+    def readUInt(self):
+        v = _U32(self.data, self.offset)[0]
+        self.offset += 4
+        return v
+
+    def readInt64(self):
+        v = _S64(self.data, self.offset)[0]
+        self.offset += 8
+        return v
+
+    def readHalfFloat(self):
+        v = _F16(self.data, self.offset)[0]
+        self.offset += 2
+        return v
+
+    def readFloat(self):
+        v = _F32(self.data, self.offset)[0]
+        self.offset += 4
+        return v
+
+    def readDouble(self):
+        v = _F64(self.data, self.offset)[0]
+        self.offset += 8
+        return v
+
+    def readVector3(self):
+        v = _VEC3(self.data, self.offset)
+        self.offset += 12
+        return v
+
+    def readRectangle(self):
+        #x, y, width, height
+        v = _RECT(self.data, self.offset)
+        self.offset += 16
+        return v
+
+    def readMatrix(self):
+        #16 floats, row major
+        v = _MATRIX(self.data, self.offset)
+        self.offset += 64
+        return v
+
+    def readView(self, size):
+        ofs = self.offset
+        if size < 0 or size > self.size - ofs:
+            raise ValueError("Read of %d bytes runs past end of data" % size)
+        self.offset = ofs + size
+        return self.view[ofs:ofs + size]
+
+    def readBytes(self, size):
+        ofs = self.offset
+        if size < 0 or size > self.size - ofs:
+            raise ValueError("Read of %d bytes runs past end of data" % size)
+        self.offset = ofs + size
+        return bytes(self.view[ofs:ofs + size])
+
+    def read7BitInt(self, max_bytes=5):
+        data, ofs, end = self.data, self.offset, self.size
+        if ofs < end and data[ofs] < 0x80: #single byte, most counts and lengths
+            self.offset = ofs + 1
+            return data[ofs]
+        result = shift = 0
+        for _ in range(max_bytes):
+            if ofs >= end:
+                raise ValueError("Unexpected end of stream.")
+            b = data[ofs]
+            ofs += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                self.offset = ofs
+                return result
+            shift += 7
+        raise ValueError("Err1 Infinite loop watchdog triggered, unsupported file")
+
+    def readToken(self):
+        #shared type id, 0 = null object
+        token = self.read7BitInt()
+        return token - 1 if token else None
+
+    def readString(self):
+        #BinaryWriter string: 7-bit length, UTF-8 bytes
+        return str(self.readView(self.read7BitInt()), "utf-8", "ignore")
+
 
 #ASSET TYPE RESOLVER
+SNIFF_LIMIT = 0x1000      # payload bytes decoded first when sniffing the reader table
+SNIFF_CACHE_SIZE = 4      # sniff results kept for the type checks + LoadAsset
+LZX_FRAME_SIZE = 0x8000
+
 class XNBHeader:
-    def __init__(self, data):
+    def __init__(self, data, payload_limit=None):
         self.raw = data
         self.hidef = False
         self.compressed = False
         self.comp_type = 0
         self.payload = b""
+        self.payload_limit = payload_limit  # None = decode the whole payload
+        self.partial = False                # True when payload is only a prefix
         self._parse()
 
     def _parse(self):
-        bs = NoeBitStream(self.raw, NOE_LITTLEENDIAN)
+        bs = ByteCursor(self.raw)
         magic = bs.readBytes(3)
         if magic != b"XNB":
             noesis.doException("Invalid XNB header")
@@ -93,75 +617,158 @@ class XNBHeader:
         self.comp_type = flags & (COMPRESSED_LZX_MASK | COMPRESSED_LZ4_MASK)
 
         file_size = bs.readUInt()
+        limit = self.payload_limit
+        self.payload_size = len(self.raw) - 10  # full decoded payload, even when only a prefix is read
 
         if self.compressed:
             real_size = bs.readUInt()
+            self.payload_size = real_size
             comp_len = file_size - 14
-            comp_data = bs.readBytes(comp_len)
+            if limit is not None and limit < real_size:
+                #sniffing: bounded decode of a prefix, the payload cache is left alone
+                self.partial = True
+                with profiler.stage("decompress"):
+                    self.payload = self._decompressPrefix(comp_len, real_size, limit)
+                return
+            comp_data = bs.readView(comp_len)
+            key = payloadCache.key(comp_data, real_size)
+            payload = payloadCache.get(key)
+            if payload is not None:
+                self.payload = payload
+                return
 
-            if self.comp_type == COMPRESSED_LZ4_MASK:
-                self.payload = rapi.decompLZ4(comp_data, real_size)
-            elif self.comp_type == COMPRESSED_LZX_MASK:
-                self.payload = rapi.decompXMemLZX(comp_data, real_size, 16, -1, -1)
-            else:
-                noesis.doException("Unsupported compression type")
+            self.payload = self._decompress(comp_data, real_size)
+            if len(self.payload) != real_size:
+                noesis.doException("Decompressed size mismatch")
+            payloadCache.put(key, self.payload)
         else:
-            self.payload = self.raw[10:]  
+            #views into the caller's buffer (bytes or an mmap), the payload is never copied
+            if limit is not None and limit < len(self.raw) - 10:
+                self.partial = True
+                self.payload = memoryview(self.raw)[10:10 + limit]
+            else:
+                self.payload = memoryview(self.raw)[10:]
+
+    def _decompressPrefix(self, comp_len, real_size, limit):
+        #bounded decode: only enough of the stream to cover `limit` payload bytes
+        start, end = 14, 14 + comp_len
+        if self.comp_type == COMPRESSED_LZ4_MASK:
+            return lz4Decompress(self.raw, limit, start, end)
+        elif self.comp_type == COMPRESSED_LZX_MASK:
+            comp_end, out_len = _lzx_frame_prefix(self.raw, start, end, limit)
+            out_len = min(out_len, real_size)
+            return self._decompress(self.raw[start:comp_end], out_len)
+        noesis.doException("Unsupported compression type")
+
+    def _decompress(self, comp_data, size):
+        with profiler.stage("decompress"):
+            return self._decompressWith(comp_data, size)
+
+    def _decompressWith(self, comp_data, size):
+        #rapi when running inside noesis, the built-in decoders otherwise
+        if self.comp_type == COMPRESSED_LZ4_MASK:
+            if RAPI_LZ4:
+                return rapi.decompLZ4(bytes(comp_data), size)
+            return lz4Decompress(comp_data, size)
+        elif self.comp_type == COMPRESSED_LZX_MASK:
+            if RAPI_LZX:
+                return rapi.decompXMemLZX(bytes(comp_data), size, 16, -1, -1)
+            return lzxDecompress(comp_data, size)
+        noesis.doException("Unsupported compression type")
+
+
+class XNBTypeInfo:
+    #reader table of a file, shared by the ChkXnb* handlers and LoadAsset
+    def __init__(self, readers, shared_cnt, root_index, table_end, header):
+        self.readers = readers
+        self.shared_cnt = shared_cnt
+        self.root_index = root_index
+        self.table_end = table_end      # payload offset of the root object
+        self.native_reader, self.reader_name, self.entry = resolveReaders(readers, root_index)
+        self.header = header            # full XNBHeader if the sniff had to decode everything
+
+
+_sniff_cache = {}
+
+def sniffXnb(data):
+    if isinstance(data, bytes):
+        key = (len(data), hash(data))
+    else:  #mmap/memoryview input, hash the buffer in place instead of copying it
+        key = (len(data), hashlib.blake2b(data, digest_size=16).digest())
+    info = _sniff_cache.get(key)
+    if info is not None:
+        return info
+
+    limit = SNIFF_LIMIT
+    while True:
+        header = XNBHeader(data, limit)
+        bs = ByteCursor(header.payload)
+        try:
+            with profiler.stage("readers"):
+                readers, shared_cnt, root_index = readReaderTable(bs)
+            break
+        except ValueError:
+            if not header.partial:
+                raise
+            limit *= 4  # table runs past the decoded prefix, widen the window
+
+    with profiler.stage("readers"):
+        info = XNBTypeInfo(readers, shared_cnt, root_index, bs.getOffset(),
+                           None if header.partial else header)
+    if len(_sniff_cache) >= SNIFF_CACHE_SIZE:
+        _sniff_cache.pop(next(iter(_sniff_cache)))
+    _sniff_cache[key] = info
+    return info
 
 
 def LoadAsset(data, outList):
+    if noesis.optWasInvoked("-xnbprofile"):
+        profiler.enabled = True
+    own = profiler.beginFile(os.path.basename(rapi.getInputName() or ""))
+    try:
+        return _loadAsset(data, outList)
+    finally:
+        if own:
+            rec = profiler.endFile()
+            log(LOG_INFO, profiler.format(rec))
+
+def _loadAsset(data, outList):
     if DEBUG : noesis.logPopup()
     rapi.rpgCreateContext()
-    header = XNBHeader(data)
-    bs = NoeBitStream(header.payload, NOE_LITTLEENDIAN)
-
-    reader_cnt  = read_7bit_encoded_int(bs)
-    readers     = []
-    for _ in range(reader_cnt):
-        name_len   = read_7bit_encoded_int(bs)
-        reader_nm  = bs.readBytes(name_len).decode("utf-8")
-        version    = bs.readUInt()
-        readers.append(reader_nm)
-
-    shared_cnt = read_7bit_encoded_int(bs)
-    root_index = readToken(bs)
+    with profiler.stage("header"):
+        info = sniffXnb(data)
+        header = info.header if info.header is not None else XNBHeader(data)
+    bs = ByteCursor(header.payload, info.table_end)
+
+    readers = info.readers
+    root_index = info.root_index
     if root_index is None or root_index < 0 or root_index >= len(readers):
         noesis.doException("Invalid root reader index")
         return 0
 
-    native_reader = getNativeReader(readers, root_index)
+    header.readers = readers
+    header.shared_cnt = info.shared_cnt
+    header.reader = info.reader_name  # parsed name, generic arguments included
+
+    native_reader = info.native_reader
     if native_reader is None:
         noesis.doException("Could not resolve reader")
         return 0
 
-    print("Root reader:", readers[root_index])
-    print("Chosen reader:", native_reader)
+    log(LOG_VERBOSE, "Root reader:", readers[root_index])
+    log(LOG_VERBOSE, "Chosen reader:", native_reader)
     if readers[root_index] != native_reader:
 
         bs.seek(1,NOESEEK_REL)
 
-    reader = native_reader
-
-
     if outList is None:
         outList = []
 
-    if "Texture2DReader" in reader:
-        Texture2DReader(bs, outList, header)    
-    elif "ModelReader" in reader:
-        ModelReader(bs, outList, header)         
-    elif "SpriteFont" in reader:
-        SpriteFontReader(bs, outList, header)
-
-    elif "SoundEffect" in reader:
-        noesis.messagePrompt("SoundEffect asset is not currently supported!")
+    if info.entry is None:
+        noesis.doException("Unsupported root reader: %s" % native_reader)
         return 0
-    elif "Effect" in reader:
-        noesis.messagePrompt("Effect asset cant be supported as its compiled shader bytecode!")
-        return 0
-
-    else:
-        noesis.doException("Unsupported root reader: %s" % reader)
+    handler, kind = info.entry
+    if handler(bs, outList, header) == 0:
         return 0
 
     return 1
@@ -169,86 +776,32 @@ def LoadAsset(data, outList):
 
 #READERS
 def Texture2DReader(bs, texList,header):
+    surf_fmt = width = height = mip_cnt = None
     try :   
-        
-        def unmultiplyAlpha(rgba):
-            byte_rgba = bytearray(rgba)
-            for i in range(0, len(byte_rgba), 4):
-                a = byte_rgba[i + 3]
-                if a not in (0, 255):
-                    inv = 255.0 / a
-                    byte_rgba[i] = min(int(byte_rgba[i] * inv + 0.5), 255)
-                    byte_rgba[i + 1] = min(int(byte_rgba[i + 1] * inv + 0.5), 255)
-                    byte_rgba[i + 2] = min(int(byte_rgba[i + 2] * inv + 0.5), 255)
-            return byte_rgba
-        
-        surf_fmt = bs.readUInt()
-        width = bs.readUInt()
-        height = bs.readUInt()
-        mip_cnt = bs.readUInt()
-        data_len = bs.readUInt()
-        print(bs.getOffset())
-        img_data = bs.readBytes(data_len)
+        surface = TextureSurface(bs, header)
+        surf_fmt, width, height, mip_cnt = surface.surf_fmt, surface.width, surface.height, surface.mip_cnt
 
         if DEBUG:
             noesis.logPopup()
-            print("[TEX] %dx%d  fmt=%d  len=%d" % (width, height, surf_fmt, data_len))
-        #360--------------------------------------------    
-        if header.platform == PLATFORM_XBOX360:
-            if surf_fmt == 0:
-                rgbma = rapi.imageDecodeRaw(img_data, width, height, "a8b8g8r8")
-                rgba = unmultiplyAlpha(rgbma) 
-                               
-            elif surf_fmt == 1:
-                rgba = rapi.imageDecodeRaw(img_data, width, height, "a8r8g8b8")                 
-                 
-            elif surf_fmt == 4:
-                big_endian_data = rapi.swapEndianArray(img_data, 2)
-                rgba = rapi.imageDecodeDXT(big_endian_data, width, height, noesis.FOURCC_DXT1)                
-                
-            elif surf_fmt == 5 or surf_fmt == 30:
-                big_endian_data = rapi.swapEndianArray(img_data, 2)
-                rgba = rapi.imageDecodeDXT(big_endian_data, width, height, noesis.FOURCC_DXT3)   
-                             
-            elif surf_fmt == 6:
-                big_endian_data = rapi.swapEndianArray(img_data, 2)
-                rgba = rapi.imageDecodeDXT(big_endian_data, width, height, noesis.FOURCC_DXT5)          
-                
-            elif surf_fmt == 28:
-                big_endian_data = rapi.swapEndianArray(img_data, 2)
-                rgba = rapi.imageDecodeDXT(big_endian_data, width, height, noesis.FOURCC_DXT1)
-            
-            elif surf_fmt == 32:
-                big_endian_data = rapi.swapEndianArray(img_data, 2)
-                rgba = rapi.imageDecodeDXT(big_endian_data, width, height, noesis.FOURCC_DXT5)
-            else:
-                noesis.doException("Unsupported SurfaceFormat: %d" % surf_fmt )
-                return                                  
-             
-        #PC---------------------------------
-        elif header.platform == PLATFORM_PC:
-            if surf_fmt == 0:
-                rgbma = rapi.imageDecodeRaw(img_data, width, height, "r8g8b8a8")
-                rgba = unmultiplyAlpha(rgbma)
-                
-            elif surf_fmt == 4:
-                rgba = rapi.imageDecodeDXT(img_data, width, height, noesis.FOURCC_DXT1)
-                
-            elif surf_fmt == 5:
-                rgba = rapi.imageDecodeDXT(img_data, width, height, noesis.FOURCC_DXT3)
-                
-            elif surf_fmt == 6:
-                rgba = rapi.imageDecodeDXT(img_data, width, height, noesis.FOURCC_DXT5)
-                
-            else:
-                noesis.doException("Unsupported SurfaceFormat: %d" % surf_fmt )
+        log(LOG_VERBOSE, "[TEX] %dx%d  fmt=%d  mips=%d" % (width, height, surf_fmt, mip_cnt))
+        key = None
+        if TEXTURE_DEDUP is not None:
+            key = surface.contentKey()
+            if _claimDuplicate(key, width, height, texList, surface):
+                return 1
+
+        start = time.perf_counter()
+        tex = None
+        if TEXTURE_PASSTHROUGH or noesis.optWasInvoked("-xnbpassthrough"):
+            tex = surface.passthroughTexture()
+        if tex is None:
+            rgba = surface.decode(0, keep=False) #the texture takes the only copy
+            if rgba is None:
                 return
-            
-        else:
-            noesis.doException("Unsupported platform: %d" % header.platform )
-            return
-
-        tex = NoeTexture("xnb_tex", width, height, bytes(rgba), noesis.NOESISTEX_RGBA32)
+            tex = NoeTexture("xnb_tex", width, height, bytes(rgba), noesis.NOESISTEX_RGBA32)
+        tex.xnbSurface = surface #exporters can pull the rest of the chain with surface.decode(i)
+        tex.xnbSurfaceKey = key
+        tex.xnbDecodeSecs = time.perf_counter() - start
         texList.append(tex)
 
         return 1
@@ -264,48 +817,467 @@ def Texture2DReader(bs, texList,header):
                 "height",height,"mip",mip_cnt,"PLATFORM",header.platform,"XNA version",header.version)
             if path:      
                 fn = os.path.basename(rapi.getInputName())
-                with open (rapi.getInputName(),"rb") as f:
-                    ogfile = f.read()
                 fname = fn[:-3] + "bin"
                 ds={
-                    fname: bs.getBuffer(),#decompressed stream
-                    os.path.basename(rapi.getInputName()):ogfile
+                    fname: header.payload,#decompressed stream
+                    fn:header.raw
                     
                 }
                 debugData(path,dat,ds)
         
 
+def _claimDuplicate(key, width, height, texList, surface=None):
+    #same surface already exported from another file: placeholder texture, no decode.
+    #surface stays reachable so a SpriteFont can still cut glyphs from it
+    owner = TEXTURE_DEDUP.claim(key)
+    if owner is None:
+        return False
+    tex = NoeTexture("xnb_tex", width, height, b"", noesis.NOESISTEX_RGBA32)
+    tex.xnbSurfaceKey = key
+    tex.xnbDuplicateOf = owner
+    tex.xnbSurface = surface
+    texList.append(tex)
+    return True
+
+def _selectedFace(count):
+    #TEXTURE_FACE / -xnbface <n>: the one cube face or volume slice to decode, None = all
+    face = TEXTURE_FACE
+    if noesis.optWasInvoked("-xnbface"):
+        arg = noesis.optGetArg("-xnbface")
+        try:
+            face = int(arg)
+        except (TypeError, ValueError):
+            raise ValueError("-xnbface expects a face/slice number, got %r" % (arg,))
+    if face is not None and not 0 <= face < count:
+        raise ValueError("Face/slice %d out of range, the texture has %d (0-%d)" % (face, count, count - 1))
+    return face
+
+def TextureCubeReader(bs, texList, header):
+    surf_fmt = size = mip_cnt = face = None
+    try:
+        cube = TextureCubeSurface(bs, header)
+        surf_fmt, size, mip_cnt = cube.surf_fmt, cube.size, cube.mip_cnt
+        log(LOG_VERBOSE, "[CUBE] %dx%d  fmt=%d  mips=%d" % (size, size, surf_fmt, mip_cnt))
+        face = _selectedFace(len(cube.faces))
+        surface = cube if face is None else cube.faces[face]
+        key = None
+        if TEXTURE_DEDUP is not None:
+            key = surface.contentKey()
+            if _claimDuplicate(key, size, size, texList):
+                return 1
+
+        start = time.perf_counter()
+        tex = None
+        if TEXTURE_PASSTHROUGH or noesis.optWasInvoked("-xnbpassthrough"):
+            tex = surface.passthroughTexture()
+        if tex is None:
+            if face is None:
+                tex = cube.toTexture()
+            else:
+                rgba = surface.decode(0, keep=False)
+                tex = NoeTexture("xnb_cube_" + CUBE_FACES[face], size, size, bytes(rgba),
+                                 noesis.NOESISTEX_RGBA32) if rgba is not None else None
+            if tex is None:
+                return 0
+        tex.xnbCube = cube #every face and mip stays reachable through cube.faces[n].decode(i)
+        tex.xnbSurfaceKey = key
+        tex.xnbDecodeSecs = time.perf_counter() - start
+        texList.append(tex)
+        return 1
+    except Exception as e:
+        print(e)
+        noesis.doException(e)
+        if DEBUG == False:
+            path = noesis.userPrompt(
+                noesis.NOEUSERVAL_FOLDERPATH,
+                "We have hit an error! Please create the debug dump or close.",
+                "Please enter a save path for the debug file then submit to the developer",
+            )
+            dat = ("Exception hit in TextureCubeReader", e, "PluginVer", PluginVer, "surfFmt", surf_fmt,
+                   "size", size, "mip", mip_cnt, "face", face, "PLATFORM", header.platform,
+                   "XNA version", header.version)
+            if path:
+                fn = os.path.basename(rapi.getInputName())
+                fname = fn[:-3] + "bin"
+                ds = {
+                    fname: header.payload,  # decompressed stream
+                    fn: header.raw
+                }
+                debugData(path, dat, ds)
+        return 0
+
+def Texture3DReader(bs, texList, header):
+    surf_fmt = width = height = depth = mip_cnt = z = None
+    try:
+        volume = VolumeSurface(bs, header)
+        surf_fmt, width, height, depth, mip_cnt = (volume.surf_fmt, volume.width, volume.height,
+                                                   volume.depth, volume.mip_cnt)
+        log(LOG_VERBOSE, "[VOL] %dx%dx%d  fmt=%d  mips=%d" % (width, height, depth, surf_fmt, mip_cnt))
+        z = _selectedFace(depth)
+        key = None
+        if TEXTURE_DEDUP is not None and z is None:
+            key = volume.contentKey()
+            if _claimDuplicate(key, width, height * depth, texList):
+                return 1
+
+        start = time.perf_counter()
+        if z is None:
+            tex = volume.toTexture()
+        else:
+            rgba = volume.decodeSlice(z)
+            tex = NoeTexture("xnb_slice%d" % z, width, height, bytes(rgba),
+                             noesis.NOESISTEX_RGBA32) if rgba is not None else None
+        if tex is None:
+            return 0
+        tex.xnbVolume = volume #other slices and mips through volume.decodeSlice(z, i)
+        tex.xnbSurfaceKey = key
+        tex.xnbDecodeSecs = time.perf_counter() - start
+        texList.append(tex)
+        return 1
+    except Exception as e:
+        print(e)
+        noesis.doException(e)
+        if DEBUG == False:
+            path = noesis.userPrompt(
+                noesis.NOEUSERVAL_FOLDERPATH,
+                "We have hit an error! Please create the debug dump or close.",
+                "Please enter a save path for the debug file then submit to the developer",
+            )
+            dat = ("Exception hit in Texture3DReader", e, "PluginVer", PluginVer, "surfFmt", surf_fmt,
+                   "width", width, "height", height, "depth", depth, "mip", mip_cnt, "slice", z,
+                   "PLATFORM", header.platform, "XNA version", header.version)
+            if path:
+                fn = os.path.basename(rapi.getInputName())
+                fname = fn[:-3] + "bin"
+                ds = {
+                    fname: header.payload,  # decompressed stream
+                    fn: header.raw
+                }
+                debugData(path, dat, ds)
+        return 0
+
+
+_TEXTURE_HEAD = struct.Struct("<4I") #surface format, width, height, mip count
+
+def _indexLevels(bs, count):
+    #(payload offset, length) of `count` length-prefixed mip levels, skipped without copying
+    levels = []
+    for _ in range(max(count, 1)):
+        data_len = bs.readUInt()
+        ofs = bs.getOffset()
+        bs.readView(data_len)
+        levels.append((ofs, data_len))
+    return levels
+
+class TextureSurface:
+    #Texture2D body with every mip level indexed in one pass, levels are only decoded on request.
+    #head is (format, width, height, mips) when the caller already read it (TextureCube faces)
+    def __init__(self, bs, header, head=None):
+        self.header = header
+        self.platform = header.platform
+        self.surf_fmt, self.width, self.height, self.mip_cnt = head or bs.unpack(_TEXTURE_HEAD)
+        self.buffer = header.payload
+        self.levels = _indexLevels(bs, self.mip_cnt) #leaves the stream after the texture
+        self._decoded = {}
+
+    def levelSize(self, i):
+        return max(1, self.width >> i), max(1, self.height >> i)
+
+    def levelData(self, i):
+        ofs, data_len = self.levels[i]
+        return memoryview(self.buffer)[ofs:ofs + data_len]
+
+    def linearData(self, i):
+        #level data in linear block order, 360 surfaces are stored tiled
+        data = self.levelData(i)
+        if self.platform == PLATFORM_XBOX360:
+            w, h = self.levelSize(i)
+            with profiler.stage("untile"):
+                data = untileXbox360(data, self.surf_fmt, w, h)
+        return data
+
+    def contentKey(self):
+        #identity of the stored surface: platform, format, dimensions and every level's bytes
+        h = hashlib.blake2b(struct.pack("<5I", self.platform, self.surf_fmt, self.width, self.height,
+                                        len(self.levels)), digest_size=16)
+        for i in range(len(self.levels)):
+            h.update(self.levelData(i))
+        return h.hexdigest()
+
+    def dxtType(self):
+        dxt_formats = DXT_FORMATS_360 if self.platform == PLATFORM_XBOX360 else DXT_FORMATS_PC
+        return dxt_formats.get(self.surf_fmt)
+
+    def decode(self, i=0, keep=True):
+        #keep=False when the caller copies the level out right away (texture readers, cube assembly)
+        rgba = self._decoded.get(i)
+        if rgba is None:
+            w, h = self.levelSize(i)
+            data = self.linearData(i)
+            with profiler.stage("pixels"):
+                rgba = decodeSurface(self.platform, self.surf_fmt, data, w, h)
+            if rgba is not None and keep:
+                self._decoded[i] = rgba
+        return rgba
+
+    def decodeAll(self):
+        return [self.decode(i) for i in range(len(self.levels))]
+
+    def passthroughData(self):
+        #block data of every mip level as stored, only 360 data gets its 16-bit swap
+        levels = [self.linearData(i) for i in range(len(self.levels))]
+        if self.platform == PLATFORM_XBOX360:
+            levels = [rapi.swapEndianArray(bytes(level), 2) for level in levels]
+        return b"".join(levels)
+
+    def passthroughTexture(self):
+        tex_type = self.dxtType()
+        if tex_type is None:
+            return None
+        tex = NoeTexture("xnb_tex", self.width, self.height, self.passthroughData(), tex_type)
+        tex.mipCount = len(self.levels)
+        return tex
+
+
+_CUBE_HEAD = struct.Struct("<3I") #surface format, edge size, mip count
+_VOLUME_HEAD = struct.Struct("<5I") #surface format, width, height, depth, mip count
+CUBE_FACES = ("+X", "-X", "+Y", "-Y", "+Z", "-Z") #CubeMapFace order, the same as DDS
+
+class TextureCubeSurface:
+    #TextureCube body: six faces, each a TextureSurface indexing its own mip chain
+    def __init__(self, bs, header):
+        self.platform = header.platform
+        self.surf_fmt, self.size, self.mip_cnt = bs.unpack(_CUBE_HEAD)
+        head = (self.surf_fmt, self.size, self.size, self.mip_cnt)
+        self.faces = [TextureSurface(bs, header, head) for _ in CUBE_FACES]
+
+    def contentKey(self):
+        h = hashlib.blake2b(b"cube", digest_size=16)
+        for face in self.faces:
+            h.update(bytes.fromhex(face.contentKey()))
+        return h.hexdigest()
+
+    def toTexture(self):
+        #faces decoded one at a time straight into the cubemap buffer (top mip of each)
+        face_len = self.size * self.size * 4
+        out = bytearray(face_len * len(self.faces))
+        for n, face in enumerate(self.faces):
+            rgba = face.decode(0, keep=False)
+            if rgba is None:
+                return None
+            out[n * face_len:(n + 1) * face_len] = rgba
+        tex = NoeTexture("xnb_cube", self.size, self.size, bytes(out), noesis.NOESISTEX_RGBA32)
+        tex.setFlags(noesis.NTEXFLAG_CUBEMAP)
+        return tex
+
+    def passthroughTexture(self):
+        #DDS cubemap layout: each face followed by its mips
+        tex_type = self.faces[0].dxtType()
+        if tex_type is None:
+            return None
+        data = b"".join(face.passthroughData() for face in self.faces)
+        tex = NoeTexture("xnb_cube", self.size, self.size, data, tex_type)
+        tex.mipCount = max(self.mip_cnt, 1) #faces index one level when the header says 0
+        tex.setFlags(noesis.NTEXFLAG_CUBEMAP)
+        return tex
+
+
+class VolumeSurface:
+    #Texture3D body: each mip level holds its depth slices back to back, slices are views
+    #into the payload and only decoded on request
+    def __init__(self, bs, header):
+        self.header = header
+        self.platform = header.platform
+        self.surf_fmt, self.width, self.height, self.depth, self.mip_cnt = bs.unpack(_VOLUME_HEAD)
+        self.buffer = header.payload
+        self.levels = _indexLevels(bs, self.mip_cnt)
+
+    def levelSize(self, i):
+        return max(1, self.width >> i), max(1, self.height >> i), max(1, self.depth >> i)
+
+    def sliceData(self, z, i=0):
+        ofs, data_len = self.levels[i]
+        pitch = data_len // self.levelSize(i)[2]
+        return memoryview(self.buffer)[ofs + z * pitch:ofs + (z + 1) * pitch]
+
+    def contentKey(self):
+        h = hashlib.blake2b(struct.pack("<6I", self.platform, self.surf_fmt, self.width, self.height,
+                                        self.depth, len(self.levels)), digest_size=16)
+        for ofs, data_len in self.levels:
+            h.update(memoryview(self.buffer)[ofs:ofs + data_len])
+        return h.hexdigest()
+
+    def decodeSlice(self, z, i=0):
+        if self.platform == PLATFORM_XBOX360:
+            #360 volumes use their own 3D tiling, untileXbox360 only knows 2D surfaces
+            noesis.doException("Xbox 360 Texture3D surfaces are not supported")
+            return None
+        w, h, _ = self.levelSize(i)
+        with profiler.stage("pixels"):
+            return decodeSurface(self.platform, self.surf_fmt, self.sliceData(z, i), w, h)
+
+    def toTexture(self):
+        #slices stacked top to bottom into one width x height*depth image (top mip)
+        slice_len = self.width * self.height * 4
+        out = bytearray(slice_len * self.depth)
+        for z in range(self.depth):
+            rgba = self.decodeSlice(z)
+            if rgba is None:
+                return None
+            out[z * slice_len:(z + 1) * slice_len] = rgba
+        tex = NoeTexture("xnb_volume", self.width, self.height * self.depth, bytes(out), noesis.NOESISTEX_RGBA32)
+        tex.xnbDepth = self.depth
+        return tex
+
+
+def decodeSurface(platform, surf_fmt, img_data, width, height):
+    #one mip level to rgba32
+    #360--------------------------------------------    
+    if platform == PLATFORM_XBOX360:
+        if surf_fmt == 0:
+            rgbma = imageDecodeRaw(img_data, width, height, "a8b8g8r8")
+            with profiler.stage("unmultiply"):
+                return unmultiplyAlpha(rgbma) 
+        elif surf_fmt == 1:
+            return imageDecodeRaw(img_data, width, height, "a8r8g8b8")                 
+        elif surf_fmt in DXT_FORMATS_360:
+            return imageDecodeDXT(img_data, width, height, DXT_FORMATS_360[surf_fmt], swapped=True)
+        noesis.doException("Unsupported SurfaceFormat: %d" % surf_fmt )
+        return None
+         
+    #PC---------------------------------
+    elif platform == PLATFORM_PC:
+        if surf_fmt == 0:
+            rgbma = imageDecodeRaw(img_data, width, height, "r8g8b8a8")
+            with profiler.stage("unmultiply"):
+                return unmultiplyAlpha(rgbma)
+        elif surf_fmt in DXT_FORMATS_PC:
+            return imageDecodeDXT(img_data, width, height, DXT_FORMATS_PC[surf_fmt])
+        noesis.doException("Unsupported SurfaceFormat: %d" % surf_fmt )
+        return None
+
+    noesis.doException("Unsupported platform: %d" % platform )
+    return None
+
+
     
+def SoundEffectReader(bs, outList, header):
+    sound = SoundEffectData(bs, header)
+    log(LOG_INFO, "[SND]", sound.describe())
+    if SOUND_OUTPUT:
+        outList.append(sound)
+        return 1
+    if noesis.optWasInvoked("-xnbwav") and rapi.getInputName():
+        path = os.path.splitext(rapi.getInputName())[0] + sound.extension()
+        sound.writeFile(path)
+        noesis.messagePrompt("SoundEffect written to %s" % path)
+    else:
+        noesis.messagePrompt("SoundEffect: %s\nUse -xnbwav to extract it." % sound.describe())
+    return 0
+
+
+_SOUND_TAIL = struct.Struct("<3i") #loop start, loop length, duration
+
+class SoundEffectData:
+    #WAVEFORMATEX + sample data as views of the payload, written out in fixed-size chunks
+    def __init__(self, bs, header):
+        self.format = bs.readView(bs.readUInt())
+        if len(self.format) < 16:
+            raise ValueError("SoundEffect format block too small")
+        (self.format_tag, self.channels, self.sample_rate, self.avg_bytes,
+         self.block_align, self.bits) = struct.unpack_from("<HHIIHH", self.format)
+        self.data = bs.readView(bs.readUInt())
+        self.loop_start, self.loop_length, self.duration = bs.unpack(_SOUND_TAIL) #duration in ms
+
+    def extension(self):
+        return ".xma" if self.format_tag in WAVE_FORMAT_XMA else ".wav"
+
+    def describe(self):
+        return "%s %dHz %dch %dbit, %d bytes, %.2fs, loop %d+%d" % (
+            WAVE_FORMAT_NAMES.get(self.format_tag, "0x%04X" % self.format_tag), self.sample_rate,
+            self.channels, self.bits, len(self.data), self.duration / 1000.0,
+            self.loop_start, self.loop_length)
+
+    def riffHeader(self):
+        fmt = bytes(self.format)
+        chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + (b"\x00" if len(fmt) & 1 else b"")
+        if self.loop_length > 0:
+            #smpl chunk with one forward loop, start/end in sample frames (end inclusive)
+            chunks += b"smpl" + struct.pack("<I9I", 60, 0, 0, 0, 60, 0, 0, 0, 1, 0)
+            chunks += struct.pack("<6I", 0, 0, self.loop_start, self.loop_start + self.loop_length - 1, 0, 0)
+        data_len = len(self.data)
+        riff_len = 4 + len(chunks) + 8 + data_len + (data_len & 1)
+        return b"RIFF" + struct.pack("<I", riff_len) + b"WAVE" + chunks + b"data" + struct.pack("<I", data_len)
+
+    def writeTo(self, f, chunk_size=SOUND_CHUNK_SIZE):
+        f.write(self.riffHeader())
+        data = self.data
+        for ofs in range(0, len(data), chunk_size):
+            f.write(data[ofs:ofs + chunk_size])
+        if len(data) & 1:
+            f.write(b"\x00")
+
+    def writeFile(self, path, chunk_size=SOUND_CHUNK_SIZE):
+        with open(path, "wb") as f:
+            self.writeTo(f, chunk_size)
+
+
+def EffectReader(bs, outList, header):
+    noesis.messagePrompt("Effect asset cant be supported as its compiled shader bytecode!")
+    return 0
+
 def SpriteFontReader(bs, outList, header):
     try:
         if DEBUG: 
-            print("[SF] Begin SpriteFontReader at 0x%X" % bs.getOffset())
-        tex_tok = readToken(bs)
+            log(LOG_VERBOSE, "[SF] Begin SpriteFontReader at 0x%X" % bs.getOffset())
+        tex_tok = bs.readToken()
         if tex_tok is None:
             noesis.doException("SpriteFont: missing Texture2D token")
             return 0
+        tex_cnt = len(outList)
         Texture2DReader(bs, outList, header)
-        glyphs_tok = readToken(bs)
-        glyphs = _read_rectangle_list(bs) if glyphs_tok is not None else []
-        crop_tok = readToken(bs)
-        cropping = _read_rectangle_list(bs) if crop_tok is not None else []
-        chmap_tok = readToken(bs)
-        character_map = _read_char_list(bs) if chmap_tok is not None else []
+        atlas = outList[tex_cnt] if len(outList) > tex_cnt else None
+        glyphs_tok = bs.readToken()
+        glyphs = _read_rectangle_list(bs) if glyphs_tok is not None else array("i")
+        crop_tok = bs.readToken()
+        cropping = _read_rectangle_list(bs) if crop_tok is not None else array("i")
+        chmap_tok = bs.readToken()
+        character_map = _read_char_list(bs) if chmap_tok is not None else ""
         vertical_line_spacing = bs.readInt()
         horizontal_spacing = bs.readFloat()
-        kerning_tok = readToken(bs)
-        kerning = _read_vector3_list(bs) if kerning_tok is not None else []
+        kerning_tok = bs.readToken()
+        kerning = _read_vector3_list(bs) if kerning_tok is not None else array("f")
         default_char = _read_nullable_char(bs)
 
+        font = SpriteFontData(glyphs, cropping, character_map, vertical_line_spacing,
+                              horizontal_spacing, kerning, default_char)
+        if atlas is not None:
+            font.setAtlas(atlas)
+            atlas.xnbFont = font #exporters write the metrics / glyphs from here
+
         if DEBUG:
-            print("[SF] glyphs:", len(glyphs))
-            print("[SF] cropping:", len(cropping))
+            print("[SF] glyphs:", len(glyphs) // 4)
+            print("[SF] cropping:", len(cropping) // 4)
             print("[SF] charMap:", len(character_map))
             print("[SF] vLineSpacing:", vertical_line_spacing)
             print("[SF] hSpacing:", horizontal_spacing)
-            print("[SF] kerning:", len(kerning))
+            print("[SF] kerning:", len(kerning) // 3)
             print("[SF] defaultChar:", default_char)
 
+        if noesis.optWasInvoked("-xnbfnt") and rapi.getInputName():
+            base = os.path.splitext(rapi.getInputName())[0]
+            with open(base + ".fnt", "w", encoding="utf-8") as f:
+                f.write(font.toBMFont(os.path.basename(base) + ".png", os.path.basename(base)))
+        if noesis.optWasInvoked("-xnbglyphs"):
+            if not font.loadAtlas():
+                log(LOG_INFO, "[SF] atlas could not be decoded, no glyphs exported")
+                return 1
+            for i in range(len(font)):
+                _, _, w, h = font.glyphRect(i)
+                if w and h:
+                    outList.append(NoeTexture("glyph_%04X" % ord(font.chars[i]), w, h,
+                                              font.glyphPixels(i), noesis.NOESISTEX_RGBA32))
+
         return 1
 
     except Exception as e:
@@ -321,24 +1293,104 @@ def SpriteFontReader(bs, outList, header):
                    "PLATFORM", header.platform, "XNA version", header.version)
             if path:
                 fn = os.path.basename(rapi.getInputName())
-                with open(rapi.getInputName(), "rb") as f:
-                    ogfile = f.read()
                 fname = fn[:-3] + "bin"
                 ds = {
-                    fname: bs.getBuffer(),  # decompressed stream
-                    os.path.basename(rapi.getInputName()): ogfile
+                    fname: header.payload,  # decompressed stream
+                    fn: header.raw
                 }
                 debugData(path, dat, ds)
         return 0
     
 
+class SpriteFontData:
+    #SpriteFont tables as packed arrays (4 ints per rectangle, 3 floats per kerning entry),
+    #glyph images are cut out of the decoded atlas as views
+    def __init__(self, glyphs, cropping, chars, line_spacing, spacing, kerning, default_char):
+        self.glyphs = glyphs
+        self.cropping = cropping
+        self.chars = chars
+        self.line_spacing = line_spacing
+        self.spacing = spacing
+        self.kerning = kerning
+        self.default_char = default_char
+        self.atlas = None #(width, height, rgba) once the texture is decoded
+        self.atlas_size = None #(width, height), also set for undecoded (passthrough/duplicate) atlases
+        self.surface = None #TextureSurface of an undecoded atlas, decoded by loadAtlas()
+
+    def __len__(self):
+        return min(len(self.glyphs) // 4, len(self.chars))
+
+    def setAtlas(self, tex):
+        self.atlas_size = (tex.width, tex.height)
+        if tex.pixelType == noesis.NOESISTEX_RGBA32 and len(tex.pixelData) == tex.width * tex.height * 4:
+            self.atlas = (tex.width, tex.height, tex.pixelData)
+        else:
+            self.surface = getattr(tex, "xnbSurface", None)
+
+    def loadAtlas(self):
+        #decode a passthrough or deduplicated atlas on first glyph use, False if there is none
+        if self.atlas is None and self.surface is not None:
+            rgba = self.surface.decode(0, keep=False)
+            if rgba is not None:
+                self.atlas = self.atlas_size + (rgba,)
+        return self.atlas is not None
+
+    def glyphRect(self, i):
+        #atlas rectangle clipped to the texture
+        x, y, w, h = self.glyphs[i * 4:i * 4 + 4]
+        if self.atlas_size is not None:
+            aw, ah = self.atlas_size
+            x, y = min(max(x, 0), aw), min(max(y, 0), ah)
+            w, h = max(0, min(w, aw - x)), max(0, min(h, ah - y))
+        return x, y, w, h
+
+    def glyphView(self, i):
+        #numpy (h, w, 4) view, or one memoryview per row, into the atlas pixels
+        if not self.loadAtlas():
+            raise ValueError("SpriteFont atlas is not decoded")
+        aw, ah, rgba = self.atlas
+        x, y, w, h = self.glyphRect(i)
+        if np is not None:
+            return np.frombuffer(rgba, dtype=np.uint8).reshape(ah, aw, 4)[y:y + h, x:x + w]
+        mv = memoryview(rgba)
+        row = aw * 4
+        return [mv[(y + r) * row + x * 4:(y + r) * row + (x + w) * 4] for r in range(h)]
+
+    def glyphPixels(self, i):
+        view = self.glyphView(i)
+        if np is not None:
+            return view.tobytes()
+        return b"".join(view)
+
+    def toBMFont(self, page_file, face="xnb"):
+        #BMFont text format, XNA draws a glyph at pen + kerning.x + cropping.x/y and advances x+y+z
+        width, height = self.atlas_size or (0, 0)
+        crop, kern = self.cropping, self.kerning
+        lines = ['info face="%s" size=%d bold=0 italic=0 charset="" unicode=1 stretchH=100 smooth=1 aa=1 padding=0,0,0,0 spacing=%d,0'
+                 % (face, self.line_spacing, int(round(self.spacing))),
+                 "common lineHeight=%d base=%d scaleW=%d scaleH=%d pages=1 packed=0"
+                 % (self.line_spacing, self.line_spacing, width, height),
+                 'page id=0 file="%s"' % page_file,
+                 "chars count=%d" % len(self)]
+        for i in range(len(self)):
+            x, y, w, h = self.glyphs[i * 4:i * 4 + 4]
+            cx, cy = (crop[i * 4], crop[i * 4 + 1]) if len(crop) >= i * 4 + 4 else (0, 0)
+            kx, ky, kz = kern[i * 3:i * 3 + 3] if len(kern) >= i * 3 + 3 else (0.0, float(w), 0.0)
+            lines.append("char id=%d x=%d y=%d width=%d height=%d xoffset=%d yoffset=%d xadvance=%d page=0 chnl=15"
+                         % (ord(self.chars[i]), x, y, w, h, int(round(kx)) + cx, cy,
+                            int(round(kx + ky + kz + self.spacing))))
+        return "\n".join(lines) + "\n"
+
+
+_MESH_PART = struct.Struct("<4i") #vertex offset, vertex count, start index, primitive count
+
 def ModelReader(bs, mdlList,header):
     try:
         
     
-        print(header.platform)
+        log(LOG_VERBOSE, "[MDL] PLATFORM:", header.platform)
         if header.platform!= 119:
-            noesis.messagePrompt("Only unskinned models for the PC platform are supported!")
+            noesis.messagePrompt("Only models for the PC platform are supported!")
             return
         rapi.rpgSetOption(noesis.RPGOPT_SWAPHANDEDNESS, 1)#LEFT HANDED
         
@@ -353,19 +1405,20 @@ def ModelReader(bs, mdlList,header):
 
 
         boneCount = bs.readInt()
-        print("[MDL] BONE_COUNT: %d" % boneCount)
+        log(LOG_VERBOSE, "[MDL] BONE_COUNT: %d" % boneCount)
 
         names, parents = [], []
         matrices = []
+        transforms = [] #raw XNA matrices, matched against a SkinningData bind pose
 
         for i in range(boneCount):
-            token = read_7bit_encoded_int(bs)
+            token = bs.read7BitInt()
             if token == 0:
                 bName = "bone_%d" % i
             else:
-                name_len = read_7bit_encoded_int(bs)
-                bName = bs.readBytes(name_len).decode("utf-8", "ignore")
-            mat_floats = [bs.readFloat() for _ in range(16)]
+                bName = bs.readString()
+            mat_floats = bs.readMatrix()
+            transforms.append(mat_floats)
 
             rows = [
                     NoeVec4(mat_floats[0:4]),
@@ -376,7 +1429,8 @@ def ModelReader(bs, mdlList,header):
             mat = NoeMat44(rows).toMat43()
 
             names.append(bName)
-            print("[MDL] [",i,"]" ,bName)
+            if LOG_LEVEL >= LOG_VERBOSE:
+                print("[MDL] [",i,"]" ,bName)
             matrices.append(mat)
 
         for i in range(boneCount):
@@ -389,95 +1443,78 @@ def ModelReader(bs, mdlList,header):
                 
         # Read meshes--------------------------------
         meshCount = bs.readUInt()
-        print("[MDL] MESH_COUNT: ",meshCount)
+        log(LOG_VERBOSE, "[MDL] MESH_COUNT: ",meshCount)
+        meshes = []
         for i in range (meshCount):
-            token = read_7bit_encoded_int(bs)
+            token = bs.read7BitInt()
             if token == 0:
                 mName = "mesh_%d" % i
             else:
-                mame_len = read_7bit_encoded_int(bs)
-                mName = bs.readBytes(mame_len).decode("utf-8", "ignore")
+                mName = bs.readString()
             parentBone = read_bone_reference(bs,boneCount)
-            print("[MDL] MESH_NAME: ",mName)
-            print("[MDL] PARENT_BONE:",parentBone)
+            if LOG_LEVEL >= LOG_VERBOSE:
+                print("[MDL] MESH_NAME: ",mName)
+                print("[MDL] PARENT_BONE:",parentBone)
             #bound sphere
             bs.seek(16,NOESEEK_REL)#vec3 center + float radius
-            print(bs.getOffset())
             
-            read_7bit_encoded_int(bs)
+            bs.read7BitInt()#tag
             
             #ReadMeshParts
             meshPartCount = bs.readInt()
-            print("[MDL] MESH_PT_CNT: ",meshPartCount)
-            for i in range (meshPartCount):
-                print("-- MESHIDX ",i)
-                vertexOff = bs.readInt()
-                vertexCnt = bs.readInt()
-                startIndex= bs.readInt()
-                primCount= bs.readInt() 
-                
-                print("--- VertOffset: ",vertexOff)
-                print("--- VertCount : ",vertexCnt)
-                print("--- StartIndex: ",startIndex)
-                print("--- PrimCount : ",primCount)
-                print(bs.getOffset())
-            read_7bit_encoded_int(bs)   
-            bs.seek(66,NOESEEK_REL)#unk data
-            print(bs.getOffset())
-            if boneCount <= 1:
-                #noesis.messagePrompt("Skinned models are not supported yet")
-                #return 0
-            
-                vertPos=[]
-                uv=[]
-                normals=[]
-                for i in range(vertexCnt):#stride 
-                    X=bs.readFloat()
-                    Y=bs.readFloat()
-                    Z=bs.readFloat()
-                    vertPos.extend((X, Y, Z))
-                    
-                    nX=bs.readFloat()
-                    nY=bs.readFloat()
-                    nZ=bs.readFloat()
-                    normals.extend((nX, nY, nZ))
-                
-                    
-                    u=bs.readFloat()
-                    v=bs.readFloat()
-                    uv.extend((u,v))   
-                    
-                    
-                bs.seek(6,NOESEEK_REL)#unk
-                print(bs.getOffset())
-                
-                indices = []
-                for i in range(primCount):
-                    a=bs.readUShort()
-                    b=bs.readUShort()
-                    c=bs.readUShort()
-                    indices.extend([a, b, c])
-                import struct
-
-            
-                posBuf = struct.pack("<%df" % (len(vertPos)), *vertPos)
-                idxBuf = struct.pack("<%dH" % len(indices), *indices)
-                uvBuf = struct.pack("<%df" % len(uv), *uv)
-                nrmBuf = struct.pack("<%df" % (len(normals)), *normals)
-
-                rapi.rpgSetName(mName)                
-        
-                rapi.rpgBindPositionBuffer(posBuf, noesis.RPGEODATA_FLOAT, 12)
-                rapi.rpgBindUV1Buffer(uvBuf, noesis.RPGEODATA_FLOAT, 8)
-                rapi.rpgBindNormalBuffer  (nrmBuf, noesis.RPGEODATA_FLOAT, 12)
-
-
-                rapi.rpgCommitTriangles(
-                    idxBuf,                     
-                    noesis.RPGEODATA_USHORT,   
-                    len(indices),                
-                    noesis.RPGEO_TRIANGLE      
-                )
+            log(LOG_VERBOSE, "[MDL] MESH_PT_CNT: ",meshPartCount)
+            parts = []
+            for j in range (meshPartCount):
+                vertexOff, vertexCnt, startIndex, primCount = bs.unpack(_MESH_PART)
+                bs.read7BitInt()#tag
+                vbRef = bs.read7BitInt() - 1
+                ibRef = bs.read7BitInt() - 1
+                bs.read7BitInt()#effect
+                if LOG_LEVEL >= LOG_VERBOSE:
+                    print("-- PART %d: vOff %d vCnt %d sIdx %d prims %d vb %d ib %d" %
+                          (j, vertexOff, vertexCnt, startIndex, primCount, vbRef, ibRef))
+                parts.append((vertexOff, vertexCnt, startIndex, primCount, vbRef, ibRef))
+            meshes.append((mName, parts))
+
+        read_bone_reference(bs, boneCount)#root bone
+        skinning = None
+        tag_tok = bs.readToken()
+        if tag_tok is not None:
+            try:
+                skinning = readTagObject(bs, header, tag_tok)
+            except (ValueError, IndexError, struct.error) as e:
+                log(LOG_INFO, "[MDL] Tag:", e)
+            if not isinstance(skinning, SkinningData):
+                #the tag's size is unknown, so the shared resources behind it can't be found
+                noesis.messagePrompt("Model tags are not supported, skipping geometry!")
+                meshes = []
+                skinning = None
+
+        #shared resources follow the root object, each buffer is decoded once on first use
+        shared = SharedResources(bs, header, header.shared_cnt)
+
+        merged = None
+        with profiler.stage("model"):
+            if MODEL_MERGE or noesis.optWasInvoked("-xnbmerge"):
+                merged = MergedGeometry(meshes, shared)
+                if merged.index_count:
+                    rapi.rpgSetName(meshes[0][0] if len(meshes) == 1 else "merged")
+                    bindVertexStreams(merged.streams)
+                    rapi.rpgCommitTriangles(merged.indices, merged.geo_type, merged.index_count, noesis.RPGEO_TRIANGLE)
+                    rapi.rpgClearBufferBinds()
+                meshes = []
+            for mName, parts in meshes:
+                for vertexOff, vertexCnt, startIndex, primCount, vbRef, ibRef in parts:
+                    vb = shared.get(vbRef)
+                    ib = shared.get(ibRef)
+                    if not isinstance(vb, VertexBufferData) or not isinstance(ib, IndexBufferData):
+                        continue
+
+                    rapi.rpgSetName(mName)
+                    bindVertexStreams(vb.streams(), vertexOff, vertexCnt)
+                    idxCnt = primCount * 3
+                    rapi.rpgCommitTriangles(bytes(ib.view(startIndex, idxCnt)), ib.geo_type, idxCnt, noesis.RPGEO_TRIANGLE)
+                    rapi.rpgClearBufferBinds()
 
         noeBones = []
         for i in range(boneCount):
@@ -486,11 +1523,19 @@ def ModelReader(bs, mdlList,header):
         noeBones = rapi.multiplyBones(noeBones)
         rapi.rpgSetOption(noesis.RPGOPT_TRIWINDBACKWARD, 1)
 
-        mdl = rapi.rpgConstructModel()
+        with profiler.stage("model"):
+            mdl = rapi.rpgConstructModel()
         if mdl is None:
             mdl = NoeModel()
 
         mdl.setBones(noeBones)
+        if merged is not None:
+            mdl.xnbSubmeshes = merged.ranges #exporters split the single mesh back up by these
+        if skinning is not None:
+            offset = skinning.boneOffset(parents, transforms)
+            log(LOG_VERBOSE, "[MDL] SkinningData: %d clips, skeleton at bone %d" % (len(skinning.clips), offset))
+            mdl.setAnims([clip.toNoeAnim(name, noeBones, offset) for name, clip in skinning.clips.items()])
+            mdl.xnbSkinning = skinning
         mdlList.append(mdl)
         rapi.setPreviewOption("setSkelToShow", "1")
     except Exception as e:
@@ -503,112 +1548,1248 @@ def ModelReader(bs, mdlList,header):
         dat= ("Exception hit in ModelReader",e,"PluginVer",PluginVer,"PLATFORM",header.platform,"XNA version",header.version)
         if path:      
             fn = os.path.basename(rapi.getInputName())
-            with open (rapi.getInputName(),"rb") as f:
-                ogfile = f.read()
             fname = fn[:-3] + "bin"
             ds={
-                   fname: bs.getBuffer(),#decompressed stream
-                   os.path.basename(rapi.getInputName()):ogfile
+                   fname: header.payload,#decompressed stream
+                   fn:header.raw
                     
                 }
             debugData(path,dat,ds)
         
 
+#SKINNING DATA
+#Model.Tag of the SkinnedModel sample pipeline: SkinningData { Dictionary<string, AnimationClip>,
+#List<Matrix> bind pose, List<Matrix> inverse bind pose, List<int> hierarchy }, AnimationClip
+#{ TimeSpan duration, List<Keyframe> } and Keyframe { int bone, TimeSpan time, Matrix transform }
+TICKS_PER_SECOND = 10000000.0
+ANIM_FRAME_RATE = 30.0
+#keyframe reader -> (body size, bone offset, time offset, transform offset) after the type id,
+#the 3.1 sample's KeyframeWriter wrote the TimeSpan with its own type id
+KEYFRAME_LAYOUTS = {"ReflectiveReader": (76, 0, 4, 12), "KeyframeReader": (77, 0, 5, 13)}
+TAG_PRIMITIVE_READERS = {"StringReader": "readString", "Int32Reader": "readInt", "Int64Reader": "readInt64",
+                         "SingleReader": "readFloat", "TimeSpanReader": "readInt64", "MatrixReader": "readMatrix"}
+TAG_VALUE_TYPES = {"System.Int32": "readInt", "System.Int64": "readInt64", "System.Single": "readFloat",
+                   "System.TimeSpan": "readInt64", "Microsoft.Xna.Framework.Matrix": "readMatrix"}
+
+def readTagObject(bs, header, token):
+    #object written with ContentWriter.WriteObject, type id already read as `token`.
+    #Covers the types SkinningData is built from, raises ValueError for anything else
+    if token is None:
+        return None
+    if not 0 <= token < len(header.readers):
+        raise ValueError("Invalid tag type id %d" % token)
+    parsed = parseReaderName(header.readers[token])
+    name = parsed.name
+    target = tagTarget(parsed)
+    if name in TAG_PRIMITIVE_READERS:
+        return getattr(bs, TAG_PRIMITIVE_READERS[name])()
+    elif name == "DictionaryReader" and len(parsed.args) == 2:
+        out = {}
+        for _ in range(bs.readInt()):
+            key = _readTagValue(bs, header, parsed.args[0])
+            out[key] = _readTagValue(bs, header, parsed.args[1])
+        return out
+    elif name == "ListReader" and len(parsed.args) == 1:
+        return _readTagList(bs, header, parsed.args[0])
+    elif target == "SkinningData":
+        clips = readTagObject(bs, header, bs.readToken())
+        bind_pose = readTagObject(bs, header, bs.readToken())
+        inverse_bind_pose = readTagObject(bs, header, bs.readToken())
+        hierarchy = readTagObject(bs, header, bs.readToken())
+        return SkinningData(clips or {}, bind_pose, inverse_bind_pose, hierarchy)
+    elif target == "AnimationClip":
+        if name == "ReflectiveReader":
+            duration = bs.readInt64()
+        else:
+            duration = readTagObject(bs, header, bs.readToken())
+        keyframes = readTagObject(bs, header, bs.readToken())
+        return AnimationClipData(duration / TICKS_PER_SECOND, *keyframes)
+    raise ValueError("Unsupported tag object: %s" % parsed)
+
+def tagTarget(parsed):
+    #type a tag reader produces: the ReflectiveReader argument, else the reader name minus "Reader"
+    if parsed.name == "ReflectiveReader" and parsed.args:
+        return parsed.args[0].name
+    return parsed.name[:-6]
+
+def _readTagValue(bs, header, arg):
+    #value types are stored raw, everything else as an object with its type id
+    read = TAG_VALUE_TYPES.get(arg.type_name)
+    if read is not None:
+        return getattr(bs, read)()
+    return readTagObject(bs, header, bs.readToken())
+
+def _readTagList(bs, header, arg):
+    count = bs.readInt()
+    if arg.type_name == "Microsoft.Xna.Framework.Matrix":
+        return _le_array("f", bs.readView(count * 64))
+    elif arg.type_name == "System.Int32":
+        return _le_array("i", bs.readView(count * 4))
+    elif arg.name == "Keyframe":
+        return _readKeyframes(bs, header, count)
+    return [_readTagValue(bs, header, arg) for _ in range(count)]
+
+def _readKeyframes(bs, header, count):
+    #List<Keyframe> as columns (bone, time in seconds, 16 floats per transform) read in one block.
+    #Every element is type id + fixed-size body, so the list is a strided record array
+    if count == 0:
+        return array("i"), array("d"), array("f")
+    ofs = bs.getOffset()
+    tid = bs.view[ofs]
+    if not 0 < tid < 0x80 or tid - 1 >= len(header.readers):
+        raise ValueError("Keyframe list holds null or unknown elements")
+    layout = KEYFRAME_LAYOUTS.get(parseReaderName(header.readers[tid - 1]).name)
+    if layout is None:
+        raise ValueError("Unsupported keyframe reader: %s" % header.readers[tid - 1])
+    body, bone_ofs, time_ofs, mat_ofs = layout
+    stride = body + 1
+    block = bs.readView(count * stride)
+    if np is not None:
+        rec = np.frombuffer(block, dtype=np.dtype({
+            "names": ["tid", "bone", "time", "transform"],
+            "formats": ["u1", "<i4", "<i8", ("<f4", (16,))],
+            "offsets": [0, 1 + bone_ofs, 1 + time_ofs, 1 + mat_ofs], "itemsize": stride}))
+        if (rec["tid"] != tid).any():
+            raise ValueError("Keyframe list is not fixed-size")
+        return (rec["bone"].astype(np.int32), rec["time"] / TICKS_PER_SECOND,
+                np.ascontiguousarray(rec["transform"], dtype=np.float32))
+    fmt = "<B%dxi%dxq%dx16f" % (bone_ofs, time_ofs - bone_ofs - 4, mat_ofs - time_ofs - 8)
+    bones, times, mats = array("i"), array("d"), array("f")
+    for rec in struct.iter_unpack(fmt, block):
+        if rec[0] != tid:
+            raise ValueError("Keyframe list is not fixed-size")
+        bones.append(rec[1])
+        times.append(rec[2] / TICKS_PER_SECOND)
+        mats.extend(rec[3:])
+    return bones, times, mats
+
+
+class SkinningData:
+    def __init__(self, clips, bind_pose, inverse_bind_pose, hierarchy):
+        self.clips = clips #name -> AnimationClipData
+        self.bind_pose = bind_pose #16 floats per skeleton bone
+        self.inverse_bind_pose = inverse_bind_pose
+        self.hierarchy = list(hierarchy or ()) #parent skeleton index per bone, -1 for the root
+
+    def boneOffset(self, parents, transforms=None):
+        #model bone index of skeleton bone 0: the skeleton is a run of the model's bones (usually
+        #after the scene root) whose parent links match the hierarchy and whose local transforms
+        #are the bind pose
+        n = len(self.hierarchy)
+        runs = [k for k in range(len(parents) - n + 1)
+                if all(parents[k + i] == k + p for i, p in enumerate(self.hierarchy) if p >= 0)]
+        bind = self.bind_pose
+        if transforms is not None and bind is not None and len(bind) == n * 16:
+            for k in runs:
+                if all(abs(a - b) <= 1e-4 for i in range(n)
+                       for a, b in zip(transforms[k + i], bind[i * 16:i * 16 + 16])):
+                    return k
+        return runs[0] if runs else 0
+
+
+class AnimationClipData:
+    #keyframes as columns sorted by (bone, time), `ranges` maps bone -> (first, end) into them
+    def __init__(self, duration, bones, times, transforms):
+        self.duration = duration
+        n = len(bones)
+        if np is not None:
+            bones = np.asarray(bones, dtype=np.int32)
+            times = np.asarray(times, dtype=np.float64)
+            transforms = np.asarray(transforms, dtype=np.float32).reshape(n, 16)
+            order = np.lexsort((times, bones))
+            self.bones, self.times, self.transforms = bones[order], times[order], transforms[order]
+            ids, starts = np.unique(self.bones, return_index=True)
+            ends = np.append(starts[1:], n)
+            self.ranges = dict(zip(ids.tolist(), zip(starts.tolist(), ends.tolist())))
+        else:
+            order = sorted(range(n), key=lambda i: (bones[i], times[i]))
+            self.bones = array("i", [bones[i] for i in order])
+            self.times = array("d", [times[i] for i in order])
+            self.transforms = array("f")
+            for i in order:
+                self.transforms.extend(transforms[i * 16:i * 16 + 16])
+            self.ranges = {}
+            for i, b in enumerate(self.bones):
+                first, _ = self.ranges.get(b, (i, i))
+                self.ranges[b] = (first, i + 1)
+
+    def __len__(self):
+        return len(self.bones)
+
+    def sample(self, t):
+        #transform of every animated bone at time t: its last keyframe at or before t (what
+        #the sample's AnimationPlayer does), the first keyframe before that
+        ids = sorted(self.ranges)
+        if np is not None:
+            #bone * span + time is sorted like (bone, time) as long as span covers every time and t;
+            #the result is clamped to each bone's own range, like the bisect below
+            lo = min(float(self.times.min()), t) if len(self.times) else t
+            hi = max(float(self.times.max()), t) if len(self.times) else t
+            span = hi - lo + 1.0
+            keys = self.bones * span + (self.times - lo)
+            firsts, ends = np.array([self.ranges[b] for b in ids], dtype=np.int64).reshape(-1, 2).T
+            idx = np.searchsorted(keys, np.array(ids) * span + (t - lo), "right") - 1
+            return ids, self.transforms[np.clip(idx, firsts, ends - 1)]
+        out = []
+        for b in ids:
+            first, end = self.ranges[b]
+            i = max(first, bisect.bisect_right(self.times, t, first, end) - 1)
+            out.append(self.transforms[i * 16:i * 16 + 16])
+        return ids, out
+
+    def toNoeAnim(self, name, noe_bones, bone_offset=0, frame_rate=ANIM_FRAME_RATE):
+        #one NoeKeyFramedBone per animated bone, every transform decomposed in one pass
+        with profiler.stage("anims"):
+            rot, trn, scl = decomposeTransforms(self.transforms)
+            all_times = self.times.tolist() if np is not None else self.times
+            kf_bones = []
+            for b in sorted(self.ranges):
+                if not 0 <= b + bone_offset < len(noe_bones):
+                    continue
+                first, end = self.ranges[b]
+                kf = NoeKeyFramedBone(b + bone_offset)
+                times = all_times[first:end]
+                kf.setRotation([NoeKeyFramedValue(t, NoeQuat(q)) for t, q in zip(times, rot[first:end])],
+                               noesis.NOEKF_ROTATION_QUATERNION_4)
+                kf.setTranslation([NoeKeyFramedValue(t, NoeVec3(v)) for t, v in zip(times, trn[first:end])],
+                                  noesis.NOEKF_TRANSLATION_VECTOR_3)
+                kf.setScale([NoeKeyFramedValue(t, NoeVec3(v)) for t, v in zip(times, scl[first:end])],
+                            noesis.NOEKF_SCALE_VECTOR_3)
+                kf_bones.append(kf)
+            return NoeKeyFramedAnim(name, noe_bones, kf_bones, frame_rate)
+
+def decomposeTransforms(transforms):
+    #row-major XNA matrices (16 floats each) -> rotation quats (x,y,z,w), translations, scales.
+    #Noesis quats are the transpose of XNA's, so xyz come out negated
+    if np is None:
+        out = ([], [], [])
+        for i in range(len(transforms) // 16):
+            for lst, v in zip(out, _decompose(transforms[i * 16:i * 16 + 16])):
+                lst.append(v)
+        return out
+    m = np.asarray(transforms, dtype=np.float64).reshape(-1, 4, 4)
+    rows = m[:, :3, :3]
+    scale = np.linalg.norm(rows, axis=2)
+    flip = np.linalg.det(rows) < 0
+    scale[flip, 0] *= -1.0
+    r = rows / np.where(scale == 0.0, 1.0, scale)[:, :, None]
+    m11, m12, m13 = r[:, 0, 0], r[:, 0, 1], r[:, 0, 2]
+    m21, m22, m23 = r[:, 1, 0], r[:, 1, 1], r[:, 1, 2]
+    m31, m32, m33 = r[:, 2, 0], r[:, 2, 1], r[:, 2, 2]
+    trace = m11 + m22 + m33
+    #Quaternion.CreateFromRotationMatrix, all four branches evaluated and selected per row
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.sqrt(np.maximum(trace + 1.0, 0.0)) * 2.0
+        b0 = np.stack(((m23 - m32) / s, (m31 - m13) / s, (m12 - m21) / s, s / 4.0), axis=1)
+        s = np.sqrt(np.maximum(1.0 + m11 - m22 - m33, 0.0)) * 2.0
+        b1 = np.stack((s / 4.0, (m12 + m21) / s, (m13 + m31) / s, (m23 - m32) / s), axis=1)
+        s = np.sqrt(np.maximum(1.0 + m22 - m11 - m33, 0.0)) * 2.0
+        b2 = np.stack(((m21 + m12) / s, s / 4.0, (m32 + m23) / s, (m31 - m13) / s), axis=1)
+        s = np.sqrt(np.maximum(1.0 + m33 - m11 - m22, 0.0)) * 2.0
+        b3 = np.stack(((m31 + m13) / s, (m32 + m23) / s, s / 4.0, (m12 - m21) / s), axis=1)
+    c0 = trace > 0.0
+    c1 = ~c0 & (m11 >= m22) & (m11 >= m33)
+    c2 = ~c0 & ~c1 & (m22 > m33)
+    q = np.where(c0[:, None], b0, np.where(c1[:, None], b1, np.where(c2[:, None], b2, b3)))
+    q[:, :3] *= -1.0
+    return q.tolist(), m[:, 3, :3].tolist(), scale.tolist()
+
+def _decompose(m):
+    #single-matrix decomposeTransforms for the no-numpy path
+    rows = [list(m[0:3]), list(m[4:7]), list(m[8:11])]
+    scale = [math.sqrt(sum(v * v for v in row)) for row in rows]
+    det = (rows[0][0] * (rows[1][1] * rows[2][2] - rows[1][2] * rows[2][1])
+           - rows[0][1] * (rows[1][0] * rows[2][2] - rows[1][2] * rows[2][0])
+           + rows[0][2] * (rows[1][0] * rows[2][1] - rows[1][1] * rows[2][0]))
+    if det < 0:
+        scale[0] = -scale[0]
+    r = [[v / s if s else v for v in row] for row, s in zip(rows, scale)]
+    (m11, m12, m13), (m21, m22, m23), (m31, m32, m33) = r
+    trace = m11 + m22 + m33
+    if trace > 0.0:
+        s = math.sqrt(trace + 1.0) * 2.0
+        q = ((m23 - m32) / s, (m31 - m13) / s, (m12 - m21) / s, s / 4.0)
+    elif m11 >= m22 and m11 >= m33:
+        s = math.sqrt(max(1.0 + m11 - m22 - m33, 0.0)) * 2.0 or 1.0
+        q = (s / 4.0, (m12 + m21) / s, (m13 + m31) / s, (m23 - m32) / s)
+    elif m22 > m33:
+        s = math.sqrt(max(1.0 + m22 - m11 - m33, 0.0)) * 2.0 or 1.0
+        q = ((m21 + m12) / s, s / 4.0, (m32 + m23) / s, (m31 - m13) / s)
+    else:
+        s = math.sqrt(max(1.0 + m33 - m11 - m22, 0.0)) * 2.0 or 1.0
+        q = ((m31 + m13) / s, (m32 + m23) / s, s / 4.0, (m12 - m21) / s)
+    return [-q[0], -q[1], -q[2], q[3]], list(m[12:15]), scale
+
+
+#DECOMPRESSORS
+RAPI_LZ4 = hasattr(rapi, "decompLZ4")
+RAPI_LZX = hasattr(rapi, "decompXMemLZX")
+
+def lz4Decompress(src, out_size, pos=0, end=None):
+    #LZ4 block format into one preallocated buffer, stops once out_size bytes exist
+    if end is None:
+        end = len(src)
+    out = bytearray(out_size)
+    op = 0
+    while pos < end and op < out_size:
+        token = src[pos]
+        pos += 1
+        n = token >> 4
+        if n == 15:
+            while True:
+                b = src[pos]
+                pos += 1
+                n += b
+                if b != 255:
+                    break
+        if n:
+            lit = src[pos:pos + min(n, out_size - op)]
+            out[op:op + len(lit)] = lit
+            pos += n
+            op += len(lit)
+        if pos >= end or op >= out_size:
+            break
+        off = src[pos] | (src[pos + 1] << 8)
+        pos += 2
+        n = token & 0x0F
+        if n == 15:
+            while True:
+                b = src[pos]
+                pos += 1
+                n += b
+                if b != 255:
+                    break
+        n = min(n + 4, out_size - op)
+        start = op - off
+        if off == 0 or start < 0:
+            raise ValueError("Corrupt LZ4 stream")
+        if off >= n:
+            out[op:op + n] = out[start:start + n]
+        else:  #overlapping match repeats the last `off` bytes
+            out[op:op + n] = (out[start:op] * (n // off + 1))[:n]
+        op += n
+    if op != out_size:
+        del out[op:]
+    return out
+
+LZX_MIN_MATCH = 2
+LZX_NUM_CHARS = 256
+LZX_BLOCK_VERBATIM = 1
+LZX_BLOCK_ALIGNED = 2
+LZX_BLOCK_UNCOMPRESSED = 3
+LZX_NUM_PRIMARY_LENGTHS = 7
+LZX_NUM_SECONDARY_LENGTHS = 249
+LZX_LENGTH_MAXSYMBOLS = 250
+LZX_LENTABLE_SAFETY = 64
+LZX_POSITION_SLOTS = {15: 30, 16: 32, 17: 34, 18: 36, 19: 38, 20: 42, 21: 50}
+
+def _lzx_slot_tables():
+    extra_bits = [0] * 52
+    j = 0
+    for i in range(0, 51, 2):
+        extra_bits[i] = extra_bits[i + 1] = j
+        if i != 0 and j < 17:
+            j += 1
+    position_base = [0] * 51
+    j = 0
+    for i in range(51):
+        position_base[i] = j
+        j += 1 << extra_bits[i]
+    return extra_bits, position_base
+
+LZX_EXTRA_BITS, LZX_POSITION_BASE = _lzx_slot_tables()
+
+def _lzx_decode_table(lens):
+    #canonical huffman -> flat table over the longest code: entry = symbol << 5 | length
+    max_len = max(lens) if lens else 0
+    if max_len == 0:
+        return None, 0
+    table = [0] * (1 << max_len)
+    code = 0
+    for length in range(1, max_len + 1):
+        shift = max_len - length
+        for sym, l in enumerate(lens):
+            if l == length:
+                first = code << shift
+                table[first:first + (1 << shift)] = [(sym << 5) | length] * (1 << shift)
+                code += 1
+        code <<= 1
+    if code >> 1 != 1 << max_len:
+        raise ValueError("Corrupt LZX huffman table")
+    return table, max_len
+
+class LzxDecoder:
+    #XMemLZX as used by XNB (libmspack/MonoGame LzxDecoder semantics), one frame per call
+    def __init__(self, window_bits=16):
+        self.window_size = 1 << window_bits
+        self.window = bytearray(self.window_size)
+        self.window_posn = 0
+        self.main_elements = LZX_NUM_CHARS + LZX_POSITION_SLOTS[window_bits] * 8
+        self.R0 = self.R1 = self.R2 = 1
+        self.header_read = False
+        self.block_type = 0
+        self.block_length = 0
+        self.block_remaining = 0
+        #lengths are delta coded against the previous block, runs may spill past a range
+        self.main_len = [0] * (self.main_elements + LZX_LENTABLE_SAFETY)
+        self.length_len = [0] * (LZX_LENGTH_MAXSYMBOLS + LZX_LENTABLE_SAFETY)
+        self.main_table = self.length_table = self.aligned_table = None
+        self.main_bits = self.length_bits = self.aligned_bits = 0
+
+    #bit input: 16-bit little-endian words, read msb first
+    def _ensure(self, n):
+        src, ip = self.src, self.ip
+        while self.bitsleft < n:
+            w = src[ip] if ip < self.end else 0
+            if ip + 1 < self.end:
+                w |= src[ip + 1] << 8
+            ip += 2
+            self.bitbuf = (self.bitbuf << 16) | w
+            self.bitsleft += 16
+        self.ip = ip
+
+    def _bits(self, n):
+        if n == 0:
+            return 0
+        if self.bitsleft < n:
+            self._ensure(n)
+        self.bitsleft -= n
+        v = self.bitbuf >> self.bitsleft
+        self.bitbuf &= (1 << self.bitsleft) - 1
+        return v
+
+    def _sym(self, table, max_len):
+        if self.bitsleft < max_len:
+            self._ensure(max_len)
+        e = table[self.bitbuf >> (self.bitsleft - max_len)]
+        self.bitsleft -= e & 31
+        self.bitbuf &= (1 << self.bitsleft) - 1
+        return e >> 5
+
+    def _readLengths(self, lens, first, last):
+        pre = [self._bits(4) for _ in range(20)]
+        table, bits = _lzx_decode_table(pre)
+        if table is None:
+            raise ValueError("Corrupt LZX pretree")
+        x = first
+        while x < last:
+            z = self._sym(table, bits)
+            if z == 17:
+                n = self._bits(4) + 4
+                lens[x:x + n] = [0] * n
+                x += n
+            elif z == 18:
+                n = self._bits(5) + 20
+                lens[x:x + n] = [0] * n
+                x += n
+            elif z == 19:
+                n = self._bits(1) + 4
+                z = self._sym(table, bits)
+                z = (lens[x] - z) % 17
+                lens[x:x + n] = [z] * n
+                x += n
+            else:
+                lens[x] = (lens[x] - z) % 17
+                x += 1
+
+    def _readBlockHeader(self):
+        if self.block_type == LZX_BLOCK_UNCOMPRESSED:
+            if self.block_length & 1:
+                self.ip += 1  #realign to a word after an odd-sized raw block
+            self.bitbuf = self.bitsleft = 0
+        self.block_type = self._bits(3)
+        hi = self._bits(16)
+        lo = self._bits(8)
+        self.block_remaining = self.block_length = (hi << 8) | lo
+        if self.block_type == LZX_BLOCK_ALIGNED:
+            self.aligned_table, self.aligned_bits = _lzx_decode_table([self._bits(3) for _ in range(8)])
+        if self.block_type in (LZX_BLOCK_VERBATIM, LZX_BLOCK_ALIGNED):
+            self._readLengths(self.main_len, 0, LZX_NUM_CHARS)
+            self._readLengths(self.main_len, LZX_NUM_CHARS, self.main_elements)
+            self.main_table, self.main_bits = _lzx_decode_table(self.main_len[:self.main_elements])
+            self._readLengths(self.length_len, 0, LZX_NUM_SECONDARY_LENGTHS)
+            self.length_table, self.length_bits = _lzx_decode_table(self.length_len[:LZX_LENGTH_MAXSYMBOLS])
+        elif self.block_type == LZX_BLOCK_UNCOMPRESSED:
+            self._ensure(16)
+            if self.bitsleft > 16:
+                self.ip -= 2  #1-16 pad bits align the raw block
+            self.bitbuf = self.bitsleft = 0
+            self.R0, self.R1, self.R2 = struct.unpack_from("<3I", self.src, self.ip)
+            self.ip += 12
+        else:
+            raise ValueError("Invalid LZX block type %d" % self.block_type)
+
+    def decompressFrame(self, src, pos, end, out, op, frame_size):
+        self.src, self.ip, self.end = src, pos, end
+        self.bitbuf = self.bitsleft = 0
+        if not self.header_read:
+            if self._bits(1):
+                self._bits(32)  #intel E8 filesize, translation is not used by XNB
+            self.header_read = True
+
+        window = self.window
+        window_size = self.window_size
+        wp = self.window_posn & (window_size - 1)
+        frame_start = wp
+        togo = frame_size
+        while togo > 0:
+            if self.block_remaining == 0:
+                self._readBlockHeader()
+            this_run = min(self.block_remaining, togo)
+            togo -= this_run
+            self.block_remaining -= this_run
+            if wp + this_run > window_size:
+                raise ValueError("LZX run crosses the window end")
+
+            block_type = self.block_type
+            if block_type == LZX_BLOCK_UNCOMPRESSED:
+                chunk = src[self.ip:self.ip + this_run]
+                if len(chunk) != this_run:
+                    raise ValueError("Truncated LZX stream")
+                window[wp:wp + this_run] = chunk
+                self.ip += this_run
+                wp += this_run
+                continue
+
+            aligned = block_type == LZX_BLOCK_ALIGNED
+            main_table, main_bits = self.main_table, self.main_bits
+            R0, R1, R2 = self.R0, self.R1, self.R2
+            while this_run > 0:
+                sym = self._sym(main_table, main_bits)
+                if sym < LZX_NUM_CHARS:
+                    window[wp] = sym
+                    wp += 1
+                    this_run -= 1
+                    continue
+                sym -= LZX_NUM_CHARS
+                length = sym & LZX_NUM_PRIMARY_LENGTHS
+                if length == LZX_NUM_PRIMARY_LENGTHS:
+                    length += self._sym(self.length_table, self.length_bits)
+                length += LZX_MIN_MATCH
+                slot = sym >> 3
+                if slot > 2:
+                    extra = LZX_EXTRA_BITS[slot]
+                    offset = LZX_POSITION_BASE[slot] - 2
+                    if not aligned:
+                        offset += self._bits(extra)
+                    elif extra > 3:
+                        offset += self._bits(extra - 3) << 3
+                        offset += self._sym(self.aligned_table, self.aligned_bits)
+                    elif extra == 3:
+                        offset += self._sym(self.aligned_table, self.aligned_bits)
+                    elif extra > 0:
+                        offset += self._bits(extra)
+                    else:
+                        offset = 1
+                    R2, R1, R0 = R1, R0, offset
+                elif slot == 0:
+                    offset = R0
+                elif slot == 1:
+                    offset = R1
+                    R1, R0 = R0, offset
+                else:
+                    offset = R2
+                    R2, R0 = R0, offset
+
+                if wp + length > window_size:
+                    raise ValueError("LZX match runs past the window end")
+                src_pos = wp - offset
+                if src_pos < 0:  #source wraps around to the window end
+                    src_pos += window_size
+                    head = min(window_size - src_pos, length)
+                    window[wp:wp + head] = window[src_pos:src_pos + head]
+                    _lzx_copy(window, wp + head, 0, length - head)
+                else:
+                    _lzx_copy(window, wp, src_pos, length)
+                wp += length
+                this_run -= length
+            self.R0, self.R1, self.R2 = R0, R1, R2
+            if this_run < 0:  #last match ran into the next block
+                if -this_run > self.block_remaining:
+                    raise ValueError("Corrupt LZX stream")
+                self.block_remaining += this_run
+                togo += this_run
+
+        if wp - frame_start != frame_size:
+            raise ValueError("LZX frame decoded past its end")
+        out[op:op + frame_size] = window[frame_start:wp]
+        self.window_posn = wp
+
+def _lzx_copy(window, dst, src, n):
+    if n <= 0:
+        return
+    dist = dst - src
+    if dist >= n or dist < 0:
+        window[dst:dst + n] = window[src:src + n]
+    else:  #overlap repeats the last `dist` bytes
+        window[dst:dst + n] = (window[src:dst] * (n // dist + 1))[:n]
+
+def lzxDecompress(src, out_size, pos=0, end=None):
+    #walk the XNB frame headers, decoding each frame straight into the output buffer
+    if end is None:
+        end = len(src)
+    out = bytearray(out_size)
+    dec = LzxDecoder(16)
+    op = 0
+    while pos < end and op < out_size:
+        hi = src[pos]
+        if hi == 0xFF:
+            frame_size = (src[pos + 1] << 8) | src[pos + 2]
+            block_size = (src[pos + 3] << 8) | src[pos + 4]
+            pos += 5
+        else:
+            frame_size = LZX_FRAME_SIZE
+            block_size = (hi << 8) | src[pos + 1]
+            pos += 2
+        if block_size == 0 or frame_size == 0:
+            break
+        frame_size = min(frame_size, out_size - op)
+        dec.decompressFrame(src, pos, min(pos + block_size, end), out, op, frame_size)
+        op += frame_size
+        pos += block_size
+    if op != out_size:
+        del out[op:]
+    return out
+
+def _lzx_frame_prefix(src, pos, end, limit):
+    #walk XNB LZX frame headers until the frames cover `limit` output bytes
+    out_len = 0
+    while pos < end and out_len < limit:
+        hi = src[pos]
+        if hi == 0xFF:
+            frame_size = (src[pos + 1] << 8) | src[pos + 2]
+            block_size = (src[pos + 3] << 8) | src[pos + 4]
+            pos += 5
+        else:
+            frame_size = LZX_FRAME_SIZE
+            block_size = (hi << 8) | src[pos + 1]
+            pos += 2
+        if block_size == 0 or frame_size == 0:
+            break
+        pos += block_size
+        out_len += frame_size
+    return min(pos, end), out_len
+
+
+#XBOX 360 UNTILING
+#SurfaceFormat -> (block dim in texels, bytes per block) for tiled 360 surfaces
+XBOX360_TEXEL_LAYOUT = {0: (1, 4), 1: (1, 4),
+                        4: (4, 8), 28: (4, 8),
+                        5: (4, 16), 30: (4, 16),
+                        6: (4, 16), 32: (4, 16)}
+
+UNTILE_CACHE_SIZE = 16   # row tables kept, one per (surface width, block size)
+UNTILE_BAND_TILES = 8    # 32-row tile bands gathered per step
+_untile_rows = OrderedDict()
+
+def _xg_tiled_offset(x, y, width, log_bpp):
+    #XGAddress2DTiledOffset, works on plain ints and on numpy int arrays alike
+    aligned_width = (width + 31) & ~31
+    macro = ((x >> 5) + (y >> 5) * (aligned_width >> 5)) << (log_bpp + 7)
+    micro = ((x & 7) + ((y & 6) << 2)) << log_bpp
+    offset = macro + ((micro & ~15) << 1) + (micro & 15) + ((y & 8) << (3 + log_bpp)) + ((y & 1) << 4)
+    return (((offset & ~511) << 3) + ((offset & 448) << 2) + (offset & 63) +
+            ((y & 16) << 7) + (((((y & 8) >> 2) + (x >> 3)) & 3) << 6)) >> log_bpp
+
+def untileRows(blocks_w, bpb):
+    #tiled block index of the first 32 rows (one row of 32x32-block macro tiles). Macro tiles
+    #only add (tile x + tile y * tiles per row) << 10 on top of that, so any row y reads
+    #rows[y & 31] + (y >> 5) * tileRowStride(blocks_w)
+    key = (blocks_w, bpb, np is not None)
+    rows = _untile_rows.get(key)
+    if rows is not None:
+        _untile_rows.move_to_end(key)
+        return rows
+    log_bpp = (bpb >> 2) + ((bpb >> 1) >> (bpb >> 2))
+    if np is not None:
+        y = np.arange(32, dtype=np.int32)[:, None]
+        x = np.arange(blocks_w, dtype=np.int32)[None, :]
+        rows = _xg_tiled_offset(x, y, blocks_w, log_bpp).astype(np.int32)
+    else:
+        #in 4-byte units so one array("I") gather moves any block size
+        lanes = bpb // 4
+        rows = []
+        for y in range(32):
+            row = array("I")
+            for x in range(blocks_w):
+                base = _xg_tiled_offset(x, y, blocks_w, log_bpp) * lanes
+                row.extend(range(base, base + lanes))
+            rows.append(row)
+    _untile_rows[key] = rows
+    if len(_untile_rows) > UNTILE_CACHE_SIZE:
+        _untile_rows.popitem(last=False)
+    return rows
+
+def tileRowStride(blocks_w):
+    return ((blocks_w + 31) >> 5) << 10
+
+def untileXbox360(data, surf_fmt, width, height):
+    #reorder a tiled 360 surface into linear block order, gathered one band of tile rows at a time
+    layout = XBOX360_TEXEL_LAYOUT.get(surf_fmt)
+    if layout is None:
+        return data
+    dim, bpb = layout
+    blocks_w = max(1, (width + dim - 1) // dim)
+    blocks_h = max(1, (height + dim - 1) // dim)
+    rows = untileRows(blocks_w, bpb)
+    stride = tileRowStride(blocks_w)
+    last_ty = (blocks_h - 1) >> 5
+    if np is not None:
+        #highest block read: last tile row's rows, or a full tile row before it
+        need = int(rows[:((blocks_h - 1) & 31) + 1].max()) + last_ty * stride
+        if last_ty:
+            need = max(need, int(rows.max()) + (last_ty - 1) * stride)
+        need = (need + 1) * bpb
+        src = np.frombuffer(data, dtype=np.uint8)
+        if len(src) < need: #small mips are not always stored padded to a full tile
+            src = np.concatenate((src, np.zeros(need - len(src), dtype=np.uint8)))
+        src = src[:need].reshape(-1, bpb)
+        out = np.empty((blocks_h, blocks_w, bpb), dtype=np.uint8)
+        band = 32 * UNTILE_BAND_TILES
+        for y0 in range(0, blocks_h, band):
+            n = min(band, blocks_h - y0)
+            ys = np.arange(y0, y0 + n, dtype=np.int32)
+            idx = rows[ys & 31] + ((ys >> 5) * stride)[:, None]
+            np.take(src, idx, axis=0, out=out[y0:y0 + n])
+        return out.tobytes()
+    stride *= bpb // 4 #rows are in 4-byte units here
+    need = max(max(r) for r in rows[:min(blocks_h, 32)]) + last_ty * stride
+    if last_ty:
+        need = max(need, max(max(r) for r in rows) + (last_ty - 1) * stride)
+    need = (need + 1) * 4
+    src = bytes(data)
+    if len(src) < need:
+        src += bytes(need - len(src))
+    units = array("I", src[:need])
+    out = array("I")
+    for y in range(blocks_h):
+        out.extend(map(units.__getitem__, map(((y >> 5) * stride).__add__, rows[y & 31])))
+    return out.tobytes()
+
+
+#BLOCK DECODERS
+#whole-surface numpy decoders: every block is expanded at once, no per-block python loop.
+#360 data is read through big-endian 16-bit views, which undoes its swap without a copy
+_BLOCK_BYTES = {noesis.NOESISTEX_DXT1: 8, noesis.NOESISTEX_DXT3: 16, noesis.NOESISTEX_DXT5: 16}
+_decode_pool = None
+
+def _rgb565(c):
+    #(n,) uint16 -> (n, 3) int32 with the low bits replicated
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1).astype(np.int32)
+
+def _decodeColorBlocks(words, alpha_mode):
+    #words: (n, 4) uint16 color block = c0, c1, index low, index high -> (n, 16, 4) uint8
+    n = len(words)
+    c0, c1 = words[:, 0], words[:, 1]
+    p0, p1 = _rgb565(c0), _rgb565(c1)
+    pal = np.empty((n, 4, 4), dtype=np.int32)
+    pal[:, 0, :3], pal[:, 1, :3] = p0, p1
+    pal[:, 2, :3] = (2 * p0 + p1) // 3
+    pal[:, 3, :3] = (p0 + 2 * p1) // 3
+    pal[:, :, 3] = 255
+    if alpha_mode:
+        #DXT1 three-color mode when c0 <= c1: midpoint and transparent black
+        three = c0 <= c1
+        pal[three, 2, :3] = (p0[three] + p1[three]) // 2
+        pal[three, 3] = 0
+    bits = words[:, 2].astype(np.uint32) | (words[:, 3].astype(np.uint32) << 16)
+    sel = ((bits[:, None] >> (np.arange(16, dtype=np.uint32) * 2)) & 3).astype(np.intp)
+    sel += np.arange(0, n * 4, 4, dtype=np.intp)[:, None]
+    #palette entries as packed rgba words, one flat gather for all texels
+    pal32 = pal.astype(np.uint8).view("<u4").reshape(-1)
+    return pal32.take(sel).view(np.uint8).reshape(n, 16, 4)
+
+def _decodeAlphaBlocks(words):
+    #DXT5 alpha block as (n, 4) uint16: a0 | a1 << 8, then 48 bits of 3-bit indices -> (n, 16)
+    a0 = (words[:, 0] & 0xFF).astype(np.int32)
+    a1 = (words[:, 0] >> 8).astype(np.int32)
+    i = np.arange(1, 7, dtype=np.int32)
+    pal = np.empty((len(words), 8), dtype=np.int32)
+    pal[:, 0], pal[:, 1] = a0, a1
+    pal[:, 2:] = ((7 - i) * a0[:, None] + i * a1[:, None]) // 7
+    six = a0 <= a1
+    if six.any():
+        j = np.arange(1, 5, dtype=np.int32)
+        pal[six, 2:6] = ((5 - j) * a0[six, None] + j * a1[six, None]) // 5
+        pal[six, 6] = 0
+        pal[six, 7] = 255
+    bits = (words[:, 1].astype(np.uint64) | (words[:, 2].astype(np.uint64) << np.uint64(16))
+            | (words[:, 3].astype(np.uint64) << np.uint64(32)))
+    sel = ((bits[:, None] >> (np.arange(16, dtype=np.uint64) * np.uint64(3))) & np.uint64(7)).astype(np.intp)
+    sel += np.arange(0, len(words) * 8, 8, dtype=np.intp)[:, None]
+    return pal.astype(np.uint8).reshape(-1).take(sel)
+
+def _decodeBlockRows(words, tex_type):
+    #(n, 4|8) uint16 blocks -> (n, 16, 4) rgba
+    if tex_type == noesis.NOESISTEX_DXT1:
+        return _decodeColorBlocks(words, True)
+    px = _decodeColorBlocks(words[:, 4:], False)
+    if tex_type == noesis.NOESISTEX_DXT3:
+        #four rows of 4-bit alpha, low nibble first
+        nib = (words[:, :4, None] >> (np.arange(4, dtype=np.uint16) * 4)) & 15
+        px[:, :, 3] = nib.reshape(-1, 16) * 17
+    else:
+        px[:, :, 3] = _decodeAlphaBlocks(words[:, :4])
+    return px
+
+def decodeBlocks(data, width, height, tex_type, swapped=False):
+    #DXT1/3/5 surface -> rgba32 bytearray, `swapped` for 360 16-bit swapped block data
+    global _decode_pool
+    block_bytes = _BLOCK_BYTES[tex_type]
+    blocks_w, blocks_h = max(1, (width + 3) // 4), max(1, (height + 3) // 4)
+    need = blocks_w * blocks_h * block_bytes
+    if len(data) < need:
+        raise ValueError("DXT data too short: %d of %d bytes" % (len(data), need))
+    words = np.frombuffer(data, dtype=">u2" if swapped else "<u2", count=need // 2)
+    words = words.reshape(blocks_h, blocks_w, block_bytes // 2)
+    out = np.empty((blocks_h, 4, blocks_w, 4, 4), dtype=np.uint8)
+
+    def band(y0, y1):
+        px = _decodeBlockRows(words[y0:y1].reshape(-1, block_bytes // 2), tex_type)
+        out[y0:y1] = px.reshape(y1 - y0, blocks_w, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+
+    rows = max(1, DECODE_BAND_BLOCKS // blocks_w)
+    if DECODE_THREADS > 1 and blocks_h > rows:
+        #numpy releases the GIL in the heavy calls, bands of block rows decode in parallel
+        if _decode_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _decode_pool = ThreadPoolExecutor(DECODE_THREADS)
+        list(_decode_pool.map(lambda y0: band(y0, min(y0 + rows, blocks_h)), range(0, blocks_h, rows)))
+    else:
+        band(0, blocks_h)
+    out = out.reshape(blocks_h * 4, blocks_w * 4, 4)
+    if out.shape[0] != height or out.shape[1] != width:
+        out = out[:height, :width]
+    return bytearray(out.tobytes())
+
+def decodeRaw32(data, width, height, layout):
+    #8888 layout such as "a8b8g8r8" (byte order) -> rgba32 bytearray
+    order = layout[0::2]
+    if layout[1::2] != "8888" or sorted(order) != ["a", "b", "g", "r"]:
+        raise ValueError("Unsupported raw layout %s" % layout)
+    px = np.frombuffer(data, dtype=np.uint8, count=width * height * 4).reshape(-1, 4)
+    return bytearray(px[:, [order.index(ch) for ch in "rgba"]].tobytes())
+
+def imageDecodeRaw(data, width, height, layout):
+    if not RAPI_IMAGE_RAW:
+        if np is None:
+            noesis.doException("32bpp decoding needs Noesis or numpy")
+        return decodeRaw32(data, width, height, layout)
+    return rapi.imageDecodeRaw(bytes(data), width, height, layout)
+
+def imageDecodeDXT(data, width, height, tex_type, swapped=False):
+    if not RAPI_IMAGE_DXT:
+        if np is None:
+            noesis.doException("DXT decoding needs Noesis or numpy")
+        return decodeBlocks(data, width, height, tex_type, swapped)
+    data = bytes(data)
+    if swapped:
+        data = rapi.swapEndianArray(data, 2)
+    return rapi.imageDecodeDXT(data, width, height, DXT_FOURCC[tex_type])
+
+
+#VERTEX DECLARATIONS
+#VertexElementFormat -> (byte size, components, RPGEODATA type, normalized short)
+VERTEX_FORMATS = {
+    0:  (4, 1, noesis.RPGEODATA_FLOAT, False),      #Single
+    1:  (8, 2, noesis.RPGEODATA_FLOAT, False),      #Vector2
+    2:  (12, 3, noesis.RPGEODATA_FLOAT, False),     #Vector3
+    3:  (16, 4, noesis.RPGEODATA_FLOAT, False),     #Vector4
+    4:  (4, 4, noesis.RPGEODATA_UBYTE, False),      #Color
+    5:  (4, 4, noesis.RPGEODATA_UBYTE, False),      #Byte4
+    6:  (4, 2, noesis.RPGEODATA_SHORT, False),      #Short2
+    7:  (8, 4, noesis.RPGEODATA_SHORT, False),      #Short4
+    8:  (4, 2, noesis.RPGEODATA_FLOAT, True),       #NormalizedShort2
+    9:  (8, 4, noesis.RPGEODATA_FLOAT, True),       #NormalizedShort4
+    10: (4, 2, noesis.RPGEODATA_HALFFLOAT, False),  #HalfVector2
+    11: (8, 4, noesis.RPGEODATA_HALFFLOAT, False),  #HalfVector4
+}
+
+USAGE_POSITION = 0
+USAGE_COLOR = 1
+USAGE_TEXCOORD = 2
+USAGE_NORMAL = 3
+USAGE_BLENDINDICES = 6
+USAGE_BLENDWEIGHT = 7
+
+_vertex_plans = {}
+
+class VertexBufferData:
+    def __init__(self, stride, elements, count, data):
+        self.stride = stride
+        self.elements = elements
+        self.count = count
+        self.data = data
+        self.plan = compileVertexPlan(stride, elements)
+        self._streams = None
+
+    def streams(self):
+        #whole buffer decoded once, parts bind views into it
+        if self._streams is None:
+            with profiler.stage("vertices"):
+                self._streams = decodeVertices(self.plan, self.data, self.count)
+            self.data = None
+        return self._streams
+
+class IndexBufferData:
+    def __init__(self, sixteen_bits, data):
+        self.sixteen_bits = sixteen_bits
+        self.data = data
+        if sixteen_bits:
+            self.index_size = 2
+            self.geo_type = noesis.RPGEODATA_USHORT
+        else:
+            self.index_size = 4
+            self.geo_type = noesis.RPGEODATA_UINT
+
+    def view(self, start, count):
+        size = self.index_size
+        return memoryview(self.data)[start * size:(start + count) * size]
+
+def compileVertexPlan(stride, elements):
+    #one plan per declaration signature: (usage, usage index, offset, size, comps, geo type, normalized)
+    sig = (stride, tuple(elements))
+    plan = _vertex_plans.get(sig)
+    if plan is not None:
+        return plan
+    plan = []
+    for offset, fmt, usage, usage_index in elements:
+        if usage not in (USAGE_POSITION, USAGE_COLOR, USAGE_TEXCOORD, USAGE_NORMAL,
+                         USAGE_BLENDINDICES, USAGE_BLENDWEIGHT):
+            continue  #tangents, binormals etc. are rebuilt by noesis
+        if fmt not in VERTEX_FORMATS:
+            log(LOG_INFO, "[MDL] Unsupported VertexElementFormat %d, usage %d skipped" % (fmt, usage))
+            continue
+        size, comps, geo_type, normalized = VERTEX_FORMATS[fmt]
+        plan.append((usage, usage_index, offset, size, comps, geo_type, normalized))
+    plan = tuple(plan)
+    _vertex_plans[sig] = plan
+    return plan
+
+def decodeVertices(plan, data, count):
+    stride = len(data) // count if count else 0
+    streams = []
+    for usage, usage_index, offset, size, comps, geo_type, normalized in plan:
+        buf = _gather(data, stride, offset, size, count)
+        if normalized:
+            buf = _normalized_shorts_to_floats(buf)
+        elem_stride = comps * 4 if normalized else size
+        streams.append((usage, usage_index, buf, geo_type, elem_stride, comps))
+    return streams
+
+def bindVertexStreams(streams, first=0, count=None):
+    for usage, usage_index, buf, geo_type, elem_stride, comps in streams:
+        if count is not None:
+            buf = memoryview(buf)[first * elem_stride:(first + count) * elem_stride]
+        buf = bytes(buf)  #noesis' rpgBind* calls take bytes, not memoryviews or bytearrays
+        if usage == USAGE_POSITION and usage_index == 0:
+            rapi.rpgBindPositionBuffer(buf, geo_type, elem_stride)
+        elif usage == USAGE_NORMAL and usage_index == 0:
+            rapi.rpgBindNormalBuffer(buf, geo_type, elem_stride)
+        elif usage == USAGE_TEXCOORD:
+            if usage_index == 0:
+                rapi.rpgBindUV1Buffer(buf, geo_type, elem_stride)
+            elif usage_index == 1:
+                rapi.rpgBindUV2Buffer(buf, geo_type, elem_stride)
+            else:
+                rapi.rpgBindUVXBuffer(buf, geo_type, elem_stride, usage_index, comps)
+        elif usage == USAGE_COLOR and usage_index == 0:
+            rapi.rpgBindColorBuffer(buf, geo_type, elem_stride, comps)
+        elif usage == USAGE_BLENDINDICES and usage_index == 0:
+            rapi.rpgBindBoneIndexBuffer(buf, geo_type, elem_stride, comps)
+        elif usage == USAGE_BLENDWEIGHT and usage_index == 0:
+            rapi.rpgBindBoneWeightBuffer(buf, geo_type, elem_stride, comps)
+
+class MergedGeometry:
+    #every mesh part in one preallocated buffer per attribute and one rebased index buffer.
+    #parts drawing the same vertex range share it, `ranges` keeps each part's identity as
+    #(mesh name, part index, first index, index count, first vertex, vertex count)
+    def __init__(self, meshes, shared):
+        parts = []
+        placed = {}  #(vb ref, vertex offset, count) -> merged first vertex
+        layout = {}  #(usage, usage index) -> (geo type, element stride, comps)
+        vert_total = 0
+        for mName, mesh_parts in meshes:
+            for j, (vertexOff, vertexCnt, startIndex, primCount, vbRef, ibRef) in enumerate(mesh_parts):
+                vb = shared.get(vbRef)
+                ib = shared.get(ibRef)
+                if not isinstance(vb, VertexBufferData) or not isinstance(ib, IndexBufferData):
+                    continue
+                vertexCnt = max(0, min(vertexCnt, vb.count - vertexOff))
+                key = (vbRef, vertexOff, vertexCnt)
+                if key not in placed:
+                    placed[key] = vert_total
+                    vert_total += vertexCnt
+                    for usage, usage_index, buf, geo_type, elem_stride, comps in vb.streams():
+                        layout.setdefault((usage, usage_index), (geo_type, elem_stride, comps))
+                idx = ib.view(startIndex, primCount * 3)
+                parts.append((mName, j, vb, ib, idx, key, placed[key]))
+
+        self.vertex_count = vert_total
+        self.index_count = sum(len(p[4]) // p[3].index_size for p in parts)
+        self.sixteen_bits = vert_total <= 0x10000
+        self.geo_type = noesis.RPGEODATA_USHORT if self.sixteen_bits else noesis.RPGEODATA_UINT
+        buffers = {k: bytearray(vert_total * elem_stride) for k, (_, elem_stride, _) in layout.items()}
+
+        #vertices: one slice copy per distinct range and attribute
+        copied = set()
+        for mName, j, vb, ib, idx, key, first in parts:
+            if key in copied:
+                continue
+            copied.add(key)
+            _, vertexOff, vertexCnt = key
+            for usage, usage_index, buf, geo_type, elem_stride, comps in vb.streams():
+                dst_type, dst_stride, _ = layout[(usage, usage_index)]
+                if (geo_type, elem_stride) != (dst_type, dst_stride):
+                    log(LOG_INFO, "[MDL] %s: vertex format differs from the first part, attribute left empty" % mName)
+                    continue
+                memoryview(buffers[(usage, usage_index)])[first * elem_stride:(first + vertexCnt) * elem_stride] = \
+                    memoryview(buf)[vertexOff * elem_stride:(vertexOff + vertexCnt) * elem_stride]
+        self.streams = [(usage, usage_index, buffers[(usage, usage_index)], geo_type, elem_stride, comps)
+                        for (usage, usage_index), (geo_type, elem_stride, comps) in layout.items()]
+
+        #indices: concatenated as stored, then every part rebased onto its merged first vertex at once
+        self.ranges = []
+        counts, bases = [], []
+        ofs = 0
+        for mName, j, vb, ib, idx, key, first in parts:
+            n = len(idx) // ib.index_size
+            self.ranges.append((mName, j, ofs, n, first, key[2]))
+            counts.append(n)
+            bases.append(first)
+            ofs += n
+        if np is not None:
+            out = np.empty(self.index_count, dtype="<u2" if self.sixteen_bits else "<u4")
+            ofs = 0
+            for mName, j, vb, ib, idx, key, first in parts:
+                n = len(idx) // ib.index_size
+                out[ofs:ofs + n] = np.frombuffer(idx, dtype="<u2" if ib.sixteen_bits else "<u4", count=n)
+                ofs += n
+            out += np.repeat(np.array(bases, dtype=out.dtype), counts)
+            self.indices = out.tobytes()
+        else:
+            out = array("H" if self.sixteen_bits else "I")
+            for mName, j, vb, ib, idx, key, first in parts:
+                part = _le_array("H" if ib.sixteen_bits else "I", idx[:len(idx) - len(idx) % ib.index_size])
+                out.extend(map(first.__add__, part) if first else part)
+            if sys.byteorder != "little":
+                out.byteswap()
+            self.indices = out.tobytes()
+
+_VERTEX_ELEMENT = struct.Struct("<IiiI") #offset, format, usage, usage index
+
+def readVertexBuffer(bs):
+    stride = bs.readUInt()
+    elem_cnt = bs.readUInt()
+    elements = []
+    for _ in range(elem_cnt):
+        elements.append(bs.unpack(_VERTEX_ELEMENT))
+    vert_cnt = bs.readUInt()
+    data = bs.readView(vert_cnt * stride)
+    return VertexBufferData(stride, elements, vert_cnt, data)
+
+def readIndexBuffer(bs):
+    sixteen_bits = bs.readUByte() != 0
+    data_len = bs.readUInt()
+    data = bs.readView(data_len)
+    return IndexBufferData(sixteen_bits, data)
+
+#effect reader -> (external references, fixed bytes after them)
+EFFECT_LAYOUTS = {
+    "BasicEffectReader": (1, 45),
+    "SkinnedEffectReader": (1, 48),
+    "AlphaTestEffectReader": (1, 25),
+    "DualTextureEffectReader": (2, 17),
+    "EnvironmentMapEffectReader": (2, 48),
+}
+
+class SharedResources:
+    #offset index over the shared-resource section, resources materialized lazily and once
+    def __init__(self, bs, header, count):
+        self.bs = bs
+        self.header = header
+        self.index = []  #(reader class, body offset)
+        self.cache = {}
+        for _ in range(count):
+            try:
+                self.index.append(self._scan())
+            except ValueError as e:
+                log(LOG_INFO, "[MDL]", e)  #parts past an unreadable resource are dropped
+                break
+
+    def _scan(self):
+        return scanSharedResource(self.bs, self.header.readers)
+
+    def get(self, i):
+        if i in self.cache:
+            return self.cache[i]
+        if not 0 <= i < len(self.index):
+            return None
+        name, start = self.index[i]
+        bs = self.bs
+        saved = bs.getOffset()
+        bs.seek(start)
+        if name == "VertexBufferReader":
+            res = readVertexBuffer(bs)
+        elif name == "IndexBufferReader":
+            res = readIndexBuffer(bs)
+        else:
+            res = None  #effects are not materialized
+        bs.seek(saved)
+        self.cache[i] = res
+        return res
+
 #HELPERS
+def scanSharedResource(bs, readers):
+    #skip one shared resource without reading its data: (reader class, body offset)
+    tok = bs.readToken()
+    if tok is None:
+        return (None, bs.getOffset())
+    if not 0 <= tok < len(readers):
+        raise ValueError("Shared resource reader index %d out of range" % tok)
+    reader = readers[tok]
+    name = parseReaderName(reader).name
+    start = bs.getOffset()
+    if name == "VertexBufferReader":
+        stride = bs.readUInt()
+        bs.seek(bs.readUInt() * 16, NOESEEK_REL)
+        bs.seek(bs.readUInt() * stride, NOESEEK_REL)
+    elif name == "IndexBufferReader":
+        bs.seek(1, NOESEEK_REL)
+        bs.seek(bs.readUInt(), NOESEEK_REL)
+    elif name in EFFECT_LAYOUTS:
+        ext_refs, fixed = EFFECT_LAYOUTS[name]
+        for _ in range(ext_refs):
+            bs.seek(bs.read7BitInt(), NOESEEK_REL)
+        bs.seek(fixed, NOESEEK_REL)
+    elif name == "EffectReader":
+        bs.seek(bs.readUInt(), NOESEEK_REL)
+    else:
+        raise ValueError("Unsupported shared resource: %s" % reader)
+    return (name, start)
 
 def getFileType(data):
     try:
-        hdr = XNBHeader(data)
-        bs  = NoeBitStream(hdr.payload, NOE_LITTLEENDIAN)
-        rcnt = read_7bit_encoded_int(bs)
-        readers = []
-        for _ in range(rcnt):
-            name_len = read_7bit_encoded_int(bs)
-            reader   = bs.readBytes(name_len).decode("utf-8", "ignore")
-            #print(reader)
-            _ver     = bs.readUInt()
-            readers.append(reader)
-
-        _shared_cnt = read_7bit_encoded_int(bs)
-        root_index  = readToken(bs) 
-        chosen = getNativeReader(readers, root_index)
-        
+        chosen = sniffXnb(data).native_reader
         return chosen if chosen is not None else ""
     except:
         return ""
 
-def _read_rectangle_list(bs):
-    count = read_7bit_encoded_int(bs)
-    rects = []
-    for _ in range(count):
-        x = bs.readInt()
-        y = bs.readInt()
-        w = bs.readInt()
-        h = bs.readInt()
-        rects.append((x, y, w, h))
-    return rects
+def getFileKind(data):
+    #kind of the registered handler for the file's root reader, None if nothing handles it
+    try:
+        entry = sniffXnb(data).entry
+    except:
+        return None
+    return entry[1] if entry is not None else None
+
+def readReaderTable(bs):
+    size = bs.getSize()
+    rcnt = bs.read7BitInt()
+    readers = []
+    for _ in range(rcnt):
+        reader   = bs.readString()
+        if bs.getOffset() + 4 > size:
+            raise ValueError("Unexpected end of stream.")
+        _ver     = bs.readUInt()
+        readers.append(reader)
+
+    shared_cnt = bs.read7BitInt()
+    root_index = bs.readToken()
+    return readers, shared_cnt, root_index
+
+def _unmultiply_lut():
+    #256x256 table indexed [alpha * 256 + channel], alpha 0 and 255 pass through
+    global _UNMUL_LUT
+    if _UNMUL_LUT is None:
+        lut = bytearray(range(256)) * 256
+        for a in range(1, 255):
+            inv = 255.0 / a
+            base = a * 256
+            for c in range(256):
+                lut[base + c] = min(int(c * inv + 0.5), 255)
+        _UNMUL_LUT = bytes(lut)
+    return _UNMUL_LUT
+
+_UNMUL_LUT = None
+
+def unmultiplyAlpha(rgba):
+    byte_rgba = bytearray(rgba)
+    alpha = byte_rgba[3::4]
+    if not alpha.translate(None, b"\x00\xff"):
+        return byte_rgba  #fully opaque/transparent, nothing to undo
+    lut = _unmultiply_lut()
+    if np is not None:
+        px = np.frombuffer(byte_rgba, dtype=np.uint8).reshape(-1, 4)
+        table = np.frombuffer(lut, dtype=np.uint8).reshape(256, 256)
+        out = px.copy()
+        out[:, :3] = table[px[:, 3:4], px[:, :3]]
+        return bytearray(out.tobytes())
+    rows = list(map((256).__mul__, alpha))
+    for ch in range(3):
+        byte_rgba[ch::4] = bytes(map(lut.__getitem__, map(operator.add, rows, byte_rgba[ch::4])))
+    return byte_rgba
+
+def _gather(data, stride, offset, size, count):
+    #pull one `size`-byte attribute out of `count` interleaved vertices, packed tight
+    if np is not None:
+        rows = np.frombuffer(data, dtype=np.uint8, count=stride * count).reshape(count, stride)
+        return rows[:, offset:offset + size].tobytes()
+    out = bytearray(size * count)
+    end = offset + stride * (count - 1) + 1
+    for j in range(size):
+        out[j::size] = data[offset + j:end + j:stride]
+    return bytes(out)
+
+def _normalized_shorts_to_floats(buf):
+    if np is not None:
+        return (np.frombuffer(buf, dtype="<i2").astype(np.float32) / 32767.0).tobytes()
+    shorts = array("h", buf)
+    if sys.byteorder != "little":
+        shorts.byteswap()
+    floats = array("f", map((1.0 / 32767.0).__mul__, shorts))
+    if sys.byteorder != "little":
+        floats.byteswap()
+    return floats.tobytes()
+
+def _le_array(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
 
-def _read_char_list(bs):
-    count = read_7bit_encoded_int(bs)
-    chars = []
-    for _ in range(count):
-        ch = bs.readUShort()
-        chars.append(ch)
-    return chars
+def _read_rectangle_list(bs):
+    #List<Rectangle>: Int32 count, then x,y,w,h per entry in one block
+    count = bs.readInt()
+    return _le_array("i", bs.readView(count * 16))
 
 def _read_vector3_list(bs):
-    count = read_7bit_encoded_int(bs)
-    vecs = []
-    for _ in range(count):
-        x = bs.readFloat()
-        y = bs.readFloat()
-        z = bs.readFloat()
-        vecs.append((x, y, z))
-    return vecs
+    count = bs.readInt()
+    return _le_array("f", bs.readView(count * 12))
+
+def _read_utf8_chars(bs, count):
+    #CharReader writes UTF-8, decode a worst-case window at once and keep the first `count` chars
+    ofs = bs.getOffset()
+    window = bytes(bs.view[ofs:ofs + count * 3])
+    text = window.decode("utf-8", "surrogateescape")[:count]
+    if len(text) < count:
+        raise ValueError("Unexpected end of stream.")
+    bs.seek(len(text.encode("utf-8", "surrogateescape")), NOESEEK_REL)
+    return text
+
+def _read_char_list(bs):
+    return _read_utf8_chars(bs, bs.readInt())
 
 def _read_nullable_char(bs):
     has_value = bs.readUByte()
     if has_value:
-        return bs.readUShort()
+        return _read_utf8_chars(bs, 1)
     return None
 
-def read_7bit_encoded_int(bs, max_bytes=5):
-    result = 0
-    shift = 0
-    for i in range(max_bytes):
-        if bs.getOffset() >= len(bs.getBuffer()):
-            raise ValueError("Unexpected end of stream.")
-        b = bs.readUByte()
-        result |= (b & 0x7F) << shift
-        if (b & 0x80) == 0:
-            return result
-        shift += 7
-    raise ValueError("Err1 Infinite loop watchdog triggered, unsupported file")
-def readToken(bs):
-    token = read_7bit_encoded_int(bs)
-    if token == 0:
-        return None           
-    return token - 1      
-def isNative(name: str) -> bool:
-
-    return "Microsoft.Xna.Framework.Content" in name
-
-def getNativeReader(readers, root_index):
-
-    if root_index is None or root_index < 0 or root_index >= len(readers):
-        return None
-
-    root_reader = readers[root_index]
-    if isNative(root_reader):
-        return root_reader
-
-    for i in range(root_index + 1, len(readers)):
-        if isNative(readers[i]):
-            return readers[i]
-
-
-    return root_reader
-
 #DEBUG
 
 def _zip_compression():
@@ -632,13 +2813,21 @@ def debugData(zip_dir, exception_text, extra_files=None, zip_name_prefix="!debug
         zf.writestr("exception.txt", text_to_write.encode("utf-8"))
         if extra_files:
             for arc_name, content in extra_files.items():
-                if isinstance(content, bytes):
-                    zf.writestr(arc_name, content)
+                if isinstance(content, (bytes, bytearray, memoryview, mmap.mmap)):
+                    zf.writestr(arc_name, bytes(content))
                 else:
                     zf.writestr(arc_name, str(content).encode("utf-8"))
 
     return zip_path
 
 
-
-
+#BUILT-IN READERS
+registerReader("Texture2DReader", Texture2DReader, "texture")
+registerReader("TextureCubeReader", TextureCubeReader, "texture")
+registerReader("Texture3DReader", Texture3DReader, "texture")
+registerReader("ModelReader", ModelReader, "model")
+registerReader("SpriteFontReader", SpriteFontReader, "spritefont")
+registerReader("SoundEffectReader", SoundEffectReader, "sound")
+registerReader("EffectReader", EffectReader, "effect")
+for _name in EFFECT_LAYOUTS:
+    registerReader(_name, EffectReader, "effect")
@@ -0,0 +1,129 @@
+"""Per-field read cost: fmt_xnb.ByteCursor vs NoeBitStream.
+
+    python tools/bench_cursor.py [-n fields] [--payload-mb 1,16,64]
+
+Every case reads the same fields through both streams and prints ns/field.
+Standalone NoeBitStream is the plain-Python stand-in; under Noesis' Python the
+real one is timed. The varint case also runs the pre-cursor loop, which asked
+the stream for its whole buffer before every byte: on a stream whose
+getBuffer() copies (Noesis) that cost grows with the payload, so it is timed
+against a few payload sizes.
+"""
+
+import argparse
+import struct
+import sys
+import time
+
+from xnb_batch import setupImporter
+import xnb_synth
+
+
+class CopyingStream:
+    """Wraps a NoeBitStream so getBuffer() returns a copy, as Noesis' does."""
+
+    def __init__(self, bs):
+        self.bs = bs
+
+    def getBuffer(self):
+        return bytearray(self.bs.getBuffer())
+
+    def __getattr__(self, name):
+        return getattr(self.bs, name)
+
+
+def legacyVarint(bs, max_bytes=5):
+    #read_7bit_encoded_int before the cursor: buffer length fetched per byte
+    result = 0
+    shift = 0
+    for _ in range(max_bytes):
+        if bs.getOffset() >= len(bs.getBuffer()):
+            raise ValueError("Unexpected end of stream.")
+        b = bs.readUByte()
+        result |= (b & 0x7F) << shift
+        if (b & 0x80) == 0:
+            return result
+        shift += 7
+    raise ValueError("varint too long")
+
+
+def legacyReaderTable(bs):
+    #readReaderTable before the cursor
+    size = len(bs.getBuffer())
+    readers = []
+    for _ in range(legacyVarint(bs)):
+        name_len = legacyVarint(bs)
+        if bs.getOffset() + name_len + 4 > size:
+            raise ValueError("Unexpected end of stream.")
+        readers.append(bs.readBytes(name_len).decode("utf-8", "ignore"))
+        bs.readUInt()
+    return readers, legacyVarint(bs), legacyVarint(bs) - 1
+
+
+def timeReads(make, read, count):
+    bs = make()
+    start = time.perf_counter()
+    for _ in range(count):
+        read(bs)
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def varints(count):
+    #mix of one and two byte values
+    return b"".join(xnb_synth.v7((i * 2654435761) & 0x3FFF) for i in range(count))
+
+
+def strings(count):
+    return b"".join(xnb_synth.xstr("Microsoft.Xna.Framework.Content.Reader%d" % i) for i in range(count))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("-n", "--fields", type=int, default=200000, help="fields read per case")
+    ap.add_argument("--payload-mb", default="1,16,64",
+                    help="payload sizes for the copying-getBuffer varint case (MB, comma separated)")
+    args = ap.parse_args(argv)
+
+    fmt = setupImporter()
+    n = args.fields
+    Noe = lambda data: fmt.NoeBitStream(data, fmt.NOE_LITTLEENDIAN)
+    Cur = fmt.ByteCursor
+
+    floats = struct.pack("<%df" % (n * 16), *range(n * 16))
+    vints = varints(n)
+    strs = strings(n // 10)
+    table = xnb_synth.readerTable(["Reader%d, Version=4.0.0.0" % i for i in range(2000)])
+
+    cases = [
+        ("readUInt", floats, lambda bs: bs.readUInt(), lambda bs: bs.readUInt(), n),
+        ("readFloat", floats, lambda bs: bs.readFloat(), lambda bs: bs.readFloat(), n),
+        ("Matrix (16 floats)", floats, lambda bs: [bs.readFloat() for _ in range(16)],
+         lambda bs: bs.readMatrix(), n // 16),
+        ("7-bit varint", vints, legacyVarint, lambda bs: bs.read7BitInt(), n),
+        ("string", strs, lambda bs: bs.readBytes(legacyVarint(bs)).decode("utf-8", "ignore"),
+         lambda bs: bs.readString(), n // 10),
+        ("reader table (2000)", table, legacyReaderTable, fmt.readReaderTable, 1),
+    ]
+    print("%-22s %14s %14s %8s" % ("field", "NoeBitStream", "ByteCursor", "speedup"))
+    for name, data, old, new, count in cases:
+        if name.startswith("reader table"):
+            #whole table per call, reported per call
+            t_old = timeReads(lambda: None, lambda _: old(Noe(data)), 20)
+            t_new = timeReads(lambda: None, lambda _: new(Cur(data)), 20)
+        else:
+            t_old = timeReads(lambda: Noe(data), old, count)
+            t_new = timeReads(lambda: Cur(data), new, count)
+        print("%-22s %11.0f ns %11.0f ns %7.1fx" % (name, t_old, t_new, t_old / t_new))
+
+    print("\nvarint with a copying getBuffer(), per field:")
+    for mb in (float(v) for v in args.payload_mb.split(",")):
+        data = vints + bytes(int(mb * 1e6))
+        reads = max(5, int(200 / max(mb, 1.0)))
+        t_old = timeReads(lambda: CopyingStream(Noe(data)), legacyVarint, reads)
+        t_new = timeReads(lambda: Cur(data), lambda bs: bs.read7BitInt(), reads)
+        print("%6.0f MB payload %14.0f ns %11.0f ns %7.0fx" % (mb, t_old, t_new, t_old / t_new))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Decompression throughput: fmt_xnb's built-in LZX/LZ4 decoders vs rapi.
+
+    python tools/bench_decomp.py <file.xnb | Content dir> ... [-n repeats]
+
+Standalone only the built-in decoders are timed. When Noesis' own rapi is
+importable (running under Noesis' Python) the rapi path is timed as well.
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+from xnb_batch import findXnbFiles, setupImporter
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(p for p, _ in findXnbFiles(path))
+        else:
+            files.append(path)
+    return files
+
+
+def bestOf(repeats, func, *args):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("paths", nargs="+", help=".xnb files or directories")
+    ap.add_argument("-n", "--repeats", type=int, default=3, help="runs per file, best is kept")
+    args = ap.parse_args(argv)
+
+    fmt = setupImporter()
+    import rapi
+
+    kinds = {fmt.COMPRESSED_LZX_MASK: "LZX", fmt.COMPRESSED_LZ4_MASK: "LZ4"}
+    native = {"LZX": fmt.RAPI_LZX, "LZ4": fmt.RAPI_LZ4}
+    totals = {}  # kind -> [bytes, builtin secs, rapi secs]
+    for path in collect(args.paths):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:3] != b"XNB" or len(data) < 14:
+            continue
+        kind = kinds.get(data[5] & (fmt.COMPRESSED_LZX_MASK | fmt.COMPRESSED_LZ4_MASK))
+        if kind is None:
+            continue
+        file_size, real_size = struct.unpack_from("<II", data, 6)
+        comp = data[14:file_size]
+        t = totals.setdefault(kind, [0, 0.0, 0.0])
+        t[0] += real_size
+        if kind == "LZX":
+            t[1] += bestOf(args.repeats, fmt.lzxDecompress, comp, real_size)
+            if native[kind]:
+                t[2] += bestOf(args.repeats, rapi.decompXMemLZX, comp, real_size, 16, -1, -1)
+        else:
+            t[1] += bestOf(args.repeats, fmt.lz4Decompress, comp, real_size)
+            if native[kind]:
+                t[2] += bestOf(args.repeats, rapi.decompLZ4, comp, real_size)
+
+    if not totals:
+        print("no compressed XNB files found")
+        return 1
+    for kind, (size, builtin, native_secs) in sorted(totals.items()):
+        line = "%s  %.1f MB  built-in %.2f MB/s" % (kind, size / 1e6, size / builtin / 1e6 if builtin else 0.0)
+        if native[kind]:
+            line += "  rapi %.2f MB/s" % (size / native_secs / 1e6 if native_secs else 0.0)
+        else:
+            line += "  rapi n/a (not running under Noesis)"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Premultiplied-alpha reversal: the old per-pixel loop vs fmt_xnb.unmultiplyAlpha.
+
+    python tools/bench_unmultiply.py [--size 1024] [-n repeats]
+
+Times both raw 32bpp paths that unmultiply, a8b8g8r8 (Xbox 360 SurfaceFormat
+0) and r8g8b8a8 (PC SurfaceFormat 0). Each surface is decoded to RGBA, then
+unmultiplied by the old loop, the LUT path in plain Python and the LUT path
+with NumPy (when importable). The run fails (exit 1) if any output differs
+from the old loop's.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from xnb_batch import setupImporter
+
+
+def legacyUnmultiply(rgba):
+    #unmultiplyAlpha as Texture2DReader had it before the LUT
+    byte_rgba = bytearray(rgba)
+    for i in range(0, len(byte_rgba), 4):
+        a = byte_rgba[i + 3]
+        if a not in (0, 255):
+            inv = 255.0 / a
+            byte_rgba[i] = min(int(byte_rgba[i] * inv + 0.5), 255)
+            byte_rgba[i + 1] = min(int(byte_rgba[i + 1] * inv + 0.5), 255)
+            byte_rgba[i + 2] = min(int(byte_rgba[i + 2] * inv + 0.5), 255)
+    return byte_rgba
+
+
+def premultiplied(size, alpha_first, seed=0):
+    """size x size random premultiplied pixels, alpha stored first (a8b8g8r8) or last."""
+    rng = random.Random(seed)
+    out = bytearray(size * size * 4)
+    for i in range(0, len(out), 4):
+        a = rng.getrandbits(8)
+        r, g, b = ((rng.getrandbits(8) * a + 127) // 255 for _ in range(3))
+        out[i:i + 4] = bytes((a, b, g, r) if alpha_first else (r, g, b, a))
+    return bytes(out)
+
+
+def bestOf(repeats, func, *args):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best, result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size", type=int, default=1024, help="surface edge in pixels")
+    ap.add_argument("-n", "--repeats", type=int, default=3, help="runs per path, best is kept")
+    args = ap.parse_args(argv)
+
+    fmt = setupImporter()
+    numpy = fmt.np
+    size = args.size
+    mismatches = 0
+    print("%-10s %10s %10s %8s %10s %8s" % ("layout", "old loop", "LUT", "speedup", "numpy", "speedup"))
+    for layout, alpha_first in (("a8b8g8r8", True), ("r8g8b8a8", False)):
+        rgba = bytes(fmt.imageDecodeRaw(premultiplied(size, alpha_first), size, size, layout))
+        t_old, expected = bestOf(args.repeats, legacyUnmultiply, rgba)
+        fmt.np = None
+        try:
+            t_lut, out = bestOf(args.repeats, fmt.unmultiplyAlpha, rgba)
+        finally:
+            fmt.np = numpy
+        mismatches += out != expected
+        row = "%-10s %8.3f s %8.3f s %7.1fx" % (layout, t_old, t_lut, t_old / t_lut)
+        if numpy is not None:
+            t_np, out = bestOf(args.repeats, fmt.unmultiplyAlpha, rgba)
+            mismatches += out != expected
+            row += " %8.3f s %7.1fx" % (t_np, t_old / t_np)
+        print(row)
+    if mismatches:
+        print("MISMATCH: %d outputs differ from the old loop" % mismatches)
+        return 1
+    print("outputs byte-identical to the old loop")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Benchmark fmt_xnb's decode paths on synthetic XNB files.
+
+Generates (once, cached) the xnb_synth suite, loads every file through
+LoadAsset on the stand-in Noesis modules with stage profiling on, and reports
+files/s plus MB/s per stage. MB/s is always decoded payload bytes over the
+time spent in that stage, so stages of one file are directly comparable.
+
+    python tools/bench_xnb.py [-k filter] [-n repeats] [--max-size N] [--max-verts N]
+                              [--save baseline.json] [--compare baseline.json] [--tolerance 0.25]
+
+With --compare the run fails (exit 1) when any case's files/s drops by more
+than the tolerance against the saved baseline.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+import xnb_synth
+from xnb_batch import setupImporter
+
+
+def benchFile(fmt, path, repeats):
+    """Best-of-`repeats` stage timings for one file, caches cleared between runs."""
+    with open(path, "rb") as f:
+        data = f.read()
+    best = None
+    error = None
+    for _ in range(repeats):
+        fmt.payloadCache.clear()
+        fmt._sniff_cache.clear()
+        fmt.profiler.beginFile(os.path.basename(path))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fmt.LoadAsset(data, [])
+        except Exception as e:
+            error = "%s: %s" % (type(e).__name__, e)
+        finally:
+            rec = fmt.profiler.endFile()
+        if error:
+            break
+        if best is None or rec["total"] < best["total"]:
+            best = rec
+    payload = fmt.XNBHeader(data, 0).payload_size
+    return best, payload, error
+
+
+def run(files, repeats):
+    fmt = setupImporter()
+    fmt.LOG_LEVEL = fmt.LOG_QUIET
+    fmt.profiler.enabled = True
+    results = {}
+    for path in files:
+        rec, payload, error = benchFile(fmt, path, repeats)
+        name = os.path.basename(path)
+        if error:
+            results[name] = {"error": error}
+            print("%-42s  %s" % (name, error[:60]))
+            continue
+        mb = payload / 1e6
+        stages = {k: v for k, v in rec.items() if k not in ("file", "total") and v > 0}
+        results[name] = {"payload": payload, "total": rec["total"], "files_per_s": 1.0 / rec["total"],
+                         "mb_per_s": mb / rec["total"],
+                         "stages": {k: {"secs": v, "mb_per_s": mb / v} for k, v in stages.items()}}
+        top = sorted(stages.items(), key=lambda kv: -kv[1])[:3]
+        print("%-42s %8.1f ms %8.1f files/s %8.1f MB/s   %s" % (
+            name, rec["total"] * 1000.0, 1.0 / rec["total"], mb / rec["total"],
+            "  ".join("%s %.0f MB/s" % (k, mb / v) for k, v in top)))
+    return results
+
+
+def summarize(results):
+    totals = {}
+    for res in results.values():
+        for stage, st in res.get("stages", {}).items():
+            secs, mb = totals.get(stage, (0.0, 0.0))
+            totals[stage] = (secs + st["secs"], mb + res["payload"] / 1e6)
+    print("\n%-12s %10s %10s" % ("stage", "seconds", "MB/s"))
+    for stage, (secs, mb) in sorted(totals.items(), key=lambda kv: -kv[1][0]):
+        print("%-12s %10.3f %10.1f" % (stage, secs, mb / secs))
+    ok = [r for r in results.values() if "total" in r]
+    secs = sum(r["total"] for r in ok)
+    if secs:
+        print("%d files in %.3fs: %.1f files/s, %.1f MB/s" % (
+            len(ok), secs, len(ok) / secs, sum(r["payload"] for r in ok) / 1e6 / secs))
+
+
+def compare(results, baseline, tolerance):
+    """Names of cases whose files/s fell more than `tolerance` below the baseline."""
+    slower = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None or "files_per_s" not in cur or "files_per_s" not in base:
+            continue
+        ratio = cur["files_per_s"] / base["files_per_s"]
+        if ratio < 1.0 - tolerance:
+            slower.append((name, ratio))
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "xnb_bench"),
+                    help="where the synthetic files are generated and kept")
+    ap.add_argument("--max-size", type=int, default=1024, help="largest texture edge (up to 8192)")
+    ap.add_argument("--max-verts", type=int, default=100000, help="largest model vertex count")
+    ap.add_argument("-k", dest="filter", help="only files whose name contains this")
+    ap.add_argument("-n", "--repeats", type=int, default=3, help="runs per file, best is kept")
+    ap.add_argument("--save", metavar="FILE", help="write results as a baseline")
+    ap.add_argument("--compare", metavar="FILE", help="baseline to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed files/s drop (default 0.25)")
+    args = ap.parse_args(argv)
+
+    files = xnb_synth.writeSuite(args.dir, args.max_size, args.max_verts)
+    if args.filter:
+        files = [p for p in files if args.filter in os.path.basename(p)]
+    results = run(files, max(1, args.repeats))
+    summarize(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for name, ratio in slower:
+            print("REGRESSION %s: %.0f%% of baseline files/s" % (name, ratio * 100.0))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Cross-check fmt_xnb's numpy and plain-Python animation clip paths.
+
+    python tools/check_anims.py [--bones 12] [--keys 40] [--seed 1]
+
+Builds a clip with bones of different key counts and time ranges, shuffled
+like an unsorted keyframe list, and compares AnimationClipData.sample() of
+both paths at times before, inside, between and past every bone's keys, plus
+decomposeTransforms() on the clip's matrices. Exits 1 on any mismatch.
+"""
+
+import argparse
+import random
+import struct
+import sys
+
+from xnb_batch import setupImporter
+import xnb_synth
+
+
+def buildClip(bones, keys, seed):
+    rng = random.Random(seed)
+    rows = []
+    for b in range(bones):
+        count = rng.randint(1, keys)
+        start = rng.uniform(-1.0, 2.0)
+        length = rng.uniform(0.0, 3.0)
+        for k in range(count):
+            t = start + length * k / max(count - 1, 1)
+            matrix = xnb_synth.boneMatrix(rng.uniform(-3.0, 3.0), b, k, t, rng.uniform(0.5, 2.0))
+            rows.append((b * 2, t, matrix))  # every other bone id, so ids have gaps
+    rng.shuffle(rows)
+    times = sorted({round(t, 3) for _, t, _ in rows})
+    probes = [times[0] - 1.0, times[-1] + 1.0, times[-1] * 10.0 + 5.0] + times
+    probes += [(a + b) / 2.0 for a, b in zip(times, times[1:])]
+    return rows, probes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--bones", type=int, default=12, help="animated bones")
+    ap.add_argument("--keys", type=int, default=40, help="most keyframes per bone")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    fmt = setupImporter()
+    numpy = fmt.np
+    if numpy is None:
+        print("numpy is not importable, nothing to compare")
+        return 0
+    rows, probes = buildClip(args.bones, args.keys, args.seed)
+    bones = [b for b, _, _ in rows]
+    times = [t for _, t, _ in rows]
+    matrices = [v for _, _, m in rows for v in struct.unpack("<16f", m)]
+
+    fast = fmt.AnimationClipData(10.0, bones, times, matrices)
+    fmt.np = None
+    try:
+        slow = fmt.AnimationClipData(10.0, bones, times, matrices)
+        slow_samples = [slow.sample(t) for t in probes]
+        slow_parts = fmt.decomposeTransforms(slow.transforms)
+    finally:
+        fmt.np = numpy
+
+    failures = 0
+    for t, (slow_ids, slow_mats) in zip(probes, slow_samples):
+        ids, mats = fast.sample(t)
+        if ids != slow_ids or mats.tolist() != [list(m) for m in slow_mats]:
+            failures += 1
+            print("sample(%.4f) differs" % t)
+    for name, a, b in zip(("rotation", "translation", "scale"), fmt.decomposeTransforms(fast.transforms), slow_parts):
+        worst = max(abs(x - y) for u, v in zip(a, b) for x, y in zip(u, v))
+        if worst > 1e-5:
+            failures += 1
+            print("%s differs by %g" % (name, worst))
+    print("%d keyframes, %d bones, %d sample times: %s" % (
+        len(rows), len(fast.ranges), len(probes), "%d mismatches" % failures if failures else "paths agree"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
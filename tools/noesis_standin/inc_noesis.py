@@ -0,0 +1,232 @@
+"""Minimal stand-in for Noesis' inc_noesis.py.
+
+Implements the stream, math and container types fmt_xnb touches, in plain
+Python, for headless use.
+"""
+
+import struct
+
+import noesis
+
+NOE_LITTLEENDIAN = 0
+NOE_BIGENDIAN = 1
+
+NOESEEK_ABS = 0
+NOESEEK_REL = 1
+
+
+class NoeBitStream:
+    def __init__(self, data=None, bigEndian=NOE_LITTLEENDIAN):
+        self.data = data if data is not None else b""
+        self.offset = 0
+        self.endian = ">" if bigEndian == NOE_BIGENDIAN else "<"
+
+    def getBuffer(self):
+        return self.data
+
+    def getSize(self):
+        return len(self.data)
+
+    def getOffset(self):
+        return self.offset
+
+    def seek(self, ofs, origin=NOESEEK_ABS):
+        self.offset = self.offset + ofs if origin == NOESEEK_REL else ofs
+
+    def checkEOF(self):
+        return self.offset >= len(self.data)
+
+    def _unpack(self, fmt, size):
+        value = struct.unpack_from(self.endian + fmt, self.data, self.offset)[0]
+        self.offset += size
+        return value
+
+    def readBytes(self, size):
+        value = bytes(self.data[self.offset:self.offset + size])
+        self.offset += size
+        return value
+
+    def readByte(self):
+        return self._unpack("b", 1)
+
+    def readUByte(self):
+        return self._unpack("B", 1)
+
+    def readShort(self):
+        return self._unpack("h", 2)
+
+    def readUShort(self):
+        return self._unpack("H", 2)
+
+    def readInt(self):
+        return self._unpack("i", 4)
+
+    def readUInt(self):
+        return self._unpack("I", 4)
+
+    def readInt64(self):
+        return self._unpack("q", 8)
+
+    def readFloat(self):
+        return self._unpack("f", 4)
+
+    def readHalfFloat(self):
+        return self._unpack("e", 2)
+
+    def readDouble(self):
+        return self._unpack("d", 8)
+
+
+class NoeVec3:
+    def __init__(self, vec3=(0.0, 0.0, 0.0)):
+        self.vec3 = list(vec3)
+
+    def __getitem__(self, index):
+        return self.vec3[index]
+
+    def __setitem__(self, index, value):
+        self.vec3[index] = value
+
+
+class NoeVec4:
+    def __init__(self, vec4=(0.0, 0.0, 0.0, 0.0)):
+        self.vec4 = list(vec4)
+
+    def __getitem__(self, index):
+        return self.vec4[index]
+
+    def __setitem__(self, index, value):
+        self.vec4[index] = value
+
+
+class NoeMat43:
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = (NoeVec3((1.0, 0.0, 0.0)), NoeVec3((0.0, 1.0, 0.0)),
+                    NoeVec3((0.0, 0.0, 1.0)), NoeVec3((0.0, 0.0, 0.0)))
+        self.mat43 = [NoeVec3(r[:3]) if not isinstance(r, NoeVec3) else r for r in rows]
+
+    def __getitem__(self, index):
+        return self.mat43[index]
+
+    def __mul__(self, other):
+        a = [r.vec3 for r in self.mat43]
+        b = [r.vec3 for r in other.mat43]
+        rows = []
+        for i in range(4):
+            row = [a[i][0] * b[0][j] + a[i][1] * b[1][j] + a[i][2] * b[2][j] for j in range(3)]
+            if i == 3:
+                row = [row[j] + b[3][j] for j in range(3)]
+            rows.append(NoeVec3(row))
+        return NoeMat43(rows)
+
+
+class NoeMat44:
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [NoeVec4((1.0 if i == j else 0.0) for j in range(4)) for i in range(4)]
+        self.mat44 = [NoeVec4(r[:4]) if not isinstance(r, NoeVec4) else r for r in rows]
+
+    def __getitem__(self, index):
+        return self.mat44[index]
+
+    def toMat43(self):
+        return NoeMat43([NoeVec3(r.vec4[:3]) for r in self.mat44])
+
+
+class NoeQuat:
+    def __init__(self, quat=(0.0, 0.0, 0.0, 1.0)):
+        self.quat = list(quat)
+
+    def __getitem__(self, index):
+        return self.quat[index]
+
+
+class NoeKeyFramedValue:
+    def __init__(self, time, value):
+        self.time = time
+        self.value = value
+
+
+class NoeKeyFramedBone:
+    def __init__(self, boneIndex):
+        self.boneIndex = boneIndex
+        self.rotationKeys = []
+        self.translationKeys = []
+        self.scaleKeys = []
+
+    def setRotation(self, keys, rotationType=noesis.NOEKF_ROTATION_QUATERNION_4,
+                    interpolationType=noesis.NOEKF_INTERPOLATE_LINEAR):
+        self.rotationKeys = keys
+
+    def setTranslation(self, keys, translationType=noesis.NOEKF_TRANSLATION_VECTOR_3,
+                       interpolationType=noesis.NOEKF_INTERPOLATE_LINEAR):
+        self.translationKeys = keys
+
+    def setScale(self, keys, scaleType=noesis.NOEKF_SCALE_SCALAR_1,
+                 interpolationType=noesis.NOEKF_INTERPOLATE_LINEAR):
+        self.scaleKeys = keys
+
+
+class NoeKeyFramedAnim:
+    def __init__(self, name, bones, kfBones, frameRate=20.0, flags=0):
+        self.name = name
+        self.bones = bones
+        self.kfBones = kfBones
+        self.frameRate = frameRate
+        self.flags = flags
+
+
+class NoeBone:
+    def __init__(self, index, name, matrix, parentName=None, parentIndex=-1):
+        self.index = index
+        self.name = name
+        self.setMatrix(matrix)
+        self.parentName = parentName
+        self.parentIndex = parentIndex
+
+    def getMatrix(self):
+        return self._matrix
+
+    def setMatrix(self, matrix):
+        self._matrix = matrix
+
+
+class NoeTexture:
+    def __init__(self, name, width, height, pixelData, pixelType=noesis.NOESISTEX_RGBA32):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.pixelData = pixelData
+        self.pixelType = pixelType
+        self.mipCount = 0
+        self.flags = 0
+
+    def setFlags(self, flags):
+        self.flags = flags
+
+
+class NoeMesh:
+    def __init__(self, name=""):
+        self.name = name
+        self.matName = ""
+        self.positions = []
+        self.normals = []
+        self.uvs = []
+        self.colors = []
+        self.weights = []
+        self.indices = []
+
+
+class NoeModel:
+    def __init__(self, meshes=None, materials=None):
+        self.meshes = meshes if meshes is not None else []
+        self.materials = materials
+        self.bones = []
+        self.anims = []
+
+    def setBones(self, bones):
+        self.bones = bones
+
+    def setAnims(self, anims):
+        self.anims = anims
@@ -0,0 +1,110 @@
+"""Minimal stand-in for the Noesis `noesis` module.
+
+Only the constants and calls used by fmt_xnb are provided, so the importer
+can run outside of Noesis (see tools/xnb_batch.py).
+"""
+
+NOESISTEX_UNKNOWN = 0
+NOESISTEX_RGBA32 = 1
+NOESISTEX_RGB24 = 2
+NOESISTEX_DXT1 = 3
+NOESISTEX_DXT3 = 4
+NOESISTEX_DXT5 = 5
+
+FOURCC_DXT1 = 0x31545844
+FOURCC_DXT3 = 0x33545844
+FOURCC_DXT5 = 0x35545844
+
+RPGEODATA_FLOAT = 0
+RPGEODATA_INT = 1
+RPGEODATA_UINT = 2
+RPGEODATA_SHORT = 3
+RPGEODATA_USHORT = 4
+RPGEODATA_HALFFLOAT = 5
+RPGEODATA_DOUBLE = 6
+RPGEODATA_BYTE = 7
+RPGEODATA_UBYTE = 8
+
+RPGEO_NONE = 0
+RPGEO_POINTS = 1
+RPGEO_TRIANGLE = 2
+RPGEO_TRIANGLE_STRIP = 3
+
+RPGOPT_BIGENDIAN = 0
+RPGOPT_TRIWINDBACKWARD = 1
+RPGOPT_SWAPHANDEDNESS = 2
+
+NOEUSERVAL_NONE = 0
+NOEUSERVAL_STRING = 1
+NOEUSERVAL_FLOAT = 2
+NOEUSERVAL_INT = 3
+NOEUSERVAL_BOOL = 4
+NOEUSERVAL_FILEPATH = 5
+NOEUSERVAL_FOLDERPATH = 6
+
+NTEXFLAG_CUBEMAP = 1 << 1
+
+NOEKF_ROTATION_QUATERNION_4 = 0
+NOEKF_TRANSLATION_VECTOR_3 = 0
+NOEKF_SCALE_SCALAR_1 = 0
+NOEKF_SCALE_VECTOR_3 = 1
+NOEKF_INTERPOLATE_LINEAR = 0
+
+OPTFLAG_WANTARG = 1 << 0
+
+# messages raised through messagePrompt since the last clearMessages()
+messages = []
+# options passed on the command line, name -> argument (or None)
+invokedOptions = {}
+
+
+class NoesisException(Exception):
+    pass
+
+
+def register(name, ext):
+    return 0
+
+
+def setHandlerTypeCheck(handle, func):
+    pass
+
+
+def setHandlerLoadRGBA(handle, func):
+    pass
+
+
+def setHandlerLoadModel(handle, func):
+    pass
+
+
+def addOption(handle, name, desc, flags):
+    return 0
+
+
+def optWasInvoked(name):
+    return name in invokedOptions
+
+
+def optGetArg(name):
+    return invokedOptions.get(name)
+
+
+def doException(msg):
+    raise NoesisException(str(msg))
+
+
+def messagePrompt(msg):
+    messages.append(str(msg))
+
+
+def clearMessages():
+    del messages[:]
+
+
+def logPopup():
+    pass
+
+
+def userPrompt(valType, title, msg, default=None, validator=None):
+    return None
@@ -0,0 +1,206 @@
+"""Minimal stand-in for the Noesis `rapi` module.
+
+Geometry calls build plain NoeMesh objects out of the bound buffers. Only
+the image calls that can be done portably are implemented; the rest raise
+NotImplementedError. decompLZ4/decompXMemLZX and imageDecodeDXT are
+deliberately absent so fmt_xnb falls back to its built-in decompressors and
+numpy block decoders.
+"""
+
+import struct
+
+import noesis
+from inc_noesis import NoeMesh, NoeModel
+
+_GEO_FORMATS = {
+    noesis.RPGEODATA_FLOAT: ("f", 4),
+    noesis.RPGEODATA_INT: ("i", 4),
+    noesis.RPGEODATA_UINT: ("I", 4),
+    noesis.RPGEODATA_SHORT: ("h", 2),
+    noesis.RPGEODATA_USHORT: ("H", 2),
+    noesis.RPGEODATA_HALFFLOAT: ("e", 2),
+    noesis.RPGEODATA_DOUBLE: ("d", 8),
+    noesis.RPGEODATA_BYTE: ("b", 1),
+    noesis.RPGEODATA_UBYTE: ("B", 1),
+}
+
+_inputName = ""
+_context = None
+
+
+def setInputName(name):
+    """Stand-in only: the path Noesis would report for the file being loaded."""
+    global _inputName
+    _inputName = name
+
+
+def getInputName():
+    return _inputName
+
+
+# ---------------------------------------------------------------- data
+
+
+def swapEndianArray(data, elemSize):
+    data = bytes(data)
+    out = bytearray(len(data))
+    for i in range(elemSize):
+        out[i::elemSize] = data[elemSize - 1 - i::elemSize]
+    return bytes(out)
+
+
+def imageDecodeRaw(data, width, height, fmt):
+    """Decode 8-bit-per-channel layouts such as "a8b8g8r8" into RGBA32."""
+    channels = [fmt[i] for i in range(0, len(fmt), 2)]
+    if len(channels) != 4 or fmt[1::2] != "8888" or sorted(channels) != ["a", "b", "g", "r"]:
+        raise NotImplementedError("imageDecodeRaw format %s" % fmt)
+    size = width * height * 4
+    data = bytes(data[:size])
+    out = bytearray(size)
+    for dst, ch in enumerate("rgba"):
+        out[dst::4] = data[channels.index(ch)::4]
+    return out
+
+
+def multiplyBones(bones):
+    # parents come first in XNA bone order, so one pass resolves the hierarchy
+    for bone in bones:
+        if 0 <= bone.parentIndex < len(bones):
+            bone.setMatrix(bone.getMatrix() * bones[bone.parentIndex].getMatrix())
+    return bones
+
+
+def setPreviewOption(name, value):
+    pass
+
+
+# ---------------------------------------------------------------- geometry
+
+
+class _Context:
+    def __init__(self):
+        self.options = {}
+        self.name = ""
+        self.material = ""
+        self.binds = {}
+        self.meshes = []
+
+
+def rpgCreateContext():
+    global _context
+    _context = _Context()
+
+
+def _ctx():
+    if _context is None:
+        rpgCreateContext()
+    return _context
+
+
+def rpgSetOption(option, value):
+    _ctx().options[option] = value
+
+
+def rpgSetName(name):
+    _ctx().name = name
+
+
+def rpgSetMaterial(name):
+    _ctx().material = name
+
+
+def rpgClearBufferBinds():
+    _ctx().binds = {}
+
+
+def _bind(slot, data, dataType, stride, ofs=0, count=None):
+    _ctx().binds[slot] = (data, dataType, stride, ofs, count)
+
+
+def rpgBindPositionBuffer(data, dataType, stride):
+    _bind("position", data, dataType, stride, 0, 3)
+
+
+def rpgBindPositionBufferOfs(data, dataType, stride, ofs):
+    _bind("position", data, dataType, stride, ofs, 3)
+
+
+def rpgBindNormalBuffer(data, dataType, stride):
+    _bind("normal", data, dataType, stride, 0, 3)
+
+
+def rpgBindNormalBufferOfs(data, dataType, stride, ofs):
+    _bind("normal", data, dataType, stride, ofs, 3)
+
+
+def rpgBindUV1Buffer(data, dataType, stride):
+    _bind("uv1", data, dataType, stride, 0, 2)
+
+
+def rpgBindUV1BufferOfs(data, dataType, stride, ofs):
+    _bind("uv1", data, dataType, stride, ofs, 2)
+
+
+def rpgBindUV2Buffer(data, dataType, stride):
+    _bind("uv2", data, dataType, stride, 0, 2)
+
+
+def rpgBindUVXBuffer(data, dataType, stride, uvIndex, count):
+    _bind("uv%d" % (uvIndex + 1), data, dataType, stride, 0, count)
+
+
+def rpgBindColorBuffer(data, dataType, stride, count):
+    _bind("color", data, dataType, stride, 0, count)
+
+
+def rpgBindBoneIndexBuffer(data, dataType, stride, count):
+    _bind("boneindex", data, dataType, stride, 0, count)
+
+
+def rpgBindBoneWeightBuffer(data, dataType, stride, count):
+    _bind("boneweight", data, dataType, stride, 0, count)
+
+
+def _unpack(bind):
+    data, dataType, stride, ofs, count = bind
+    code, size = _GEO_FORMATS[dataType]
+    elem = struct.Struct("<%d%s" % (count, code))
+    data = memoryview(data)
+    if stride == elem.size and ofs == 0:
+        usable = len(data) - len(data) % stride
+        return list(elem.iter_unpack(data[:usable]))
+    n = (len(data) - ofs) // stride if stride else 0
+    return [elem.unpack_from(data, ofs + i * stride) for i in range(n)]
+
+
+def rpgCommitTriangles(data, dataType, numIdx, primType, usePlotMap=0):
+    ctx = _ctx()
+    if primType != noesis.RPGEO_TRIANGLE:
+        raise NotImplementedError("primitive type %d" % primType)
+    mesh = NoeMesh(ctx.name)
+    mesh.matName = ctx.material
+    binds = ctx.binds
+    if "position" in binds:
+        mesh.positions = _unpack(binds["position"])
+    if "normal" in binds:
+        mesh.normals = _unpack(binds["normal"])
+    if "uv1" in binds:
+        mesh.uvs = _unpack(binds["uv1"])
+    if "color" in binds:
+        mesh.colors = _unpack(binds["color"])
+    if "boneindex" in binds and "boneweight" in binds:
+        mesh.weights = list(zip(_unpack(binds["boneindex"]), _unpack(binds["boneweight"])))
+    code, size = _GEO_FORMATS[dataType]
+    mesh.indices = list(struct.unpack_from("<%d%s" % (numIdx, code), data, 0))
+    ctx.meshes.append(mesh)
+
+
+def rpgConstructModel():
+    ctx = _ctx()
+    if not ctx.meshes:
+        return None
+    if ctx.options.get(noesis.RPGOPT_TRIWINDBACKWARD):
+        for mesh in ctx.meshes:
+            idx = mesh.indices
+            idx[0::3], idx[1::3] = idx[1::3], idx[0::3]
+    return NoeModel(ctx.meshes)
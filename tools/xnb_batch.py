@@ -0,0 +1,407 @@
+"""Headless batch converter for XNA content folders.
+
+Walks a Content directory, runs every .xnb through fmt_xnb's LoadAsset on a
+process pool and writes textures as PNG/DDS, models as Wavefront OBJ and
+sounds as WAV (XMA on Xbox 360 content).
+With --tex dds, DXT textures are passed through as block data (all mips).
+Outside of Noesis the plain-Python stand-ins in tools/noesis_standin are
+used for the noesis, rapi and inc_noesis modules.
+
+    python tools/xnb_batch.py <Content dir> <output dir> [-j N] [--tex dds] [--profile FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import zlib
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+
+def setupImporter():
+    """Import fmt_xnb, falling back to the stand-in Noesis modules."""
+    try:
+        import noesis  # noqa: F401  (running inside Noesis)
+    except ImportError:
+        sys.path.insert(0, os.path.join(TOOLS_DIR, "noesis_standin"))
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    import fmt_xnb
+    import noesis
+    DDS_FOURCC.update({noesis.NOESISTEX_DXT1: (b"DXT1", 8), noesis.NOESISTEX_DXT3: (b"DXT3", 16),
+                       noesis.NOESISTEX_DXT5: (b"DXT5", 16)})
+    global CUBEMAP_FLAG
+    CUBEMAP_FLAG = noesis.NTEXFLAG_CUBEMAP
+    return fmt_xnb
+
+
+# ---------------------------------------------------------------- writers
+
+
+def writePNG(path, width, height, rgba):
+    rgba = bytes(rgba)
+    row = width * 4
+    raw = b"".join(b"\x00" + rgba[y * row:(y + 1) * row] for y in range(height))
+
+    def chunk(tag, body):
+        return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+DDS_FOURCC = {}  # noesis texture type -> (fourcc, bytes per 4x4 block), filled by setupImporter
+CUBEMAP_FLAG = 0  # noesis.NTEXFLAG_CUBEMAP, filled by setupImporter
+
+
+def writeDDS(path, tex):
+    """DDS of an RGBA32 surface, or of DXT block data with its whole mip chain; cubemaps
+    hold all six faces."""
+    width, height = tex.width, tex.height
+    mips = max(getattr(tex, "mipCount", 0), 1)
+    caps = 0x1000
+    flags = 0x1007
+    if tex.pixelType in DDS_FOURCC:
+        fourcc, block = DDS_FOURCC[tex.pixelType]
+        pf = struct.pack("<II4s5I", 32, 0x4, fourcc, 0, 0, 0, 0, 0)
+        pitch = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block
+        flags |= 0x80000
+    else:
+        pf = struct.pack("<II4sIIIII", 32, 0x41, b"\x00\x00\x00\x00", 32,
+                         0x000000FF, 0x0000FF00, 0x00FF0000, 0xFF000000)
+        pitch = width * 4
+        flags |= 0x8
+        mips = 1
+    if mips > 1:
+        flags |= 0x20000
+        caps |= 0x400008
+    caps2 = 0
+    if getattr(tex, "flags", 0) & CUBEMAP_FLAG:
+        caps |= 0x8
+        caps2 = 0xFE00  # DDSCAPS2_CUBEMAP and all six faces
+    header = struct.pack("<7I", 124, flags, height, width, pitch, 0, mips)
+    header += b"\x00" * 44 + pf + struct.pack("<5I", caps, caps2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"DDS " + header)
+        f.write(bytes(tex.pixelData))
+
+
+def writeOBJ(path, model):
+    #a merged model (-xnbmerge / MODEL_MERGE) is one mesh, its submesh ranges become groups
+    submeshes = getattr(model, "xnbSubmeshes", None)
+    with open(path, "w") as f:
+        base = 1
+        for mesh in model.meshes:
+            f.write("o %s\n" % (mesh.name or "mesh"))
+            for p in mesh.positions:
+                f.write("v %.6f %.6f %.6f\n" % p[:3])
+            for uv in mesh.uvs:
+                f.write("vt %.6f %.6f\n" % (uv[0], 1.0 - uv[1]))
+            for n in mesh.normals:
+                f.write("vn %.6f %.6f %.6f\n" % n[:3])
+            idx = mesh.indices
+            if submeshes and len(model.meshes) == 1:
+                for name, part, first, count, _, _ in submeshes:
+                    f.write("g %s\n" % (name if part == 0 else "%s_%d" % (name, part)))
+                    writeOBJFaces(f, idx[first:first + count], base, mesh)
+            else:
+                writeOBJFaces(f, idx, base, mesh)
+            base += len(mesh.positions)
+
+
+def writeOBJFaces(f, idx, base, mesh):
+    has_uv, has_nrm = bool(mesh.uvs), bool(mesh.normals)
+    for i in range(0, len(idx) - 2, 3):
+        refs = []
+        for k in idx[i:i + 3]:
+            v = k + base
+            if has_uv and has_nrm:
+                refs.append("%d/%d/%d" % (v, v, v))
+            elif has_uv:
+                refs.append("%d/%d" % (v, v))
+            elif has_nrm:
+                refs.append("%d//%d" % (v, v))
+            else:
+                refs.append("%d" % v)
+        f.write("f %s\n" % " ".join(refs))
+
+
+# ---------------------------------------------------------------- worker
+
+_fmt = None
+_opts = None
+_dedup = None
+
+
+class SurfaceDedup:
+    """Worker side of the cross-file texture dedup, fmt_xnb.TEXTURE_DEDUP points here.
+
+    `owners` is a Manager dict shared by all workers: surface key -> the file that
+    claimed it first, replaced by (output path, decode seconds, bytes) once written.
+    """
+
+    def __init__(self, owners):
+        self.owners = owners
+        self.current = None
+        self.duplicates = []  # (output stem relative to the out dir, surface key) of the current file
+
+    def begin(self, rel):
+        self.current = rel
+        self.duplicates = []
+
+    def claim(self, key):
+        owner = self.owners.setdefault(key, self.current)
+        return None if owner == self.current else owner
+
+    def duplicate(self, stem_rel, key):
+        self.duplicates.append((stem_rel, key))
+
+    def wrote(self, key, path_rel, secs, size):
+        self.owners[key] = (path_rel, secs, size)
+
+
+def _initWorker(opts, owners=None):
+    global _fmt, _opts, _dedup
+    _fmt = setupImporter()
+    if owners is not None:
+        _dedup = SurfaceDedup(owners)
+        _fmt.TEXTURE_DEDUP = _dedup
+    _fmt.TEXTURE_PASSTHROUGH = opts["tex"] == "dds"  # DXT surfaces go to DDS undecoded
+    _fmt.profiler.enabled = bool(opts.get("profile"))
+    _fmt.MODEL_MERGE = opts["merge"]
+    #every file is visited once: cached payloads would never be hit again, only pile up per
+    #worker, and the workers would race on a shared disk tier's manifest.json
+    _fmt.payloadCache.budget = 0
+    _fmt.payloadCache.cache_dir = None
+    _fmt.SOUND_OUTPUT = True  # SoundEffects come back as SoundEffectData, streamed to .wav/.xma
+    if opts["jobs"] > 1:
+        _fmt.DECODE_THREADS = 1  # files already decode in parallel, no row-band threads on top
+    if not opts["verbose"]:
+        _fmt.LOG_LEVEL = _fmt.LOG_QUIET
+    _opts = opts
+
+
+def mapFile(path):
+    """Map a file read-only; uncompressed payloads stay views into the mapping."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def convertFile(job):
+    """Convert one file.
+
+    Returns (relpath, status, detail, seconds, stage timings or None, duplicate surfaces).
+    """
+    src, rel = job
+    prof = _fmt.profiler
+    prof.beginFile(rel)
+    if _dedup is not None:
+        _dedup.begin(rel)
+    try:
+        res = _convertFile(src, rel) + (prof.endFile(),)
+    finally:
+        prof.current = None
+    return res + (_dedup.duplicates if _dedup is not None else [],)
+
+
+def _convertFile(src, rel):
+    import noesis
+    import rapi
+    start = time.perf_counter()
+    dst = os.path.join(_opts["out"], os.path.splitext(rel)[0])
+    try:
+        data = mapFile(src)
+        if not _fmt.getFileType(data):
+            return rel, "skipped", "not a readable XNB", time.perf_counter() - start
+        rapi.setInputName(src)
+        noesis.clearMessages()
+        out = []
+        sink = None if _opts["verbose"] else io.StringIO()
+        with contextlib.redirect_stdout(sink) if sink is not None else contextlib.nullcontext():
+            ok = _fmt.LoadAsset(data, out)
+        written = writeOutputs(dst, out)
+        if not ok or not written:
+            detail = "; ".join(noesis.messages) or "no output"
+            return rel, "skipped", detail, time.perf_counter() - start
+        return rel, "ok", ", ".join(written), time.perf_counter() - start
+    except Exception as e:
+        return rel, "failed", "%s: %s" % (type(e).__name__, e), time.perf_counter() - start
+
+
+def writeFont(stem, page, font):
+    """BMFont metrics for a SpriteFont atlas, plus one PNG per glyph with --glyphs."""
+    with open(stem + ".fnt", "w", encoding="utf-8") as f:
+        f.write(font.toBMFont(page, os.path.basename(stem)))
+    written = [os.path.basename(stem) + ".fnt"]
+    if _opts.get("glyphs"):
+        if not font.loadAtlas():
+            raise ValueError("SpriteFont atlas could not be decoded, glyphs not written")
+        glyph_dir = stem + "_glyphs"
+        os.makedirs(glyph_dir, exist_ok=True)
+        for i in range(len(font)):
+            _, _, w, h = font.glyphRect(i)
+            if w and h:
+                writePNG(os.path.join(glyph_dir, "%04X.png" % ord(font.chars[i])), w, h, font.glyphPixels(i))
+        written.append(os.path.basename(glyph_dir) + "/")
+    return written
+
+
+def writeOutputs(dst, out):
+    from inc_noesis import NoeTexture, NoeModel
+    written = []
+    if out:
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    for i, obj in enumerate(out):
+        stem = dst if i == 0 else "%s_%d" % (dst, i)
+        if isinstance(obj, NoeTexture):
+            key = getattr(obj, "xnbSurfaceKey", None)
+            if getattr(obj, "xnbDuplicateOf", None) is not None:
+                #decoded and written by another file, linked/listed once the run is done
+                page = os.path.basename(stem) + (".dds" if _opts["tex"] == "dds" else ".png")
+                _dedup.duplicate(os.path.relpath(stem, _opts["out"]), key)
+                written.append(page + " (duplicate)")
+            else:
+                if _opts["tex"] == "dds" or obj.pixelType in DDS_FOURCC:
+                    page = os.path.basename(stem) + ".dds"
+                    writeDDS(stem + ".dds", obj)
+                else:
+                    page = os.path.basename(stem) + ".png"
+                    #cubemap faces go into one vertical strip, volumes already come stacked
+                    faces = 6 if getattr(obj, "flags", 0) & CUBEMAP_FLAG else 1
+                    writePNG(stem + ".png", obj.width, obj.height * faces, obj.pixelData)
+                written.append(page)
+                if key is not None and _dedup is not None:
+                    path = os.path.join(os.path.dirname(stem), page)
+                    _dedup.wrote(key, os.path.relpath(path, _opts["out"]),
+                                 getattr(obj, "xnbDecodeSecs", 0.0), os.path.getsize(path))
+            font = getattr(obj, "xnbFont", None)
+            if font is not None:
+                written.extend(writeFont(stem, page, font))
+        elif isinstance(obj, NoeModel):
+            writeOBJ(stem + ".obj", obj)
+            written.append(os.path.basename(stem) + ".obj")
+        elif isinstance(obj, _fmt.SoundEffectData):
+            obj.writeFile(stem + obj.extension())
+            written.append(os.path.basename(stem) + obj.extension())
+    return written
+
+
+# ---------------------------------------------------------------- driver
+
+
+def resolveDuplicates(out_dir, owners, duplicates, link=True):
+    """Hard-link (or just list) every duplicate to its owner, write dedup.json, report savings."""
+    manifest = {}
+    saved_secs = 0.0
+    saved_bytes = 0
+    linked = 0
+    orphans = 0
+    for stem_rel, key in duplicates:
+        owner = owners.get(key)
+        if not isinstance(owner, tuple):  # the owning file failed before writing
+            orphans += 1
+            continue
+        owner_rel, secs, size = owner
+        target = stem_rel + os.path.splitext(owner_rel)[1]
+        manifest[target] = owner_rel
+        saved_secs += secs
+        saved_bytes += size
+        if link:
+            dst = os.path.join(out_dir, target)
+            try:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                os.link(os.path.join(out_dir, owner_rel), dst)
+                linked += 1
+            except OSError:
+                pass  # stays a manifest entry only
+    with open(os.path.join(out_dir, "dedup.json"), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    unique = sum(1 for v in owners.values() if isinstance(v, tuple))
+    print("dedup: %d duplicate surfaces of %d unique, %d linked, saved %.2fs decode and %.1f MB disk%s" % (
+        len(manifest), unique, linked, saved_secs, saved_bytes / 1e6,
+        ", %d without an owner" % orphans if orphans else ""))
+
+
+def findXnbFiles(root):
+    jobs = []
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(".xnb"):
+                path = os.path.join(dirpath, name)
+                jobs.append((path, os.path.relpath(path, root)))
+    jobs.sort()
+    return jobs
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("content", help="game Content directory")
+    ap.add_argument("out", help="output directory")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="worker processes (default: all cores)")
+    ap.add_argument("--tex", choices=("png", "dds"), default="png", help="texture output format")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show importer output and every file")
+    ap.add_argument("--glyphs", action="store_true", help="write every SpriteFont glyph as its own PNG")
+    ap.add_argument("--merge", action="store_true",
+                    help="load each model as one merged mesh, OBJ groups keep the mesh names")
+    ap.add_argument("--profile", metavar="FILE", help="write per-file stage timings (.json or .csv)")
+    ap.add_argument("--dedup", choices=("link", "manifest", "off"), default="link",
+                    help="decode/write identical surfaces once; duplicates become hard links "
+                         "or only dedup.json entries (default: link)")
+    args = ap.parse_args(argv)
+
+    jobs = findXnbFiles(args.content)
+    opts = {"out": args.out, "tex": args.tex, "verbose": args.verbose, "profile": args.profile,
+            "glyphs": args.glyphs, "jobs": max(1, args.jobs), "merge": args.merge}
+    counts = {"ok": 0, "skipped": 0, "failed": 0}
+    timings = []
+    duplicates = []
+    start = time.perf_counter()
+    chunk = max(1, len(jobs) // (args.jobs * 16))
+    with contextlib.ExitStack() as stack:
+        owners = None
+        if args.dedup != "off":
+            owners = stack.enter_context(multiprocessing.Manager()).dict()
+        pool = stack.enter_context(multiprocessing.Pool(max(1, args.jobs), _initWorker, (opts, owners)))
+        for rel, status, detail, secs, prof, dups in pool.imap_unordered(convertFile, jobs, chunk):
+            counts[status] += 1
+            duplicates.extend(dups)
+            if prof is not None:
+                timings.append(prof)
+            if status == "failed" or args.verbose:
+                print("[%s] %s (%.2fs): %s" % (status, rel, secs, detail))
+        if owners is not None:
+            owners = dict(owners)
+    elapsed = time.perf_counter() - start
+    print("%d files in %.1fs (%.1f files/s): %d ok, %d skipped, %d failed" % (
+        len(jobs), elapsed, len(jobs) / elapsed if elapsed else 0.0,
+        counts["ok"], counts["skipped"], counts["failed"]))
+    if owners is not None:
+        resolveDuplicates(args.out, owners, duplicates, args.dedup == "link")
+    if args.profile:
+        fmt = setupImporter()
+        timings.sort(key=lambda rec: rec["file"])
+        if args.profile.lower().endswith(".csv"):
+            fmt.profiler.exportCSV(args.profile, timings)
+        else:
+            fmt.profiler.exportJSON(args.profile, timings)
+        print("stage timings written to %s" % args.profile)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
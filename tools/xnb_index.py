@@ -0,0 +1,271 @@
+"""Index a Content directory into a SQLite manifest.
+
+Records container and root-object facts for every .xnb (platform, version,
+compression, readers, texture/cube/volume surface format/size/mips, model
+bone and mesh counts) without decoding any surface or vertex data. Re-runs
+only rescan files whose mtime or size changed, and scans run on a process
+pool.
+
+    python tools/xnb_index.py <Content dir> [--db FILE] [-j N] [-q SQL]
+
+Example query, every DXT5 texture over 2048px:
+
+    python tools/xnb_index.py Content -q "SELECT path, width, height FROM assets
+        WHERE dxt = 'DXT5' AND max(width, height) > 2048"
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import struct
+import sys
+import time
+
+from xnb_batch import findXnbFiles, mapFile, setupImporter
+
+COLUMNS = (
+    ("path", "TEXT PRIMARY KEY"),
+    ("mtime", "REAL"),
+    ("size", "INTEGER"),
+    ("status", "TEXT"),  # ok / error
+    ("error", "TEXT"),
+    ("platform", "TEXT"),
+    ("version", "INTEGER"),
+    ("compression", "TEXT"),
+    ("hidef", "INTEGER"),
+    ("payload_size", "INTEGER"),
+    ("root_reader", "TEXT"),
+    ("native_reader", "TEXT"),
+    ("reader", "TEXT"),  # short class name of the native reader
+    ("reader_count", "INTEGER"),
+    ("shared_count", "INTEGER"),
+    ("surface_format", "INTEGER"),
+    ("dxt", "TEXT"),
+    ("width", "INTEGER"),
+    ("height", "INTEGER"),
+    ("depth", "INTEGER"),  # Texture3D only
+    ("mip_count", "INTEGER"),
+    ("bone_count", "INTEGER"),
+    ("mesh_count", "INTEGER"),
+    ("skinned", "INTEGER"),  # model has a SkinningData tag or BlendIndices/BlendWeight vertices, NULL if unknown
+)
+NAMES = [name for name, _ in COLUMNS]
+
+PLATFORMS = {ord("w"): "pc", ord("x"): "xbox360", ord("m"): "winphone",
+             ord("a"): "android", ord("i"): "ios", ord("d"): "desktopgl"}
+COMPRESSION = {0: None, 0x80: "lzx", 0x40: "lz4"}
+
+
+def openDb(path):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS assets (%s)" % ", ".join("%s %s" % c for c in COLUMNS))
+    have = {row[1] for row in db.execute("PRAGMA table_info(assets)")}
+    for name, decl in COLUMNS:
+        if name not in have:  # manifest from an older version of this tool
+            db.execute("ALTER TABLE assets ADD COLUMN %s %s" % (name, decl.replace(" PRIMARY KEY", "")))
+    db.execute("CREATE INDEX IF NOT EXISTS assets_reader ON assets (reader)")
+    db.execute("CREATE INDEX IF NOT EXISTS assets_dxt ON assets (dxt, width, height)")
+    return db
+
+
+# ---------------------------------------------------------------- worker
+
+_fmt = None
+_dxt_names = None
+
+
+def _initWorker():
+    global _fmt, _dxt_names
+    _fmt = setupImporter()
+    import noesis
+    _dxt_names = {noesis.NOESISTEX_DXT1: "DXT1", noesis.NOESISTEX_DXT3: "DXT3",
+                  noesis.NOESISTEX_DXT5: "DXT5"}
+
+
+def _withPrefix(data, info, read):
+    """Run read(bs, header) on the root object, widening the decoded prefix until it fits."""
+    limit = info.table_end + 0x100
+    while True:
+        header = info.header or _fmt.XNBHeader(data, limit)
+        header.readers, header.shared_cnt = info.readers, info.shared_cnt
+        bs = _fmt.ByteCursor(header.payload, info.table_end)
+        if info.readers[info.root_index] != info.native_reader:
+            bs.seek(1, _fmt.NOESEEK_REL)
+        try:
+            return header, read(bs, header)
+        except (ValueError, IndexError, struct.error):
+            if not header.partial:
+                raise
+            limit *= 4
+
+
+def _surfaceInfo(header, surf_fmt, width, height, mip_cnt):
+    dxt_formats = _fmt.DXT_FORMATS_360 if header.platform == _fmt.PLATFORM_XBOX360 else _fmt.DXT_FORMATS_PC
+    return {"surface_format": surf_fmt, "dxt": _dxt_names.get(dxt_formats.get(surf_fmt)),
+            "width": width, "height": height, "mip_count": mip_cnt}
+
+
+def _textureInfo(bs, header):
+    return _surfaceInfo(header, *bs.unpack(_fmt._TEXTURE_HEAD))
+
+
+def _cubeInfo(bs, header):
+    surf_fmt, size, mip_cnt = bs.unpack(_fmt._CUBE_HEAD)
+    return _surfaceInfo(header, surf_fmt, size, size, mip_cnt)
+
+
+def _volumeInfo(bs, header):
+    surf_fmt, width, height, depth, mip_cnt = bs.unpack(_fmt._VOLUME_HEAD)
+    return dict(_surfaceInfo(header, surf_fmt, width, height, mip_cnt), depth=depth)
+
+
+def _modelInfo(bs, header):
+    bone_cnt = bs.readUInt()
+    if bone_cnt > 0x10000:
+        raise ValueError("Implausible bone count")
+    for _ in range(bone_cnt):
+        if bs.read7BitInt():
+            bs.seek(bs.read7BitInt(), _fmt.NOESEEK_REL)
+        bs.seek(64, _fmt.NOESEEK_REL)
+    ref_size = 4 if bone_cnt > 255 else 1
+    for _ in range(bone_cnt):
+        bs.seek(ref_size, _fmt.NOESEEK_REL)
+        bs.seek(bs.readInt() * ref_size, _fmt.NOESEEK_REL)
+    mesh_cnt = bs.readUInt()
+    for _ in range(mesh_cnt):
+        if bs.read7BitInt():
+            bs.seek(bs.read7BitInt(), _fmt.NOESEEK_REL)
+        bs.seek(ref_size + 16, _fmt.NOESEEK_REL)  # parent bone, bounding sphere
+        bs.read7BitInt()  # tag, null as ModelReader expects
+        for _ in range(bs.readInt()):
+            bs.seek(16, _fmt.NOESEEK_REL)  # vertex offset/count, start index, primitives
+            for _ in range(4):  # tag, vertex buffer, index buffer, effect
+                bs.read7BitInt()
+    bs.seek(ref_size, _fmt.NOESEEK_REL)  # root bone
+    return {"bone_count": bone_cnt, "mesh_count": mesh_cnt, "skinned": _skinned(bs, header)}
+
+
+def _skinned(bs, header):
+    """1 for a SkinningData tag or blend vertex elements, 0 for neither, None if unreachable.
+
+    Vertex declarations sit in the shared resources after the tag, so a tag of
+    unknown type hides them; scanning stops at the first skinned declaration.
+    """
+    tag = bs.readToken()
+    if tag is not None:
+        if not 0 <= tag < len(header.readers):
+            raise ValueError("Invalid tag type id %d" % tag)
+        if _fmt.tagTarget(_fmt.parseReaderName(header.readers[tag])) == "SkinningData":
+            return 1
+        try:
+            _fmt.readTagObject(bs, header, tag)
+        except ValueError:
+            if header.partial:
+                raise
+            return None
+    blend = (_fmt.USAGE_BLENDINDICES, _fmt.USAGE_BLENDWEIGHT)
+    for _ in range(header.shared_cnt):
+        try:
+            name, start = _fmt.scanSharedResource(bs, header.readers)
+        except ValueError:
+            if header.partial:
+                raise
+            return None
+        if name == "VertexBufferReader":
+            decl = _fmt.ByteCursor(header.payload, start + 4)
+            for _ in range(decl.readUInt()):
+                if decl.unpack(_fmt._VERTEX_ELEMENT)[2] in blend:
+                    return 1
+    return 0
+
+
+def scanFile(job):
+    path, rel, mtime, size = job
+    rec = dict.fromkeys(NAMES)
+    rec.update(path=rel, mtime=mtime, size=size, status="ok")
+    try:
+        data = mapFile(path)
+        info = _fmt.sniffXnb(data)
+        readers = info.readers
+        root = readers[info.root_index] if info.root_index is not None and 0 <= info.root_index < len(readers) else None
+        rec.update(root_reader=root, native_reader=info.native_reader,
+                   reader=info.reader_name.name if info.reader_name is not None else None,
+                   reader_count=len(readers), shared_count=info.shared_cnt)
+        kind = rec["reader"]
+        read = ROOT_INFO.get(kind)
+        if read is not None:
+            header, fields = _withPrefix(data, info, read)
+            rec.update(fields)
+        else:
+            header = info.header or _fmt.XNBHeader(data, 0)
+        rec.update(platform=PLATFORMS.get(header.platform, chr(header.platform)),
+                   version=header.version, compression=COMPRESSION.get(header.comp_type),
+                   hidef=int(header.hidef), payload_size=header.payload_size)
+    except Exception as e:
+        rec.update(status="error", error="%s: %s" % (type(e).__name__, e))
+    return rec
+
+
+ROOT_INFO = {"Texture2DReader": _textureInfo, "TextureCubeReader": _cubeInfo,
+             "Texture3DReader": _volumeInfo, "ModelReader": _modelInfo}
+
+
+# ---------------------------------------------------------------- main
+
+
+def update(db, content, jobs_n):
+    """Rescan new and changed files, drop rows of deleted ones. Returns (scanned, removed)."""
+    known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime, size FROM assets")}
+    jobs = []
+    seen = set()
+    for path, rel in findXnbFiles(content):
+        st = os.stat(path)
+        seen.add(rel)
+        if known.get(rel) != (st.st_mtime, st.st_size):
+            jobs.append((path, rel, st.st_mtime, st.st_size))
+    gone = [(rel,) for rel in known if rel not in seen]
+    db.executemany("DELETE FROM assets WHERE path = ?", gone)
+
+    sql = "INSERT OR REPLACE INTO assets (%s) VALUES (%s)" % (", ".join(NAMES), ", ".join("?" * len(NAMES)))
+    if jobs:
+        chunk = max(1, len(jobs) // (jobs_n * 16))
+        with multiprocessing.Pool(max(1, jobs_n), _initWorker) as pool:
+            batch = []
+            for rec in pool.imap_unordered(scanFile, jobs, chunk):
+                batch.append([rec[name] for name in NAMES])
+                if len(batch) >= 512:
+                    db.executemany(sql, batch)
+                    batch = []
+            db.executemany(sql, batch)
+    db.commit()
+    return len(jobs), len(gone)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("content", help="game Content directory")
+    ap.add_argument("--db", help="manifest file (default: <content>/xnb_index.sqlite)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="worker processes (default: all cores)")
+    ap.add_argument("-q", "--query", help="SQL to run against the assets table after updating")
+    args = ap.parse_args(argv)
+
+    db = openDb(args.db or os.path.join(args.content, "xnb_index.sqlite"))
+    start = time.perf_counter()
+    scanned, removed = update(db, args.content, args.jobs)
+    total, errors = db.execute("SELECT count(*), count(error) FROM assets").fetchone()
+    print("%d files indexed (%d rescanned, %d removed, %d errors) in %.1fs" % (
+        total, scanned, removed, errors, time.perf_counter() - start))
+    if args.query:
+        cur = db.execute(args.query)
+        if cur.description:
+            print("\t".join(d[0] for d in cur.description))
+        for row in cur:
+            print("\t".join("" if v is None else str(v) for v in row))
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,595 @@
+"""Synthetic XNB generator for benchmarks and regression runs.
+
+Writes valid XNB files without a content pipeline: Texture2D in every
+surface format the importer reads (PC and Xbox 360), TextureCube and
+Texture3D with full mip chains, models from a few vertices to millions
+(optionally skinned, 16 or 32-bit indices) and SpriteFonts with large glyph
+tables, plus a skinned model whose Tag holds a SkinnedModel-sample
+SkinningData with a 50k-keyframe clip. Every asset can be stored raw, LZ4 or
+LZX compressed (PCM SoundEffects too); the compressors here are simple greedy
+encoders, written for valid output rather than ratio.
+
+    python tools/xnb_synth.py <output dir> [--max-size 8192] [--max-verts 1000000]
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+from array import array
+
+PLATFORM_PC = b"w"
+PLATFORM_XBOX360 = b"x"
+
+TEXTURE2D_READER = "Microsoft.Xna.Framework.Content.Texture2DReader, Microsoft.Xna.Framework.Graphics, Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553"
+TEXTURECUBE_READER = TEXTURE2D_READER.replace("Texture2DReader", "TextureCubeReader")
+TEXTURE3D_READER = TEXTURE2D_READER.replace("Texture2DReader", "Texture3DReader")
+MODEL_READERS = [
+    "Microsoft.Xna.Framework.Content.ModelReader, Microsoft.Xna.Framework.Graphics, Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553",
+    "Microsoft.Xna.Framework.Content.StringReader",
+    "Microsoft.Xna.Framework.Content.VertexBufferReader",
+    "Microsoft.Xna.Framework.Content.IndexBufferReader",
+    "Microsoft.Xna.Framework.Content.BasicEffectReader",
+    "Microsoft.Xna.Framework.Content.SkinnedEffectReader",
+]
+_SKINNED_ASM = ", SkinnedModel, Version=1.0.0.0, Culture=neutral, PublicKeyToken=null"
+_MSCORLIB = ", mscorlib, Version=4.0.0.0, Culture=neutral, PublicKeyToken=b77a5c561934e089"
+# SkinnedModel sample Tag: SkinningData / AnimationClip / Keyframe through ReflectiveReader
+SKINNING_READERS = [
+    "Microsoft.Xna.Framework.Content.ReflectiveReader`1[[SkinnedModel.SkinningData%s]]" % _SKINNED_ASM,
+    "Microsoft.Xna.Framework.Content.DictionaryReader`2[[System.String%s],[SkinnedModel.AnimationClip%s]]"
+    % (_MSCORLIB, _SKINNED_ASM),
+    "Microsoft.Xna.Framework.Content.ReflectiveReader`1[[SkinnedModel.AnimationClip%s]]" % _SKINNED_ASM,
+    "Microsoft.Xna.Framework.Content.ListReader`1[[SkinnedModel.Keyframe%s]]" % _SKINNED_ASM,
+    "Microsoft.Xna.Framework.Content.ReflectiveReader`1[[SkinnedModel.Keyframe%s]]" % _SKINNED_ASM,
+    "Microsoft.Xna.Framework.Content.ListReader`1[[Microsoft.Xna.Framework.Matrix, Microsoft.Xna.Framework, "
+    "Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553]]",
+    "Microsoft.Xna.Framework.Content.ListReader`1[[System.Int32%s]]" % _MSCORLIB,
+    "Microsoft.Xna.Framework.Content.TimeSpanReader",
+    "Microsoft.Xna.Framework.Content.MatrixReader",
+    "Microsoft.Xna.Framework.Content.Int32Reader",
+]
+SPRITEFONT_READERS = [
+    "Microsoft.Xna.Framework.Content.SpriteFontReader, Microsoft.Xna.Framework.Graphics, Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553",
+    TEXTURE2D_READER,
+    "Microsoft.Xna.Framework.Content.ListReader`1[[Microsoft.Xna.Framework.Rectangle, Microsoft.Xna.Framework, Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553]]",
+    "Microsoft.Xna.Framework.Content.RectangleReader",
+    "Microsoft.Xna.Framework.Content.ListReader`1[[System.Char, mscorlib, Version=4.0.0.0, Culture=neutral, PublicKeyToken=b77a5c561934e089]]",
+    "Microsoft.Xna.Framework.Content.CharReader",
+    "Microsoft.Xna.Framework.Content.ListReader`1[[Microsoft.Xna.Framework.Vector3, Microsoft.Xna.Framework, Version=4.0.0.0, Culture=neutral, PublicKeyToken=842cf8be1de50553]]",
+    "Microsoft.Xna.Framework.Content.Vector3Reader",
+]
+
+# SurfaceFormat -> (block dim, bytes per block) for the formats fmt_xnb decodes
+SURFACE_FORMATS = {
+    PLATFORM_PC: {0: (1, 4), 4: (4, 8), 5: (4, 16), 6: (4, 16)},
+    PLATFORM_XBOX360: {0: (1, 4), 1: (1, 4), 4: (4, 8), 28: (4, 8),
+                       5: (4, 16), 30: (4, 16), 6: (4, 16), 32: (4, 16)},
+}
+
+
+# ---------------------------------------------------------------- primitives
+
+
+def v7(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def xstr(text):
+    raw = text.encode("utf-8")
+    return v7(len(raw)) + raw
+
+
+def readerTable(readers, shared=0, root=0):
+    out = bytearray(v7(len(readers)))
+    for name in readers:
+        out += xstr(name) + struct.pack("<I", 0)
+    return bytes(out) + v7(shared) + v7(root + 1)
+
+
+def _matchLength(src, i, j, limit):
+    """Length of the common run at src[i:] and src[j:], compared in chunks."""
+    n = 0
+    step = 64
+    while n < limit:
+        k = min(step, limit - n)
+        if src[i + n:i + n + k] == src[j + n:j + n + k]:
+            n += k
+            step = min(step * 2, 4096)
+        elif k > 1:
+            step = max(1, k // 4)
+        else:
+            break
+    return n
+
+
+# ---------------------------------------------------------------- LZ4
+
+
+def lz4Compress(src):
+    """Single LZ4 block, greedy with a 4-byte hash."""
+    src = bytes(src)
+    out = bytearray()
+    n = len(src)
+    table = {}
+    anchor = i = 0
+
+    def emit(lit_end, mlen, off):
+        lit = lit_end - anchor
+        token_lit = min(lit, 15)
+        token_match = 0 if mlen is None else min(mlen - 4, 15)
+        out.append(token_lit << 4 | token_match)
+        if lit >= 15:
+            out.extend(b"\xff" * ((lit - 15) // 255))
+            out.append((lit - 15) % 255)
+        out.extend(src[anchor:lit_end])
+        if mlen is None:
+            return
+        out.extend(struct.pack("<H", off))
+        if mlen - 4 >= 15:
+            out.extend(b"\xff" * ((mlen - 19) // 255))
+            out.append((mlen - 19) % 255)
+
+    limit = n - 12  # the last 5 bytes must be literals, last match starts 12 before the end
+    while i < limit:
+        key = src[i:i + 4]
+        j = table.get(key)
+        table[key] = i
+        if j is not None and i - j < 0x10000:
+            m = 4 + _matchLength(src, i + 4, j + 4, n - 5 - i - 4)
+            emit(i, m, i - j)
+            i += m
+            anchor = i
+        else:
+            i += 1
+    emit(n, None, 0)
+    return bytes(out)
+
+
+# ---------------------------------------------------------------- LZX
+
+LZX_FRAME = 0x8000
+
+
+def _lzxTables():
+    extra = [0] * 52
+    j = 0
+    for i in range(0, 51, 2):
+        extra[i] = extra[i + 1] = j
+        if i != 0 and j < 17:
+            j += 1
+    base = [0] * 51
+    j = 0
+    for i in range(51):
+        base[i] = j
+        j += 1 << extra[i]
+    return extra, base
+
+
+LZX_EXTRA_BITS, LZX_POSITION_BASE = _lzxTables()
+
+
+def _canonical(lens):
+    codes = [0] * len(lens)
+    code = 0
+    for length in range(1, max(lens) + 1):
+        for sym, l in enumerate(lens):
+            if l == length:
+                codes[sym] = code
+                code += 1
+        code <<= 1
+    return codes
+
+
+class _BitWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.n = 0
+
+    def write(self, value, bits):
+        if bits == 0:
+            return
+        self.acc = (self.acc << bits) | value
+        self.n += bits
+        while self.n >= 16:
+            self.n -= 16
+            self.out += struct.pack("<H", (self.acc >> self.n) & 0xFFFF)
+        self.acc &= (1 << self.n) - 1
+
+    def align(self):
+        if self.n:
+            self.write(0, 16 - self.n)
+
+
+PRETREE_LENS = [4] * 12 + [5] * 8
+PRETREE_CODES = _canonical(PRETREE_LENS)
+MAIN_LENS = [9] * 512                 # 256 literals + 32 position slots * 8 length headers
+MAIN_CODES = _canonical(MAIN_LENS)
+LENGTH_LENS = [7] * 7 + [8] * 242     # 249 length symbols
+LENGTH_CODES = _canonical(LENGTH_LENS)
+
+
+def _lzxWriteLengths(bw, prev, new, first, last):
+    for x in range(20):
+        bw.write(PRETREE_LENS[x], 4)
+    for x in range(first, last):
+        sym = (prev[x] - new[x]) % 17
+        bw.write(PRETREE_CODES[sym], PRETREE_LENS[sym])
+        prev[x] = new[x]
+
+
+def lzxCompress(src):
+    """XNB framed LZX, one verbatim block per 32K frame with fixed code lengths."""
+    src = bytes(src)
+    out = bytearray()
+    r0 = 1
+    prev_main = [0] * 512
+    prev_len = [0] * 249
+    table = {}
+    for fs in range(0, len(src), LZX_FRAME):
+        fe = min(fs + LZX_FRAME, len(src))
+        size = fe - fs
+        bw = _BitWriter()
+        if fs == 0:
+            bw.write(0, 1)  # no E8 translation
+        bw.write(1, 3)      # verbatim block
+        bw.write(size >> 8, 16)
+        bw.write(size & 0xFF, 8)
+        _lzxWriteLengths(bw, prev_main, MAIN_LENS, 0, 256)
+        _lzxWriteLengths(bw, prev_main, MAIN_LENS, 256, 512)
+        _lzxWriteLengths(bw, prev_len, LENGTH_LENS, 0, 249)
+        i = fs
+        while i < fe:
+            key = src[i:i + 3]
+            j = table.get(key)
+            if i + 3 <= fe:
+                table[key] = i
+            m = 0
+            if j is not None and 0 < i - j < 65000 and i + 3 <= fe:
+                m = _matchLength(src, i, j, min(257, fe - i))
+            if m < 3:
+                bw.write(MAIN_CODES[src[i]], 9)
+                i += 1
+                continue
+            off = i - j
+            if off == r0:
+                slot, verbatim = 0, 0
+            else:
+                f = off + 2
+                slot = 3
+                while slot + 1 < 32 and LZX_POSITION_BASE[slot + 1] <= f:
+                    slot += 1
+                verbatim = f - LZX_POSITION_BASE[slot]
+                r0 = off
+            header = min(m - 2, 7)
+            bw.write(MAIN_CODES[256 + (slot << 3 | header)], 9)
+            if header == 7:
+                sym = m - 2 - 7
+                bw.write(LENGTH_CODES[sym], LENGTH_LENS[sym])
+            if slot >= 3:
+                bw.write(verbatim, LZX_EXTRA_BITS[slot])
+            i += m
+        bw.align()
+        body = bytes(bw.out)
+        if size == LZX_FRAME:
+            out += struct.pack(">H", len(body))
+        else:
+            out += b"\xff" + struct.pack(">HH", size, len(body))
+        out += body
+    return bytes(out)
+
+
+def wrapXnb(payload, platform=PLATFORM_PC, comp=None, hidef=False):
+    flags = 0x01 if hidef else 0
+    if comp == "lz4":
+        body = lz4Compress(payload)
+        flags |= 0x40
+    elif comp == "lzx":
+        body = lzxCompress(payload)
+        flags |= 0x80
+    else:
+        return b"XNB" + platform + bytes([5, flags]) + struct.pack("<I", 10 + len(payload)) + bytes(payload)
+    return b"XNB" + platform + bytes([5, flags]) + struct.pack("<II", 14 + len(body), len(payload)) + body
+
+
+# ---------------------------------------------------------------- textures
+
+
+def surfaceLevel(surf_fmt, width, height, platform=PLATFORM_PC, seed=0):
+    """One mip level of plausible, moderately compressible data."""
+    dim, bpb = SURFACE_FORMATS[platform][surf_fmt]
+    bw = max(1, (width + dim - 1) // dim)
+    bh = max(1, (height + dim - 1) // dim)
+    if dim == 1:
+        #64 premultiplied pixels with varying alpha, each row shifted by one pixel
+        pattern = bytearray()
+        for x in range(64):
+            a = (x * 37 + seed * 11) & 0xFF
+            pattern += bytes(((x * 4 * a) >> 8, ((63 - x) * 4 * a) >> 8, a >> 1, a))
+        pattern = bytes(pattern) * 2
+        reps = bw // 64 + 1
+        rows = [(pattern[y * 4:y * 4 + 256] * reps)[:bw * 4] for y in range(min(bh, 64))]
+    else:
+        rng = random.Random(seed)
+        blocks = [bytes(rng.getrandbits(8) for _ in range(bpb)) for _ in range(16)]
+        rows = [b"".join(blocks[(x + y) & 15] for x in range(bw)) for y in range(min(bh, 16))]
+    return b"".join(rows[y % len(rows)] for y in range(bh))
+
+
+def texture2DBody(surf_fmt, width, height, mips=1, platform=PLATFORM_PC):
+    out = bytearray(struct.pack("<4I", surf_fmt, width, height, mips))
+    for i in range(mips):
+        level = surfaceLevel(surf_fmt, max(1, width >> i), max(1, height >> i), platform, i)
+        out += struct.pack("<I", len(level)) + level
+    return bytes(out)
+
+
+def texture2D(surf_fmt, width, height, mips=1, platform=PLATFORM_PC, comp=None):
+    payload = readerTable([TEXTURE2D_READER]) + texture2DBody(surf_fmt, width, height, mips, platform)
+    return wrapXnb(payload, platform, comp)
+
+
+def textureCube(surf_fmt, size, mips=1, platform=PLATFORM_PC, comp=None):
+    """Six faces, each with its own mip chain and a different seed."""
+    out = bytearray(readerTable([TEXTURECUBE_READER]) + struct.pack("<3I", surf_fmt, size, mips))
+    for face in range(6):
+        for i in range(mips):
+            level = surfaceLevel(surf_fmt, max(1, size >> i), max(1, size >> i), platform, face * 16 + i)
+            out += struct.pack("<I", len(level)) + level
+    return wrapXnb(bytes(out), platform, comp)
+
+
+def texture3D(surf_fmt, width, height, depth, mips=1, comp=None):
+    """PC volume texture, every mip level holding its slices back to back."""
+    out = bytearray(readerTable([TEXTURE3D_READER]) + struct.pack("<5I", surf_fmt, width, height, depth, mips))
+    for i in range(mips):
+        w, h, d = max(1, width >> i), max(1, height >> i), max(1, depth >> i)
+        level = b"".join(surfaceLevel(surf_fmt, w, h, PLATFORM_PC, i * 64 + z) for z in range(d))
+        out += struct.pack("<I", len(level)) + level
+    return wrapXnb(bytes(out), PLATFORM_PC, comp)
+
+
+# ---------------------------------------------------------------- models
+
+IDENTITY = struct.pack("<16f", 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1)
+# (offset, VertexElementFormat, VertexElementUsage, usage index)
+STATIC_DECL = [(0, 2, 0, 0), (12, 2, 3, 0), (24, 1, 2, 0)]
+SKINNED_DECL = STATIC_DECL + [(32, 5, 6, 0), (36, 3, 7, 0)]
+
+
+def _vertexData(count, skinned, bones):
+    floats = array("f")
+    if not skinned:
+        for i in range(count):
+            floats.extend((i * 0.01, (i % 97) * 0.1, -i * 0.01, 0.0, 1.0, 0.0, (i % 256) / 255.0, (i % 251) / 250.0))
+        raw = floats
+    else:
+        raw = bytearray()
+        for i in range(count):
+            b = i % bones
+            raw += struct.pack("<8f4B4f", i * 0.01, (i % 97) * 0.1, -i * 0.01, 0.0, 1.0, 0.0,
+                               (i % 256) / 255.0, (i % 251) / 250.0,
+                               b, (b + 1) % bones, 0, 0, 0.75, 0.25, 0.0, 0.0)
+        return bytes(raw)
+    if sys.byteorder != "little":
+        raw.byteswap()
+    return raw.tobytes()
+
+
+def boneMatrix(angle, x=0.0, y=0.0, z=0.0, scale=1.0):
+    """Row-major XNA Matrix: scale, rotation about Y, then translation."""
+    c, s = math.cos(angle) * scale, math.sin(angle) * scale
+    return struct.pack("<16f", c, 0, -s, 0, 0, scale, 0, 0, s, 0, c, 0, x, y, z, 1)
+
+
+def skinningTag(skeleton, clips, first_reader):
+    """SkinningData object for a chain skeleton, `clips` is [(name, keyframe count)]."""
+    tid = lambda i: v7(first_reader + i + 1)
+    out = bytearray(tid(0) + tid(1) + struct.pack("<i", len(clips)))
+    for name, count in clips:
+        out += v7(2) + xstr(name) + tid(2)  # StringReader is type 1 in MODEL_READERS
+        duration = 10000000 * count // (skeleton * 30) + 1
+        out += struct.pack("<q", duration) + tid(3) + struct.pack("<i", count)
+        for k in range(count):
+            frame, bone = divmod(k, skeleton)
+            ticks = frame * 10000000 // 30
+            out += tid(4) + struct.pack("<iq", bone, ticks)
+            out += boneMatrix(frame * 0.05 + bone, 0.0, 1.0 + 0.01 * frame, 0.0, 1.0 + 0.5 * (bone == 1))
+    out += tid(5) + struct.pack("<i", skeleton) + b"".join(boneMatrix(0, 0, 1) for _ in range(skeleton))
+    out += tid(5) + struct.pack("<i", skeleton) + b"".join(boneMatrix(0, 0, -1) for _ in range(skeleton))
+    out += tid(6) + struct.pack("<%di" % (skeleton + 1), skeleton, *range(-1, skeleton - 1))
+    return bytes(out)
+
+
+def model(vertices, meshes=1, bones=2, skinned=False, comp=None, clips=None, own_buffers=False):
+    """Strip-like triangle list over `vertices`, split evenly into `meshes` meshes.
+
+    `clips` ([(name, keyframe count)]) adds a SkinnedModel SkinningData Tag animating
+    bones 1.. (bone 0 is the scene root). With `own_buffers` every mesh gets its own
+    VertexBuffer, effect and IndexBuffer, written in that order, so an effect body of
+    the wrong size misaligns every resource after it.
+    """
+    decl = SKINNED_DECL if skinned else STATIC_DECL
+    stride = 52 if skinned else 32
+    sixteen = vertices <= 0xFFFF
+    vdata = _vertexData(vertices, skinned, bones)
+    idx = array("H" if sixteen else "I")
+    for t in range(vertices - 2):
+        idx.extend((t, t + 1, t + 2))
+    if sys.byteorder != "little":
+        idx.byteswap()
+    idata = idx.tobytes()
+    effect_reader = 6 if skinned else 5
+
+    vb = (v7(3) + struct.pack("<II", stride, len(decl)) + b"".join(struct.pack("<IiiI", *e) for e in decl)
+          + struct.pack("<I", vertices) + vdata)
+    ib = lambda data: v7(4) + bytes([1 if sixteen else 0]) + struct.pack("<I", len(data)) + data
+    #BasicEffect: texture, 3 Vector3 colours, SpecularPower, Alpha, VertexColorEnabled;
+    #SkinnedEffect: texture, WeightsPerVertex, 3 colours, SpecularPower, Alpha
+    effect = v7(effect_reader) + xstr("") + bytes(48 if skinned else 45)
+    tris = vertices - 2
+    per_mesh = tris // meshes
+    prims = [per_mesh if m < meshes - 1 else tris - per_mesh * (meshes - 1) for m in range(meshes)]
+    if own_buffers:
+        isize = idx.itemsize * 3
+        shared = []
+        for m in range(meshes):
+            first = m * per_mesh * isize
+            shared += [vb, effect, ib(idata[first:first + prims[m] * isize])]
+        refs = [(0, v7(3 * m + 1) + v7(3 * m + 3) + v7(3 * m + 2)) for m in range(meshes)]
+    else:
+        shared = [vb, ib(idata), effect]
+        refs = [(m * per_mesh * 3, v7(1) + v7(2) + v7(3)) for m in range(meshes)]
+
+    ref = (lambda i: struct.pack("<i", i + 1)) if bones > 255 else (lambda i: bytes([i + 1]))
+    readers = MODEL_READERS + SKINNING_READERS if clips else MODEL_READERS
+    out = bytearray(readerTable(readers, len(shared)))
+    out += struct.pack("<I", bones)
+    for b in range(bones):
+        out += v7(2) + xstr("bone_%d" % b) + (boneMatrix(0, 0, 1) if clips and b else IDENTITY)
+    for b in range(bones):
+        out += (ref(b - 1) if b else b"\x00" * len(ref(0)))
+        kids = [b + 1] if b + 1 < bones else []
+        out += struct.pack("<i", len(kids)) + b"".join(ref(k) for k in kids)
+    out += struct.pack("<I", meshes)
+    for m in range(meshes):
+        start, part_refs = refs[m]
+        out += v7(2) + xstr("mesh_%d" % m) + ref(0) + bytes(16) + v7(0)
+        out += struct.pack("<i", 1)
+        out += struct.pack("<4i", 0, vertices, start, prims[m]) + v7(0) + part_refs
+    out += ref(0)  # root bone
+    out += skinningTag(bones - 1, clips, len(MODEL_READERS)) if clips else v7(0)
+    for res in shared:
+        out += res
+    return wrapXnb(bytes(out), PLATFORM_PC, comp)
+
+
+# ---------------------------------------------------------------- fonts
+
+
+def spriteFont(glyphs, tex_size=512, comp=None):
+    """SpriteFont as the XNA pipeline writes it: Int32 list counts, UTF-8 chars."""
+    cols = max(1, tex_size // 16)
+    chars = [c for c in range(32, 0xFFFE) if not 0xD800 <= c < 0xE000][:glyphs]
+    out = bytearray(readerTable(SPRITEFONT_READERS))
+    out += v7(2) + texture2DBody(0, tex_size, tex_size)
+    out += v7(3) + struct.pack("<i", len(chars))
+    for i in range(len(chars)):
+        out += struct.pack("<4i", (i % cols) * 16, (i // cols % cols) * 16, 12, 14)
+    out += v7(3) + struct.pack("<i", len(chars))
+    for i in range(len(chars)):
+        out += struct.pack("<4i", 0, 1, 12, 14)
+    out += v7(5) + struct.pack("<i", len(chars))
+    for c in chars:
+        out += chr(c).encode("utf-8")
+    out += struct.pack("<if", 18, 0.0)
+    out += v7(7) + struct.pack("<i", len(chars))
+    for i in range(len(chars)):
+        out += struct.pack("<3f", 0.5, 12.0, 1.0)
+    out += b"\x01" + b"?"
+    return wrapXnb(bytes(out), PLATFORM_PC, comp)
+
+
+# ---------------------------------------------------------------- sounds
+
+SOUNDEFFECT_READER = "Microsoft.Xna.Framework.Content.SoundEffectReader"
+
+
+def soundEffect(seconds, rate=44100, channels=2, loop=(0, 0), comp=None):
+    """16-bit PCM SoundEffect: WAVEFORMATEX, data, loop start/length (samples), duration (ms)."""
+    frames = int(seconds * rate)
+    ramp = [int(8000 * (i / 50.0 - 1)) for i in range(100)]  # sawtooth, 100 frames per period
+    period = array("h", (v for v in ramp for _ in range(channels)))
+    if sys.byteorder != "little":
+        period.byteswap()
+    data = (period.tobytes() * (frames // 100 + 1))[:frames * channels * 2]
+    fmt = struct.pack("<HHIIHHH", 1, channels, rate, rate * channels * 2, channels * 2, 16, 0)
+    out = readerTable([SOUNDEFFECT_READER]) + struct.pack("<I", len(fmt)) + fmt
+    out += struct.pack("<I", len(data)) + data
+    out += struct.pack("<3i", loop[0], loop[1], int(seconds * 1000))
+    return wrapXnb(out, PLATFORM_PC, comp)
+
+
+# ---------------------------------------------------------------- suite
+
+
+def _sizes(max_size, floor=256):
+    size = floor
+    while size <= max_size:
+        yield size
+        size *= 4 if size < max_size // 2 else 2
+
+
+def suite(max_size=2048, max_verts=100000, comps=(None, "lz4", "lzx")):
+    """(file name, builder) pairs covering formats, sizes, compressions and asset kinds."""
+    cases = []
+    for platform, tag in ((PLATFORM_PC, "pc"), (PLATFORM_XBOX360, "x360")):
+        for surf_fmt in SURFACE_FORMATS[platform]:
+            for size in _sizes(max_size):
+                for comp in comps:
+                    name = "tex_%s_fmt%d_%d_%s.xnb" % (tag, surf_fmt, size, comp or "raw")
+                    cases.append((name, lambda f=surf_fmt, s=size, p=platform, c=comp: texture2D(f, s, s, 1, p, c)))
+    cases.append(("tex_pc_fmt6_mips_1024_raw.xnb", lambda: texture2D(6, 1024, 1024, 11)))
+    cube = min(max_size, 1024)
+    cases.append(("cube_pc_fmt6_mips_%d_raw.xnb" % cube, lambda: textureCube(6, cube, cube.bit_length())))
+    cases.append(("cube_pc_fmt0_%d_lz4.xnb" % cube, lambda: textureCube(0, cube, 1, comp="lz4")))
+    cases.append(("volume_pc_fmt5_128x128x64_raw.xnb", lambda: texture3D(5, 128, 128, 64, 8)))
+    verts = 1000
+    while verts <= max_verts:
+        for comp in comps:
+            cases.append(("model_%dv_%s.xnb" % (verts, comp or "raw"), lambda v=verts, c=comp: model(v, 4, 8, False, c)))
+        cases.append(("model_skinned_%dv_raw.xnb" % verts, lambda v=verts: model(v, 4, 64, True)))
+        cases.append(("model_ownbuffers_%dv_raw.xnb" % verts, lambda v=verts: model(v, 4, 8, False, None, None, True)))
+        verts *= 10
+    cases.append(("model_anim_50kkeys_raw.xnb", lambda: model(1000, 1, 65, True, None, [("cutscene", 50000)])))
+    for secs in (1, 30):
+        for comp in comps:
+            cases.append(("sound_%ds_%s.xnb" % (secs, comp or "raw"), lambda t=secs, c=comp: soundEffect(t, comp=c)))
+    for glyphs in (256, 4096):
+        for comp in comps:
+            cases.append(("font_%dg_%s.xnb" % (glyphs, comp or "raw"), lambda g=glyphs, c=comp: spriteFont(g, 512, c)))
+    return cases
+
+
+def writeSuite(out_dir, max_size=2048, max_verts=100000, comps=(None, "lz4", "lzx"), verbose=False):
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name, build in suite(max_size, max_verts, comps):
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            data = build()
+            with open(path, "wb") as f:
+                f.write(data)
+            if verbose:
+                print("%s (%d bytes)" % (name, len(data)))
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("out", help="output directory")
+    ap.add_argument("--max-size", type=int, default=2048, help="largest texture edge (up to 8192)")
+    ap.add_argument("--max-verts", type=int, default=100000, help="largest model vertex count")
+    ap.add_argument("--comp", action="append", choices=("raw", "lz4", "lzx"),
+                    help="compression to generate (repeatable, default: all)")
+    args = ap.parse_args(argv)
+    comps = tuple(None if c == "raw" else c for c in (args.comp or ("raw", "lz4", "lzx")))
+    files = writeSuite(args.out, args.max_size, args.max_verts, comps, verbose=True)
+    print("%d files in %s" % (len(files), args.out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())